@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+
+"""
+Messages Index Benchmark
+
+Usage: python scripts/benchmarks/index_benchmark.py --dsn postgresql://... [--rooms 200] [--messages 5000] [--json out.json]
+
+Seeds a scratch schema in a local Postgres with generated rooms, then
+measures the queries that depend on sql/06_messages_room_index.sql before
+and after applying it:
+
+  purge   DELETE of one room, as the loader does before a full reload
+  insert  COPY of a generated conversation into that room, as the postgres backend does
+  latest  the chat screen's "latest N messages in room" query
+
+Purge and insert run in a transaction that is rolled back, so every sample
+sees the same table. Nothing outside the scratch schema is touched; it is
+dropped at the end unless --keep is given.
+"""
+
+import io
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import contextlib
+from pathlib import Path
+from typing import Dict, List
+
+from parse_benchmark import generate_fixture, load_loader, SCRIPTS_DIR
+from load_benchmark import percentile
+from postgrest_standin import profile_id
+
+SCHEMA = 'index_benchmark'
+TABLE = f'{SCHEMA}.messages'
+MIGRATION = SCRIPTS_DIR.parent / 'sql' / '06_messages_room_index.sql'
+BASELINES = ['none', 'room_id']  # before the migration: no index, or supabase/migrations/03's room_id index
+
+def connect(dsn: str):
+    """Autocommit connection; psycopg is only needed for this benchmark"""
+    try:
+        import psycopg
+    except ImportError:
+        raise SystemExit("The index benchmark requires psycopg: pip install 'psycopg[binary]'")
+    return psycopg.connect(dsn, autocommit=True)
+
+def room_ids(rooms: int) -> List[str]:
+    """Room ids in the dm_<uuid>_<uuid> format the app uses"""
+    return [f'dm_{profile_id(f"seed{i}a")}_{profile_id(f"seed{i}b")}' for i in range(rooms)]
+
+def seed(conn, rooms: List[str], messages: int) -> float:
+    """Create the scratch table and fill it with interleaved rooms; returns seconds taken"""
+    started = time.perf_counter()
+    conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    conn.execute(f"CREATE SCHEMA {SCHEMA}")
+    # Same columns the loader writes; no foreign keys, so profiles aren't needed
+    conn.execute(f"""
+        CREATE TABLE {TABLE} (
+            id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+            sender_id uuid NOT NULL,
+            recipient_id uuid,
+            room_id text NOT NULL,
+            content text,
+            type text DEFAULT 'text',
+            media_url text,
+            created_at timestamptz NOT NULL DEFAULT now(),
+            read_at timestamptz
+        )
+    """)
+    # Message-major order, so rooms are interleaved on disk like a live chat table
+    conn.execute(f"""
+        INSERT INTO {TABLE} (sender_id, recipient_id, room_id, content, type, created_at)
+        SELECT
+            md5(r.room_id || (n %% 2))::uuid,
+            md5(r.room_id || ((n + 1) %% 2))::uuid,
+            r.room_id,
+            'seeded message number ' || n,
+            'text',
+            now() - make_interval(secs => (%(messages)s - n) * 60 + r.ordinality)
+        FROM generate_series(1, %(messages)s) AS n
+        CROSS JOIN unnest(%(rooms)s::text[]) WITH ORDINALITY AS r(room_id, ordinality)
+    """, {'messages': messages, 'rooms': rooms})
+    conn.execute(f"VACUUM ANALYZE {TABLE}")
+    return time.perf_counter() - started
+
+def apply_baseline(conn, baseline: str) -> None:
+    if baseline == 'room_id':
+        conn.execute(f"CREATE INDEX idx_messages_room_id ON {TABLE}(room_id)")
+        conn.execute(f"ANALYZE {TABLE}")
+
+def apply_migration(conn) -> float:
+    """Run sql/06 against the scratch table; returns seconds taken"""
+    sql = MIGRATION.read_text(encoding='utf-8').replace('public.', f'{SCHEMA}.')
+    started = time.perf_counter()
+    conn.execute(sql)
+    return time.perf_counter() - started
+
+def fixture_rows(loader, rows_per_room: int, seed_value: int) -> List[List]:
+    """COPY rows for a generated conversation, parsed the way the loader parses it"""
+    users = ('indexbencha', 'indexbenchb')
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'room.txt'
+        generate_fixture(path, rows_per_room, seed=seed_value, users=users)
+        user_map = {u: profile_id(u) for u in users}
+        # The fixture's deliberately invalid lines would print a warning each
+        with contextlib.redirect_stdout(io.StringIO()):
+            room = loader.prepare_room(None, path, verbose=False, user_map=user_map, seed=seed_value)
+        return [[row[column] for column in loader.COPY_COLUMNS] for row in loader.iter_rows(room)]
+
+def latest_plan(conn, room_id: str, latest: int) -> str:
+    """Top scan node of the latest-N query plan, e.g. 'Index Scan' or 'Seq Scan'"""
+    plan = conn.execute(
+        f"EXPLAIN (FORMAT JSON) SELECT * FROM {TABLE} WHERE room_id = %s ORDER BY created_at DESC LIMIT %s",
+        (room_id, latest)
+    ).fetchone()[0][0]['Plan']
+    while 'Scan' not in plan['Node Type'] and plan.get('Plans'):
+        plan = plan['Plans'][0]
+    return plan['Node Type']
+
+def measure(conn, rooms: List[str], rows: List[List], columns: List[str], args, rng: random.Random) -> Dict:
+    """Latency percentiles for purge, insert and latest-N on sampled rooms"""
+    copy_sql = f"COPY {TABLE} ({', '.join(columns)}) FROM STDIN"
+    room_column = columns.index('room_id')
+    timings: Dict[str, List[float]] = {'purge': [], 'insert': [], 'latest': []}
+
+    for room_id in rng.sample(rooms, min(args.samples, len(rooms))):
+        started = time.perf_counter()
+        conn.execute(
+            f"SELECT id, sender_id, content, type, media_url, created_at FROM {TABLE} "
+            f"WHERE room_id = %s ORDER BY created_at DESC LIMIT %s", (room_id, args.latest)
+        ).fetchall()
+        timings['latest'].append(time.perf_counter() - started)
+
+    for room_id in rng.sample(rooms, min(args.write_samples, len(rooms))):
+        with conn.cursor() as cur:
+            cur.execute("BEGIN")
+            try:
+                started = time.perf_counter()
+                cur.execute(f"DELETE FROM {TABLE} WHERE room_id = %s", (room_id,))
+                timings['purge'].append(time.perf_counter() - started)
+
+                started = time.perf_counter()
+                with cur.copy(copy_sql) as copy:
+                    for row in rows:
+                        row[room_column] = room_id
+                        copy.write_row(row)
+                timings['insert'].append(time.perf_counter() - started)
+            finally:
+                cur.execute("ROLLBACK")
+
+    return {
+        'latest_plan': latest_plan(conn, rooms[0], args.latest),
+        **{
+            name: {f'p{p}': round(percentile(values, p), 5) if values else None for p in (50, 95, 99)}
+            for name, values in timings.items()
+        }
+    }
+
+def run(args) -> Dict:
+    loader = load_loader()
+    dsn = args.dsn or loader.find_dsn()
+    if not dsn:
+        raise SystemExit(f"Pass --dsn or set one of {', '.join(loader.DSN_ENV_VARS)}")
+    rooms = room_ids(args.rooms)
+    rows = fixture_rows(loader, args.messages, args.seed)
+
+    with connect(dsn) as conn:
+        try:
+            seconds = seed(conn, rooms, args.messages)
+            print(f"Seeded {args.rooms * args.messages} rows in {seconds:.1f}s", file=sys.stderr)
+            apply_baseline(conn, args.baseline)
+            before = measure(conn, rooms, rows, loader.COPY_COLUMNS, args, random.Random(args.seed))
+            index_seconds = apply_migration(conn)
+            print(f"Applied {MIGRATION.name} in {index_seconds:.1f}s", file=sys.stderr)
+            after = measure(conn, rooms, rows, loader.COPY_COLUMNS, args, random.Random(args.seed))
+        finally:
+            if not args.keep:
+                conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+
+    return {
+        'rooms': args.rooms,
+        'messages_per_room': args.messages,
+        'rows_seeded': args.rooms * args.messages,
+        'insert_rows': len(rows),
+        'baseline': args.baseline,
+        'seed_seconds': round(seconds, 3),
+        'migration_seconds': round(index_seconds, 3),
+        'before': before,
+        'after': after,
+        'speedup': {
+            name: round(before[name]['p50'] / after[name]['p50'], 1)
+            if before[name]['p50'] and after[name]['p50'] else None
+            for name in ('purge', 'insert', 'latest')
+        }
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark message queries before and after the room index migration")
+    parser.add_argument('--dsn', help="Postgres connection string (default: SUPABASE_DB_URL or DATABASE_URL)")
+    parser.add_argument('--rooms', type=int, default=200, help="Rooms to seed")
+    parser.add_argument('--messages', type=int, default=5000, help="Messages per seeded room, and per inserted room")
+    parser.add_argument('--latest', type=int, default=50, help="Rows fetched by the latest-N query")
+    parser.add_argument('--samples', type=int, default=50, help="Latest-N queries per phase")
+    parser.add_argument('--write-samples', type=int, default=5, help="Purge and insert runs per phase")
+    parser.add_argument('--baseline', choices=BASELINES, default='none', help="Indexes present before the migration")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--keep', action='store_true', help=f"Leave the {SCHEMA} schema in place afterwards")
+    parser.add_argument('--json', type=Path, help="Also write results to this JSON file")
+    args = parser.parse_args()
+
+    result = run(args)
+    print(json.dumps(result, indent=2))
+
+    if args.json:
+        report = {
+            'benchmark': 'index',
+            'python': sys.version.split()[0],
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'config': {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items()
+                       if k not in ('json', 'dsn')},
+            'results': [result]
+        }
+        args.json.write_text(json.dumps(report, indent=2) + '\n')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+
+"""
+End-to-end Load Benchmark
+
+Usage: python scripts/benchmarks/load_benchmark.py [--rooms 4] [--messages 5000] [--latency 0.02] [--json out.json]
+
+Starts a local PostgREST stand-in, generates conversation fixtures and
+loads them with the conversation_loader package, reporting throughput, request
+counts, bytes sent and insert batch latency percentiles. The `client`
+scenario sends the same rows one batch at a time through
+SecureSupabaseClient as a baseline for the pipelined `loader` scenario,
+which replaces rooms of up to REPLACE_MAX_ROWS messages in one request
+unless --no-replace-rpc leaves that function out of the stand-in.
+The `postgres` scenario loads the same fixtures straight into the database
+at --dsn with the COPY backend. It writes to a scratch copy of
+public.messages without the foreign keys to auth.users, so the fixture users
+need no profiles, and drops it afterwards.
+"""
+
+import io
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import tempfile
+import threading
+import contextlib
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from parse_benchmark import generate_fixture, load_loader as import_loader
+from postgrest_standin import StandIn, profile_id
+
+SCENARIOS = ['loader', 'client', 'postgres']
+SCRATCH_SCHEMA = 'load_benchmark'  # holds the postgres scenario's messages table
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+def load_loader(url: str):
+    """Import the loader pointed at the stand-in"""
+    # Read when the loader connects; set here so .env can't point it elsewhere
+    os.environ['EXPO_PUBLIC_SUPABASE_URL'] = url
+    os.environ['SUPABASE_SERVICE_ROLE_KEY'] = 'benchmark'
+    return import_loader()
+
+@contextlib.contextmanager
+def timed_inserts(loader, latencies: List[float]):
+    """Record how long each insert batch takes, retries included"""
+    original = loader.SecureSupabaseClient.insert_json
+    lock = threading.Lock()
+
+    def insert_json(self, table, body):
+        started = time.perf_counter()
+        try:
+            return original(self, table, body)
+        finally:
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    loader.SecureSupabaseClient.insert_json = insert_json
+    try:
+        yield
+    finally:
+        loader.SecureSupabaseClient.insert_json = original
+
+def run_loader(loader, standin: StandIn, paths: List[Path], args) -> Dict:
+    """Load every fixture the way the CLI would"""
+    options = loader.LoadOptions(in_flight=args.in_flight, batch_size=args.batch_size, use_user_cache=False,
+                                 parse_cache=False, compress=args.compress, stream=args.stream,
+                                 rate_limit=args.client_rate_limit, autotune=not args.no_autotune)
+    results = loader.load_conversations(paths, workers=args.workers, assume_yes=True, options=options)
+    errors = [r.error for r in results if r.error]
+    return {
+        'messages': sum(r.messages for r in results if not r.error),
+        'errors': errors
+    }
+
+def run_client(loader, standin: StandIn, paths: List[Path], args) -> Dict:
+    """Send each room's rows one batch at a time with no pipelining"""
+    client = loader.SecureSupabaseClient(standin.url, 'benchmark', compress=args.compress, stream=args.stream)
+    messages = 0
+    errors = []
+    for path in paths:
+        try:
+            room = loader.prepare_room(client, path, verbose=False)
+            client.delete('messages', {'room_id': room.room_id})
+            sizer = loader.BatchSizer(args.batch_size)
+            encoder, rows = loader.iter_room_columns(room)
+            for batch in loader.iter_batches(rows, encoder, sizer):
+                started = time.perf_counter()
+                loader.insert_batch(client, room.room_id, batch)
+                sizer.record(batch.count, time.perf_counter() - started)
+                messages += batch.count
+        except Exception as e:
+            errors.append(str(e))
+    client.close()
+    return {'messages': messages, 'errors': errors}
+
+def run_postgres(loader, standin: StandIn, paths: List[Path], args) -> Dict:
+    """Load every fixture with one DELETE + COPY transaction per room"""
+    if not args.dsn:
+        raise SystemExit("The postgres scenario needs --dsn")
+    user_map = {}
+    for i in range(args.rooms):
+        for username in (f'bench{i}a', f'bench{i}b'):
+            user_map[username] = profile_id(username)
+    options = loader.LoadOptions(user_map=user_map, parse_cache=False)
+    backend = loader.PostgresBackend(args.dsn, pool_size=args.workers, table=f'{SCRATCH_SCHEMA}.messages')
+    # Same columns, defaults, identity and indexes as the real table; LIKE never copies foreign keys
+    with backend.connection() as conn:
+        conn.execute(f"DROP SCHEMA IF EXISTS {SCRATCH_SCHEMA} CASCADE")
+        conn.execute(f"CREATE SCHEMA {SCRATCH_SCHEMA}")
+        conn.execute(f"CREATE TABLE {backend.table} (LIKE {loader.COPY_TABLE} INCLUDING ALL)")
+    try:
+        results = loader.load_conversations(paths, workers=args.workers, assume_yes=True,
+                                            options=options, backend=backend)
+    finally:
+        with backend.connection() as conn:
+            conn.execute(f"DROP SCHEMA IF EXISTS {SCRATCH_SCHEMA} CASCADE")
+        backend.close()
+    return {
+        'messages': sum(r.messages for r in results if not r.error),
+        'errors': [r.error for r in results if r.error]
+    }
+
+def run(args) -> Dict:
+    """Run one scenario against a fresh stand-in"""
+    standin = StandIn(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                      error_status=args.error_status, rate_limit=args.rate_limit,
+                      keep_content=False, seed=args.seed, accept_gzip=not args.reject_gzip,
+                      replace_rpc=not args.no_replace_rpc)
+    latencies: List[float] = []
+
+    with standin, tempfile.TemporaryDirectory(dir=args.workdir) as tmp:
+        loader = load_loader(standin.url)
+        paths = []
+        for i in range(args.rooms):
+            path = Path(tmp) / f'room-{i}.txt'
+            generate_fixture(path, args.messages, seed=args.seed + i, users=(f'bench{i}a', f'bench{i}b'))
+            paths.append(path)
+
+        scenario = {'loader': run_loader, 'client': run_client, 'postgres': run_postgres}[args.scenario]
+        output = io.StringIO()
+        with timed_inserts(loader, latencies), contextlib.redirect_stdout(sys.stderr if args.verbose else output):
+            started = time.perf_counter()
+            outcome = scenario(loader, standin, paths, args)
+            elapsed = time.perf_counter() - started
+        stats = standin.snapshot()
+
+    requests_by_kind = {k: v for k, v in sorted(stats.items()) if k.split(' ')[0] in ('GET', 'HEAD', 'POST', 'PATCH', 'DELETE')}
+    statuses = {k[len('status_'):]: v for k, v in sorted(stats.items()) if k.startswith('status_')}
+    return {
+        'scenario': args.scenario,
+        'rooms': args.rooms,
+        'lines_per_room': args.messages,
+        'messages': outcome['messages'],
+        'rows_stored': stats['rows'],
+        'errors': outcome['errors'],
+        'seconds': round(elapsed, 4),
+        'messages_per_sec': round(outcome['messages'] / elapsed) if elapsed else None,
+        'requests': sum(requests_by_kind.values()),
+        'requests_by_kind': requests_by_kind,
+        'statuses': statuses,
+        'bytes_sent': stats.get('bytes_received', 0),
+        'batches': len(latencies),
+        'batch_latency': {
+            f'p{p}': round(percentile(latencies, p), 4) if latencies else None for p in (50, 95, 99)
+        }
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark loading conversations against a local PostgREST stand-in")
+    parser.add_argument('--scenario', choices=SCENARIOS, default='loader')
+    parser.add_argument('--rooms', type=int, default=4, help="Conversation files to load")
+    parser.add_argument('--messages', type=int, default=5000, help="Lines per conversation file")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--in-flight', type=int, default=4)
+    parser.add_argument('--batch-size', type=int, default=50, help="Initial rows per insert batch")
+    parser.add_argument('--latency', type=float, default=0.02, help="Seconds the stand-in adds to every request")
+    parser.add_argument('--jitter', type=float, default=0.005)
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests that fail")
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--rate-limit', type=float, help="Requests per second before the stand-in answers 429")
+    parser.add_argument('--client-rate-limit', type=float, help="Requests per second the loader allows itself")
+    parser.add_argument('--no-autotune', action='store_true', help="Keep the loader's requests in flight fixed")
+    parser.add_argument('--compress', action='store_true', help="gzip insert bodies")
+    parser.add_argument('--stream', action='store_true', help="Send insert bodies chunked")
+    parser.add_argument('--reject-gzip', action='store_true', help="Make the stand-in refuse gzip bodies")
+    parser.add_argument('--no-replace-rpc', action='store_true',
+                        help="Leave rpc/replace_room_messages out of the stand-in, so rooms load in batches")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--dsn', help="Postgres connection string for the postgres scenario")
+    parser.add_argument('--workdir', type=Path, help="Where to write temporary fixtures")
+    parser.add_argument('--json', type=Path, help="Also write results to this JSON file")
+    parser.add_argument('--verbose', action='store_true', help="Show the loader's own output")
+    args = parser.parse_args()
+
+    result = run(args)
+    print(json.dumps(result, indent=2))
+
+    if args.json:
+        report = {
+            'benchmark': 'load',
+            'python': sys.version.split()[0],
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'config': {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items() if k not in ('json', 'verbose')},
+            'results': [result]
+        }
+        args.json.write_text(json.dumps(report, indent=2) + '\n')
+
+if __name__ == '__main__':
+    main()
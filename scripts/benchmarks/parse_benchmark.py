@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+
+"""
+Conversation Parser Benchmark
+
+Usage: python scripts/benchmarks/parse_benchmark.py [--sizes 10000,1000000,10000000] [--workers 1,4] [--json out.json]
+
+Generates conversation files of the requested line counts and reports how
+fast the conversation_loader package's streaming parser gets through them,
+and the sharded parser for every worker count above 1.
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_SIZES = [10_000, 1_000_000, 10_000_000]
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent
+
+# Line mix roughly matching hand-written fixtures, plus a few invalid lines
+LINE_TEMPLATES = [
+    (60, '{a}: message number {n}'),
+    (60, '{b}: reply number {n}'),
+    (6, '{a} (Snap): [Photo of a desk] caption {n}'),
+    (4, '{b} (photo): [Picture] look at this {n}'),
+    (3, '{a} (video): [Short clip] {n}'),
+    (4, '-- {m} minutes later --'),
+    (1, 'carol: not part of this conversation {n}'),
+    (1, 'this line is not a message {n}'),
+    (1, '')
+]
+
+def load_loader():
+    """Import the conversation_loader package from scripts/"""
+    if str(SCRIPTS_DIR) not in sys.path:
+        sys.path.insert(0, str(SCRIPTS_DIR))
+    import conversation_loader
+    return conversation_loader
+
+def generate_fixture(path: Path, lines: int, seed: int = 0, users: Tuple[str, str] = ('alice', 'bob')) -> None:
+    """Write a deterministic conversation file with the given number of lines"""
+    rng = random.Random(seed)
+    weights = [w for w, _ in LINE_TEMPLATES]
+    templates = [t for _, t in LINE_TEMPLATES]
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f'@{users[0]} @{users[1]}\n')
+        chunk = []
+        for n, template in enumerate(rng.choices(templates, weights, k=lines - 1)):
+            chunk.append(template.format(n=n, m=rng.randint(1, 59), a=users[0], b=users[1]))
+            if len(chunk) >= 10_000:
+                f.write('\n'.join(chunk) + '\n')
+                chunk = []
+        if chunk:
+            f.write('\n'.join(chunk) + '\n')
+
+def time_parse(loader, path: Path, workers: int = 1) -> Dict:
+    """Parse one file end to end and measure it"""
+    warnings = 0
+
+    def count_warning(_: str) -> None:
+        nonlocal warnings
+        warnings += 1
+
+    started = time.perf_counter()
+    if workers > 1:
+        _, _, messages = loader.parse_conversation_sharded(path, workers, warn=count_warning, rng=random.Random(0))
+        message_count = len(messages)
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            _, _, messages = loader.parse_conversation_stream(f, warn=count_warning, rng=random.Random(0))
+            message_count = sum(1 for _ in messages)
+    return {
+        'seconds': time.perf_counter() - started,
+        'messages': message_count,
+        'warnings': warnings
+    }
+
+def run(sizes: List[int], repeat: int, workdir: Optional[Path], worker_counts: List[int]) -> List[Dict]:
+    """Benchmark every size and worker count, keeping the best of `repeat` runs"""
+    loader = load_loader()
+    results = []
+
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        for size in sizes:
+            path = Path(tmp) / f'conversation-{size}.txt'
+            print(f"Generating {size:,} lines...", file=sys.stderr)
+            generate_fixture(path, size)
+
+            for workers in worker_counts:
+                runs = [time_parse(loader, path, workers) for _ in range(repeat)]
+                best = min(runs, key=lambda r: r['seconds'])
+                results.append({
+                    'lines': size,
+                    'bytes': path.stat().st_size,
+                    'workers': workers,
+                    'messages': best['messages'],
+                    'warnings': best['warnings'],
+                    'seconds': round(best['seconds'], 4),
+                    'lines_per_sec': round(size / best['seconds'])
+                })
+            path.unlink()
+
+    return results
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the conversation parser")
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help="Comma-separated line counts (default: %(default)s)")
+    parser.add_argument('--workers', default='1',
+                        help="Comma-separated process counts; 1 is the serial parser (default: %(default)s)")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per size, best is reported")
+    parser.add_argument('--workdir', type=Path, help="Where to write temporary fixtures")
+    parser.add_argument('--json', type=Path, help="Also write results to this JSON file")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+    worker_counts = [max(1, int(w)) for w in args.workers.split(',') if w.strip()]
+    results = run(sizes, max(1, args.repeat), args.workdir, worker_counts)
+
+    print(f"{'lines':>12} {'workers':>8} {'messages':>12} {'warnings':>10} {'seconds':>10} {'lines/sec':>12}")
+    for r in results:
+        print(f"{r['lines']:>12,} {r['workers']:>8} {r['messages']:>12,} {r['warnings']:>10,} "
+              f"{r['seconds']:>10.3f} {r['lines_per_sec']:>12,}")
+
+    if args.json:
+        report = {
+            'benchmark': 'parse',
+            'python': sys.version.split()[0],
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'results': results
+        }
+        args.json.write_text(json.dumps(report, indent=2) + '\n')
+
+if __name__ == '__main__':
+    main()
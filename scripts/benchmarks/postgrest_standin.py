@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+
+"""
+Local PostgREST Stand-in
+
+Usage: python scripts/benchmarks/postgrest_standin.py [--port 54321] [--latency 0.02] [--error-rate 0.01] [--rate-limit 200]
+
+Serves just enough of /rest/v1/profiles, /rest/v1/messages and
+/rest/v1/friendships for the conversation loaders, with configurable
+latency, error rate and rate limiting; messages can be paged by keyset
+with or=(created_at.gt...,and(...)). Profiles are created on demand with
+deterministic UUIDs, so any fixture's usernames resolve (and, once seen,
+can be looked up by id), and every pair of profiles is an accepted
+friendship. /rest/v1/rpc/room_summary and /rest/v1/rpc/replace_room_messages
+answer like sql/05 and sql/07 (the latter can be left out with
+--no-replace-rpc, as on an unmigrated project, and other functions are
+404s). Chunked and gzip-encoded request bodies are accepted unless
+--reject-gzip is given, in which case they fail the way PostgREST does
+(400, not valid JSON).
+"""
+
+import sys
+import gzip
+import json
+import time
+import uuid
+import random
+import hashlib
+import argparse
+import threading
+from collections import Counter, defaultdict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, List, Optional
+from urllib.parse import urlparse, parse_qsl
+
+PROFILE_NAMESPACE = uuid.UUID('6f1c3c52-2d43-4c5e-9a57-4e0f2f1f7a10')
+MAX_ROWS = 1000  # Supabase's default max-rows
+
+def profile_id(username: str) -> str:
+    """Deterministic profile id for a username"""
+    return str(uuid.uuid5(PROFILE_NAMESPACE, username.lower()))
+
+def message_fingerprint(row: Dict) -> str:
+    """Same hash as public.message_fingerprint()"""
+    parts = [row.get(k) for k in ('sender_id', 'recipient_id', 'type', 'content')]
+    return hashlib.md5('\x1f'.join(p for p in parts if p is not None).encode('utf-8')).hexdigest()
+
+def filter_values(value: str) -> List[str]:
+    """Operands of an eq. or in. filter, quoted or not"""
+    op, _, operand = value.partition('.')
+    if op == 'eq':
+        return [operand]
+    if operand.startswith('("'):
+        return json.loads(f'[{operand[1:-1]}]')
+    return [v for v in operand[1:-1].split(',') if v]
+
+def parse_logic(value: str):
+    """Turn an or=(...) tree of column.op.value terms, as used for keyset paging, into a row predicate"""
+    position = 0
+
+    def term():
+        nonlocal position
+        for combinator, combine in (('and(', all), ('or(', any), ('(', any)):
+            if value.startswith(combinator, position):
+                position += len(combinator)
+                parts = [term()]
+                while value[position] == ',':
+                    position += 1
+                    parts.append(term())
+                position += 1  # closing parenthesis
+                return lambda row, parts=parts, combine=combine: combine(p(row) for p in parts)
+        column, op, rest = value[position:].split('.', 2)
+        if rest.startswith('"'):
+            operand, length = json.JSONDecoder().raw_decode(rest)
+        else:
+            operand = rest[:min((i for i in (rest.find(','), rest.find(')')) if i >= 0), default=len(rest))]
+            length = len(operand)
+        position += len(column) + len(op) + 2 + length
+        compare = {'eq': '__eq__', 'gt': '__gt__', 'gte': '__ge__', 'lt': '__lt__', 'lte': '__le__'}[op]
+
+        def leaf(row: Dict) -> bool:
+            stored = row.get(column)
+            if stored is None:
+                return False
+            # ids are integers here, so compare those numerically
+            if isinstance(stored, int):
+                return getattr(stored, compare)(int(operand))
+            return getattr(str(stored), compare)(operand)
+        return leaf
+
+    return term()
+
+def parse_filter(value: str):
+    """Turn a PostgREST filter like eq.x or in.("a","b") into a predicate"""
+    op, _, operand = value.partition('.')
+    if op in ('eq', 'in'):
+        values = set(filter_values(value))
+        return lambda v: str(v) in values
+    if op in ('gt', 'gte', 'lt', 'lte'):
+        compare = {'gt': str.__gt__, 'gte': str.__ge__, 'lt': str.__lt__, 'lte': str.__le__}[op]
+        return lambda v: v is not None and compare(str(v), operand)
+    raise ValueError(f"Unsupported filter: {value}")
+
+class TokenBucket:
+    """Requests-per-second limiter used to simulate project rate limits"""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self) -> bool:
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+class Store:
+    """In-memory messages table, indexed by room"""
+
+    def __init__(self, keep_content: bool = True):
+        self.keep_content = keep_content
+        self.rooms: Dict[str, List[Dict]] = defaultdict(list)
+        self.next_id = 1
+        self.lock = threading.Lock()
+
+    def _add(self, row: Dict) -> None:
+        row['id'] = self.next_id
+        self.next_id += 1
+        if not self.keep_content:
+            row['fingerprint'] = message_fingerprint(row)
+            row['content'] = None
+        self.rooms[row['room_id']].append(row)
+
+    def insert(self, rows: List[Dict]) -> None:
+        with self.lock:
+            for row in rows:
+                self._add(row)
+
+    def replace(self, room_id: str, rows: List[Dict]) -> int:
+        """Swap a room's rows in one step, like replace_room_messages()"""
+        with self.lock:
+            self.rooms[room_id] = []
+            for row in rows:
+                self._add({**row, 'room_id': room_id})
+        return len(rows)
+
+    def matching(self, filters: Dict) -> List[Dict]:
+        room = filters.pop('room_id', None)
+        with self.lock:
+            if room is not None:
+                room_id = room[3:] if room.startswith('eq.') else None
+                rows = list(self.rooms.get(room_id, [])) if room_id else [
+                    r for rows in self.rooms.values() for r in rows if parse_filter(room)(r['room_id'])
+                ]
+            else:
+                rows = [r for rows in self.rooms.values() for r in rows]
+        predicates = [(column, parse_filter(value)) for column, value in filters.items()]
+        return [r for r in rows if all(p(r.get(column)) for column, p in predicates)]
+
+    def delete(self, filters: Dict) -> int:
+        doomed = {id(r) for r in self.matching(dict(filters))}
+        with self.lock:
+            for room_id in list(self.rooms):
+                self.rooms[room_id] = [r for r in self.rooms[room_id] if id(r) not in doomed]
+        return len(doomed)
+
+    def count(self) -> int:
+        with self.lock:
+            return sum(len(rows) for rows in self.rooms.values())
+
+class StandIn:
+    """Threaded HTTP server imitating the PostgREST endpoints the loaders use"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 503, rate_limit: Optional[float] = None,
+                 keep_content: bool = True, seed: Optional[int] = None, accept_gzip: bool = True,
+                 replace_rpc: bool = True):
+        self.latency = latency
+        self.accept_gzip = accept_gzip
+        self.replace_rpc = replace_rpc
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.bucket = TokenBucket(rate_limit) if rate_limit else None
+        self.store = Store(keep_content)
+        self.usernames = set()  # every username looked up so far, for lookups by profile id
+        self.random = random.Random(seed)
+        self.stats = Counter()
+        self.stats_lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> 'StandIn':
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> 'StandIn':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def record(self, key: str, amount: int = 1) -> None:
+        with self.stats_lock:
+            self.stats[key] += amount
+
+    def snapshot(self) -> Dict:
+        with self.stats_lock:
+            stats = dict(self.stats)
+        stats['rows'] = self.store.count()
+        return stats
+
+    def _handler(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def send(self, status: int, body=None, headers: Optional[Dict] = None) -> None:
+                data = b'' if body is None else json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                if self.command != 'HEAD':
+                    self.wfile.write(data)
+                standin.record(f'status_{status}')
+
+            def read_body(self):
+                if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+                    chunks = []
+                    while True:
+                        size = int(self.rfile.readline().split(b';')[0], 16)
+                        chunks.append(self.rfile.read(size))
+                        self.rfile.readline()  # CRLF after each chunk
+                        if not size:
+                            break
+                    data = b''.join(chunks)
+                    standin.record('requests_chunked')
+                else:
+                    length = int(self.headers.get('Content-Length') or 0)
+                    data = self.rfile.read(length) if length else b''
+                standin.record('bytes_received', len(data))
+                
+                if self.headers.get('Content-Encoding') == 'gzip':
+                    if not standin.accept_gzip:
+                        raise ValueError("gzip bodies are not accepted")
+                    data = gzip.decompress(data)
+                    standin.record('requests_gzip')
+                return json.loads(data) if data else None
+
+            def route(self):
+                """Apply simulated conditions; return (table, query) or None if already answered"""
+                parsed = urlparse(self.path)
+                table = parsed.path.rsplit('/', 1)[-1]
+                standin.record(f'{self.command} {table}')
+
+                try:
+                    body = self.read_body() if self.command in ('POST', 'PATCH') else None
+                except ValueError:
+                    self.send(400, {'code': 'PGRST102', 'message': 'Empty or invalid json'})
+                    return None
+
+                if standin.latency or standin.jitter:
+                    time.sleep(standin.latency + standin.random.uniform(0, standin.jitter))
+                if standin.bucket and not standin.bucket.take():
+                    self.send(429, {'message': 'rate limited'}, {'Retry-After': '1'})
+                    return None
+                if standin.error_rate and standin.random.random() < standin.error_rate:
+                    self.send(standin.error_status, {'message': 'simulated failure'})
+                    return None
+                return table, dict(parse_qsl(parsed.query)), body
+
+            def do_GET(self) -> None:
+                routed = self.route()
+                if not routed:
+                    return
+                table, query, _ = routed
+                select = query.pop('select', '*')
+                order = query.pop('order', None)
+                limit = min(int(query.pop('limit', MAX_ROWS)), MAX_ROWS)
+                offset = int(query.pop('offset', 0))
+
+                if table == 'profiles':
+                    names = filter_values(query['username']) if 'username' in query else []
+                    if 'id' in query:
+                        # Only usernames this stand-in has already resolved can be found by id
+                        ids = set(filter_values(query['id']))
+                        names = [n for n in list(standin.usernames) if profile_id(n) in ids]
+                    standin.usernames.update(n.lower() for n in names)
+                    rows = [{'id': profile_id(n), 'username': n.lower()} for n in names]
+                elif table == 'friendships':
+                    users = filter_values(query['user_id']) if 'user_id' in query else []
+                    friends = filter_values(query['friend_id']) if 'friend_id' in query else []
+                    rows = [
+                        {'user_id': u, 'friend_id': f, 'status': 'accepted'} for u in users for f in friends if u != f
+                    ][offset:offset + limit]
+                elif table == 'room_summary':
+                    stored = standin.store.matching({'room_id': f"eq.{query.get('target_room_id', '')}"})
+                    timestamps = [r['created_at'] for r in stored]
+                    rows = [{
+                        'message_count': len(stored),
+                        'first_created_at': min(timestamps, default=None),
+                        'last_created_at': max(timestamps, default=None),
+                        'checksum': str(sum(int((r.get('fingerprint') or message_fingerprint(r))[:15], 16) for r in stored))
+                    }]
+                elif table == 'messages':
+                    keyset = parse_logic(query.pop('or')) if 'or' in query else None
+                    rows = standin.store.matching(query)
+                    if keyset:
+                        rows = [r for r in rows if keyset(r)]
+                    if order:
+                        for part in reversed(order.split(',')):
+                            column, _, direction = part.partition('.')
+                            rows.sort(key=lambda r: r.get(column) or '', reverse=direction == 'desc')
+                    rows = rows[offset:offset + limit]
+                else:
+                    rows = []
+
+                self.send(200, [self.project(row, select) for row in rows])
+
+            def project(self, row: Dict, select: str) -> Dict:
+                if select == '*':
+                    return row
+                result = {}
+                for column in select.split(','):
+                    alias, _, source = column.rpartition(':')
+                    if source == 'message_fingerprint':
+                        result[alias or source] = row.get('fingerprint') or message_fingerprint(row)
+                    else:
+                        result[alias or source] = row.get(source)
+                return result
+
+            def do_HEAD(self) -> None:
+                routed = self.route()
+                if not routed:
+                    return
+                table, query, _ = routed
+                total = len(standin.store.matching(query)) if table == 'messages' else 0
+                self.send(200, None, {'Content-Range': f'*/{total}'})
+
+            def do_POST(self) -> None:
+                routed = self.route()
+                if not routed:
+                    return
+                table, _, rows = routed
+                if table == 'messages':
+                    standin.store.insert(rows)
+                    standin.record('rows_inserted', len(rows))
+                elif table == 'replace_room_messages' and standin.replace_rpc:
+                    standin.record('rows_deleted', len(standin.store.rooms.get(rows['target_room_id'], [])))
+                    inserted = standin.store.replace(rows['target_room_id'], rows['messages'])
+                    standin.record('rows_inserted', inserted)
+                    self.send(200, inserted)
+                    return
+                elif '/rpc/' in self.path:
+                    self.send(404, {'code': 'PGRST202', 'message': f'Could not find the function public.{table}'})
+                    return
+                self.send(201)
+
+            def do_PATCH(self) -> None:
+                routed = self.route()
+                if not routed:
+                    return
+                _, query, changes = routed
+                for row in standin.store.matching(query):
+                    row.update(changes)
+                    if not standin.store.keep_content:
+                        row['fingerprint'] = message_fingerprint(row)
+                        row['content'] = None
+                self.send(204)
+
+            def do_DELETE(self) -> None:
+                routed = self.route()
+                if not routed:
+                    return
+                _, query, _ = routed
+                standin.record('rows_deleted', standin.store.delete(query))
+                self.send(204)
+
+        return Handler
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a local PostgREST stand-in")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=54321)
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every request")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Extra random latency, up to this many seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests that fail")
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--rate-limit', type=float, help="Requests per second before answering 429")
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--reject-gzip', action='store_true', help="Answer gzip request bodies with 400")
+    parser.add_argument('--no-replace-rpc', action='store_true', help="Answer rpc/replace_room_messages with 404")
+    args = parser.parse_args()
+
+    standin = StandIn(args.host, args.port, args.latency, args.jitter, args.error_rate,
+                      args.error_status, args.rate_limit, seed=args.seed, accept_gzip=not args.reject_gzip,
+                      replace_rpc=not args.no_replace_rpc)
+    print(f"PostgREST stand-in listening on {standin.url}")
+    print(f"export EXPO_PUBLIC_SUPABASE_URL={standin.url} SUPABASE_SERVICE_ROLE_KEY=local")
+    try:
+        standin.server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n{json.dumps(standin.snapshot(), indent=2)}")
+        sys.exit(0)
+
+if __name__ == '__main__':
+    main()
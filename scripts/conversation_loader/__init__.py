@@ -0,0 +1,107 @@
+"""
+Conversation Loader
+
+Parses conversation files and loads them into Supabase, through PostgREST
+or straight into Postgres. scripts/loadConversation.py and
+scripts/loadConversation-secure.py are thin CLIs over this package.
+
+Submodules are imported on first use: parsing needs only the standard
+library, requests is imported when a client is created, and .env and
+the environment are not read until then either. That keeps one long-lived
+process cheap enough to load thousands of fixtures:
+
+    import conversation_loader as loader
+
+    username1, username2, messages = loader.parse(Path('chat.txt'))
+    client = loader.connect()
+    user_ids = loader.resolve_users(username1, username2, client)
+    for path in paths:
+        result = loader.load_room(path, client)
+
+Run from scripts/, or put scripts/ on PYTHONPATH.
+"""
+
+import importlib
+from typing import Dict, List
+
+_SUBMODULES: Dict[str, List[str]] = {
+    'parsing': [
+        'MAX_FILE_SIZE', 'MAX_MESSAGE_LENGTH', 'MAX_MESSAGES', 'VALID_MESSAGE_TYPES', 'USERNAME_PATTERN',
+        'HEADER_PATTERN', 'MESSAGE_PATTERN', 'TIME_GAP_PATTERN', 'TIME_UNITS', 'MAX_TIME_GAP', 'UUID_PATTERN',
+        'Message', 'ParseLimits', 'validate_file_size', 'validate_username', 'parse_time_gap', 'TOKEN_MESSAGE',
+        'TOKEN_GAP', 'TOKEN_BAD_GAP', 'TOKEN_INVALID', 'SHARD_MIN_BYTES', 'tokenize_conversation',
+        'parse_conversation_stream', 'iter_appended_messages', 'split_lines', 'parse_conversation_file',
+        'stream_conversation_file', 'PARSER_VERSION', 'parse_conversation_sharded', 'read_columns',
+        'columns_to_messages', 'iter_column_messages', 'parse', 'read_header', 'read_user_map', 'lookup_user_ids',
+        'get_room_id'
+    ],
+    'parse_cache': [
+        'PARSE_CACHE_FORMAT', 'PARSE_CACHE_MAX_BYTES', 'PARSE_CACHE_SUFFIX', 'PackedColumns', 'ParseCache',
+        'stream_cached_conversation'
+    ],
+    'journal': [
+        'JOURNAL_VERSION', 'JOURNAL_SAVE_INTERVAL', 'file_digest', 'journal_path', 'LoadJournal', 'read_journal'
+    ],
+    'ratelimit': [
+        'RATE_BURST', 'RATE_STATE', 'AIMD_DECREASE', 'AIMD_INCREASE', 'CONGESTION_STATUSES', 'CONGESTION_LATENCY',
+        'RateLimiter', 'AdaptiveConcurrency'
+    ],
+    'metrics': ['METRICS_PREFIX', 'METRICS_FORMATS', 'REQUEST_DURATION_BUCKETS', 'RunMetrics'],
+    'rooms': [
+        'DEFAULT_WORKERS', 'DEFAULT_IN_FLIGHT', 'MAX_WORKERS', 'CONFIRM_DELAY', 'BATCH_SIZE', 'MIN_BATCH_SIZE',
+        'MAX_BATCH_SIZE', 'MAX_BATCH_BYTES', 'MIN_BATCH_BYTES', 'TARGET_BATCH_LATENCY', 'REPLACE_FUNCTION',
+        'REPLACE_MAX_ROWS', 'REPLACE_MAX_BYTES', 'USER_CACHE_TTL', 'PROFILE_LOOKUP_CHUNK', 'FRIENDSHIP_LOOKUP_CHUNK',
+        'FRIENDSHIP_PAGE_SIZE', 'user_cache_path', 'journal_dir', 'parse_cache_dir', 'rate_limit_dir', 'LoadOptions',
+        'PreparedRoom', 'RoomResult', 'UserIdCache', 'fetch_user_ids', 'fetch_usernames', 'prefetch_user_ids',
+        'verify_and_get_user_ids', 'resolve_users', 'FriendshipIndex', 'fetch_friendships', 'verify_friendship',
+        'prefetch_friendships', 'prepare_room', 'iter_room_messages', 'message_row', 'iter_rows', 'open_user_cache',
+        'open_parse_cache', 'write_metrics', 'expand_inputs', 'print_summary'
+    ],
+    'export': [
+        'COPY_TABLE', 'COPY_COLUMNS', 'EXPORT_FORMATS', 'COPY_TEXT_ESCAPES', 'BACKENDS', 'DSN_ENV_VARS',
+        'copy_statement', 'write_copy_rows', 'export_rooms', 'PostgresBackend', 'find_dsn'
+    ],
+    'client': [
+        'REQUEST_TIMEOUT', 'MAX_RETRIES', 'BACKOFF_BASE', 'BACKOFF_MAX', 'RETRY_STATUSES', 'AMBIGUOUS_STATUSES',
+        'IDEMPOTENT_METHODS', 'RANGE_OPERATORS', 'RPC_DENIED_STATUSES', 'GZIP_LEVEL', 'STREAM_CHUNK_BYTES',
+        'GZIP_REFUSED_STATUSES', 'APIError', 'AmbiguousWriteError', 'PayloadTooLargeError', 'MissingFunctionError',
+        'SecureSupabaseClient', 'supabase_config', 'connect'
+    ],
+    'rest': [
+        'TYPE_CODES', 'TIMESTAMP_BYTES', 'LANDED_CHECK_CHUNK', 'FETCH_PAGE_SIZE', 'DELETE_CHUNK', 'APPEND_SPACING',
+        'ExistingRow', 'RoomDiff', 'MessageColumns', 'RowEncoder', 'Batch', 'AsyncSupabaseClient', 'BatchSizer',
+        'room_encoder', 'columnar_row', 'iter_room_columns', 'iter_batches', 'count_landed', 'insert_batch',
+        'replace_room_body', 'replace_room_rpc', 'pipelined_insert', 'write_room_async', 'write_room',
+        'message_fingerprint', 'fetch_fingerprints', 'diff_room', 'sync_room_async', 'sync_room'
+    ],
+    'verify': [
+        'SUMMARY_FUNCTION', 'CHECKSUM_BITS', 'RoomSummary', 'checksum_term', 'expected_summary', 'fetch_summary',
+        'verify_room'
+    ],
+    'snapshot': [
+        'SNAPSHOT_PAGE_SIZE', 'SNAPSHOT_COLUMNS', 'DM_ROOM_PATTERN', 'TYPICAL_MESSAGE_GAP', 'SnapshotResult',
+        'room_participants', 'iter_room_pages', 'format_time_gap', 'format_message', 'snapshot_room'
+    ],
+    'watch': [
+        'WATCH_POLL_INTERVAL', 'WATCH_READ_BYTES', 'inotify_watch', 'FileFollower', 'watch_room'
+    ],
+    'loader': [
+        'open_client', 'print_error_hint', 'is_stale_user_error', 'confirm', 'store_room', 'load_room',
+        'load_conversation', 'watch_conversation', 'snapshot_conversation', 'load_conversations'
+    ]
+}
+_EXPORTS = {name: module for module, names in _SUBMODULES.items() for name in names}
+
+__all__ = ['parse', 'resolve_users', 'load_room', 'connect']
+
+def __getattr__(name: str):
+    """Import the submodule defining name the first time it is used"""
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{module}', __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(_EXPORTS))
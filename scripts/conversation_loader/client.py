@@ -0,0 +1,386 @@
+"""PostgREST client with retries, backoff and compressed request bodies
+
+This is the only module that imports requests.
+"""
+
+import os
+import gzip
+import json
+import time
+import zlib
+import random
+import hashlib
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Any, List, Dict, Set, Tuple, Optional, Iterable, Iterator, Callable, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .metrics import RunMetrics
+from .ratelimit import CONGESTION_STATUSES, CONGESTION_LATENCY, RateLimiter, AdaptiveConcurrency
+
+# Retries
+REQUEST_TIMEOUT = 30  # seconds
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5  # seconds
+BACKOFF_MAX = 30.0  # seconds
+RETRY_STATUSES = {408, 429, 503}  # rejected before the request was applied
+AMBIGUOUS_STATUSES = {500, 502, 504}  # a write may or may not have been applied
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'DELETE', 'PATCH'}  # our PATCHes set absolute values
+RANGE_OPERATORS = {'gt', 'gte', 'lt', 'lte'}  # allowed in (operator, value) filters
+RPC_DENIED_STATUSES = {401, 403}  # the key's role may not execute the function, e.g. anon
+
+# Request bodies
+GZIP_LEVEL = 5  # most of the size win for a fraction of level 9's CPU
+STREAM_CHUNK_BYTES = 64 * 1024  # rows are sent in chunks of about this size when streaming
+GZIP_REFUSED_STATUSES = {400, 415}  # how PostgREST and proxies reject a body they can't decode
+
+class APIError(Exception):
+    """The server rejected a request with an HTTP error status"""
+    
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+class AmbiguousWriteError(Exception):
+    """A write failed in a way that may or may not have applied it"""
+
+class PayloadTooLargeError(Exception):
+    """The server rejected the request body as too large (413)"""
+
+class MissingFunctionError(Exception):
+    """The SQL function called over /rpc is not installed (404), or this key may not execute it (401/403)"""
+
+class SecureSupabaseClient:
+    """Secure wrapper for Supabase API calls"""
+    
+    def __init__(self, url: str, key: str, pool_size: int = 1, metrics: Optional[RunMetrics] = None,
+                 compress: bool = False, stream: bool = False, rate_limit: Optional[float] = None,
+                 byte_rate_limit: Optional[float] = None, rate_dir: Optional[Path] = None, autotune: bool = True):
+        self.url = url.rstrip('/')
+        self.headers = {
+            'apikey': key,
+            'Authorization': f'Bearer {key}',
+            'Content-Type': 'application/json',
+            'Prefer': 'return=minimal'
+        }
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        
+        # Keep one keep-alive connection per worker thread sharing this client
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size))
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        
+        # Separate generator so backoff jitter never disturbs parser randomness
+        self._jitter = random.Random()
+        self.metrics = metrics or RunMetrics()
+        
+        # gzip is tried until the server accepts it once, and dropped if it refuses
+        self.compress = compress
+        self.stream = stream
+        self._gzip_accepted = False
+        
+        # Functions the server reported missing are not called again
+        self._missing_functions: Set[str] = set()
+        
+        # Requests/sec and bytes/sec budgets, shared through rate_dir with every
+        # process loading into the same project; a 429 pauses everyone using them.
+        # Requests in flight are tuned AIMD-style below the pool size
+        state_path = None
+        if rate_dir and (rate_limit or byte_rate_limit):
+            state_path = rate_dir / f"{hashlib.sha256(self.url.encode('utf-8')).hexdigest()[:16]}.bucket"
+        self.limiter = RateLimiter(rate_limit, byte_rate_limit, state_path)
+        self.concurrency = AdaptiveConcurrency(pool_size) if autotune and pool_size > 1 else None
+        self._waits = threading.local()
+    
+    def close(self) -> None:
+        """Release the session's connections and the shared rate limit state file"""
+        self.limiter.close()
+        self.session.close()
+    
+    def backoff_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Jittered exponential backoff, honoring a Retry-After header"""
+        if retry_after:
+            try:
+                return min(float(retry_after), BACKOFF_MAX)
+            except ValueError:
+                try:
+                    when = parsedate_to_datetime(retry_after)
+                    return min(max((when - datetime.now(timezone.utc)).total_seconds(), 0), BACKOFF_MAX)
+                except (TypeError, ValueError):
+                    pass
+        return self._jitter.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+    
+    def _make_request(self, method: str, endpoint: str,
+                      body: Union[bytes, Callable[[], Iterable[bytes]], None] = None,
+                      **kwargs) -> requests.Response:
+        """Make HTTP request with error handling and retries
+        
+        body is a JSON request body, or a function returning its chunks to stream
+        it; either is gzip-compressed when compression is on.
+        """
+        url = f"{self.url}/rest/v1/{endpoint}"
+        idempotent = method in IDEMPOTENT_METHODS
+        headers = kwargs.pop('headers', None) or {}
+        
+        for attempt in range(MAX_RETRIES + 1):
+            retry_after = None
+            sizes = [0, 0]  # body bytes before and after compression
+            compressed = body is not None and self.compress
+            kwargs['headers'] = {**headers, 'Content-Encoding': 'gzip'} if compressed else headers
+            if body is not None:
+                kwargs['data'] = self._request_body(body, compressed, sizes)
+            self._throttle()
+            started = time.perf_counter()
+            response = None
+            try:
+                response = self.session.request(method, url, timeout=REQUEST_TIMEOUT, **kwargs)
+            except requests.exceptions.ConnectTimeout as e:
+                self._record(method, endpoint, started, attempt, None, kwargs, sizes if body is not None else None)
+                error = e  # never reached the server
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                self._record(method, endpoint, started, attempt, None, kwargs, sizes if body is not None else None)
+                if not idempotent:
+                    raise AmbiguousWriteError(f"API request failed: {str(e)}")
+                error = e
+            else:
+                self._record(method, endpoint, started, attempt, response, kwargs, sizes if body is not None else None)
+                if compressed and self._gzip_refused(response):
+                    # Nothing was stored; send this and every later body uncompressed
+                    self.compress = False
+                    self.metrics.incr('gzip_refused')
+                    print(f"Warning: Server refused gzip request bodies ({response.status_code}); "
+                          f"sending them uncompressed")
+                    error = f"{response.status_code} {response.reason}"
+                    continue
+                if compressed and response.ok:
+                    self._gzip_accepted = True
+                if response.status_code == 413:
+                    raise PayloadTooLargeError(f"API request failed: {response.status_code} payload too large")
+                if response.status_code == 404 and endpoint.startswith('rpc/'):
+                    self._missing_functions.add(endpoint[len('rpc/'):])
+                    raise MissingFunctionError(f"API request failed: {endpoint} not found")
+                if response.status_code in RPC_DENIED_STATUSES and endpoint.startswith('rpc/'):
+                    self._missing_functions.add(endpoint[len('rpc/'):])
+                    raise MissingFunctionError(f"API request failed: {endpoint} not allowed for this key")
+                if response.status_code in AMBIGUOUS_STATUSES and not idempotent:
+                    raise AmbiguousWriteError(f"API request failed: {response.status_code} {response.reason}")
+                if response.status_code not in RETRY_STATUSES | AMBIGUOUS_STATUSES:
+                    try:
+                        response.raise_for_status()
+                    except requests.exceptions.RequestException as e:
+                        raise APIError(f"API request failed: {str(e)}", response.status_code)
+                    return response
+                error = f"{response.status_code} {response.reason}"
+                retry_after = response.headers.get('Retry-After')
+            finally:
+                self._release(started, response)
+            
+            if attempt < MAX_RETRIES:
+                delay = self.backoff_delay(attempt, retry_after)
+                if response is not None and response.status_code == 429:
+                    # Back off every thread and process sharing the limits, not just this one
+                    self.limiter.pause(delay)
+                time.sleep(delay)
+        
+        raise Exception(f"API request failed after {MAX_RETRIES} retries: {error}")
+    
+    def _request_body(self, body: Union[bytes, Callable[[], Iterable[bytes]]], compress: bool,
+                      sizes: List[int]) -> Union[bytes, Iterator[bytes]]:
+        """Body for one attempt, counting bytes before and after compression into sizes"""
+        if isinstance(body, bytes):
+            data = gzip.compress(body, GZIP_LEVEL, mtime=0) if compress else body
+            sizes[:] = [len(body), len(data)]
+            return data
+        
+        # Streamed bodies are rebuilt from the factory on every attempt
+        def chunks() -> Iterator[bytes]:
+            compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31) if compress else None
+            for chunk in body():
+                sizes[0] += len(chunk)
+                if compressor:
+                    chunk = compressor.compress(chunk)
+                if chunk:
+                    sizes[1] += len(chunk)
+                    yield chunk
+            if compressor:
+                tail = compressor.flush()
+                sizes[1] += len(tail)
+                yield tail
+        
+        return chunks()
+    
+    def throttled(self) -> float:
+        """Seconds this thread has spent waiting for the rate and concurrency limits"""
+        return getattr(self._waits, 'seconds', 0.0)
+    
+    def _throttle(self) -> None:
+        """Wait for the rate limits' budget, then for room under the concurrency limit"""
+        started = time.perf_counter()
+        waited = self.limiter.acquire()
+        if waited:
+            self.metrics.add_phase('rate_limit_wait', waited)
+        if self.concurrency:
+            self.concurrency.acquire()
+        self._waits.seconds = self.throttled() + time.perf_counter() - started
+    
+    def _release(self, started: float, response: Optional[requests.Response]) -> None:
+        """Feed an attempt's outcome to the concurrency limit"""
+        if not self.concurrency:
+            return
+        congested = (response is None or response.status_code in CONGESTION_STATUSES
+                     or time.perf_counter() - started > CONGESTION_LATENCY)
+        if self.concurrency.release(started, congested):
+            self.metrics.incr('concurrency_decreases')
+    
+    def _gzip_refused(self, response: requests.Response) -> bool:
+        """A 415, or a 400 before gzip has ever worked, means the body couldn't be decoded"""
+        if response.status_code == 415:
+            return True
+        return response.status_code in GZIP_REFUSED_STATUSES and not self._gzip_accepted
+    
+    def _record(self, method: str, endpoint: str, started: float, attempt: int,
+                response: Optional[requests.Response], kwargs: Dict, sizes: Optional[List[int]] = None) -> None:
+        """Feed one attempt into the run metrics and the byte budget"""
+        if response is not None:
+            body = response.request.body
+            status = str(response.status_code)
+            received = len(response.content or b'')
+        else:
+            body = kwargs.get('data')
+            status = 'error'
+            received = 0
+        
+        if sizes is not None:
+            sent = sizes[1]
+            self.metrics.incr('body_bytes', sizes[0])
+            self.metrics.incr('body_bytes_sent', sizes[1])
+            self.metrics.incr('body_bytes_saved', sizes[0] - sizes[1])
+        else:
+            sent = len(body) if isinstance(body, (bytes, str)) else 0
+        self.metrics.record_request(method, endpoint.split('?')[0], status, time.perf_counter() - started,
+                                    sent, received, attempt > 0)
+        self.limiter.charge(sent + received)
+    
+    def _filter_params(self, filters: Dict) -> Dict[str, str]:
+        """Build PostgREST filters using built-in operators to prevent injection"""
+        params = {}
+        for key, value in filters.items():
+            if isinstance(value, list):
+                # Use IN operator for lists, quoting reserved characters
+                params[key] = 'in.({})'.format(','.join(json.dumps(str(v)) for v in value))
+            elif isinstance(value, tuple):
+                # Range comparisons, e.g. ('gt', timestamp)
+                op, operand = value
+                if op not in RANGE_OPERATORS:
+                    raise ValueError(f"Unsupported filter operator: {op}")
+                params[key] = f'{op}.{operand}'
+            else:
+                params[key] = f'eq.{value}'
+        return params
+    
+    def _keyset_param(self, after: Dict[str, Any]) -> str:
+        """PostgREST or= filter for rows after a position in ascending (col1, col2, ...) order"""
+        terms = []
+        keys = list(after.items())
+        for i, (column, value) in enumerate(keys):
+            # Quoted, since timestamps contain PostgREST's reserved . and :
+            conditions = [f'{c}.eq.{json.dumps(str(v))}' for c, v in keys[:i]]
+            conditions.append(f'{column}.gt.{json.dumps(str(value))}')
+            terms.append(conditions[0] if len(conditions) == 1 else f"and({','.join(conditions)})")
+        return f"({','.join(terms)})"
+    
+    def select(self, table: str, columns: str = '*', filters: Optional[Dict] = None,
+               order: Optional[str] = None, limit: Optional[int] = None,
+               offset: Optional[int] = None, after: Optional[Dict[str, Any]] = None) -> List[Dict]:
+        """Secure SELECT query; after pages by keyset, e.g. {'created_at': ..., 'id': ...} with a matching order"""
+        params = {'select': columns}
+        if filters:
+            params.update(self._filter_params(filters))
+        if after:
+            params['or'] = self._keyset_param(after)
+        if order:
+            params['order'] = order
+        if limit is not None:
+            params['limit'] = str(limit)
+        if offset:
+            params['offset'] = str(offset)
+        
+        response = self._make_request('GET', table, params=params)
+        return response.json() if response.text else []
+    
+    def update(self, table: str, filters: Dict, data: Dict) -> bool:
+        """Secure UPDATE query"""
+        params = self._filter_params(filters)
+        
+        response = self._make_request('PATCH', table, params=params, json=data)
+        return response.status_code in [200, 204]
+    
+    def count(self, table: str, filters: Dict) -> int:
+        """Exact row count without fetching rows"""
+        response = self._make_request(
+            'HEAD', table,
+            params=self._filter_params(filters),
+            headers={'Prefer': 'count=exact'}
+        )
+        # Content-Range looks like "0-24/25" or "*/0"
+        return int(response.headers.get('Content-Range', '*/0').rsplit('/', 1)[1])
+    
+    def has_function(self, function: str) -> bool:
+        """False once a call has shown the SQL function is not installed or not allowed"""
+        return function not in self._missing_functions
+    
+    def rpc(self, function: str, args: Optional[Dict] = None, read_only: bool = False) -> Any:
+        """Call a SQL function; read-only ones go over GET, so they are retried like selects"""
+        if not self.has_function(function):
+            raise MissingFunctionError(f"rpc/{function} not found")
+        if read_only:
+            response = self._make_request('GET', f'rpc/{function}', params=args or {})
+        else:
+            response = self._make_request('POST', f'rpc/{function}', json=args or {})
+        return response.json() if response.text else None
+    
+    def rpc_json(self, function: str, body: Union[bytes, Callable[[], Iterable[bytes]]]) -> Any:
+        """Call a SQL function with arguments that are already JSON-encoded, or a factory of their chunks"""
+        if not self.has_function(function):
+            raise MissingFunctionError(f"rpc/{function} not found")
+        response = self._make_request('POST', f'rpc/{function}', body=body)
+        return response.json() if response.text else None
+    
+    def delete(self, table: str, filters: Dict) -> bool:
+        """Secure DELETE query"""
+        params = self._filter_params(filters)
+        
+        response = self._make_request('DELETE', table, params=params)
+        return response.status_code in [200, 204]
+    
+    def insert(self, table: str, data: List[Dict]) -> bool:
+        """Secure INSERT query"""
+        response = self._make_request('POST', table, json=data)
+        return response.status_code in [200, 201]
+    
+    def insert_json(self, table: str, body: Union[bytes, Callable[[], Iterable[bytes]]]) -> bool:
+        """INSERT with a request body that is already JSON-encoded, or a factory of its chunks"""
+        response = self._make_request('POST', table, body=body)
+        return response.status_code in [200, 201]
+
+def supabase_config() -> Tuple[Optional[str], Optional[str]]:
+    """Supabase URL and service role key from the environment, after loading .env"""
+    from dotenv import load_dotenv
+    load_dotenv()
+    return os.getenv('EXPO_PUBLIC_SUPABASE_URL'), os.getenv('SUPABASE_SERVICE_ROLE_KEY')
+
+def connect(url: Optional[str] = None, key: Optional[str] = None, **kwargs) -> SecureSupabaseClient:
+    """Client for the configured project; kwargs go to SecureSupabaseClient"""
+    if not url or not key:
+        env_url, env_key = supabase_config()
+        url, key = url or env_url, key or env_key
+    if not url or not key:
+        raise ValueError("Missing EXPO_PUBLIC_SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY")
+    if not url.startswith(('http://', 'https://')):
+        raise ValueError("Invalid SUPABASE_URL format")
+    return SecureSupabaseClient(url, key, **kwargs)
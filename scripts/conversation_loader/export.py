@@ -0,0 +1,203 @@
+"""Writing rooms without PostgREST: psql COPY scripts and a direct Postgres backend"""
+
+import os
+import csv
+import time
+import queue
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Dict, Optional, Iterable, Iterator, TextIO
+
+from .metrics import RunMetrics
+from .parsing import UUID_PATTERN
+from .rooms import (
+    LoadOptions, PreparedRoom, RoomResult, prepare_room, prefetch_friendships, iter_rows, open_user_cache,
+    open_parse_cache, write_metrics
+)
+
+if TYPE_CHECKING:
+    from .client import SecureSupabaseClient
+
+# Offline COPY export
+COPY_TABLE = 'public.messages'
+COPY_COLUMNS = ['room_id', 'sender_id', 'recipient_id', 'content', 'type', 'created_at']
+EXPORT_FORMATS = ['text', 'csv']
+COPY_TEXT_ESCAPES = str.maketrans({'\\': '\\\\', '\n': '\\n', '\r': '\\r', '\t': '\\t'})
+
+# Direct Postgres backend
+BACKENDS = ['rest', 'postgres']
+DSN_ENV_VARS = ['SUPABASE_DB_URL', 'DATABASE_URL']
+
+def copy_statement(fmt: str = 'text', table: str = COPY_TABLE) -> str:
+    """COPY command matching the rows written by write_copy_rows"""
+    options = ' WITH (FORMAT csv)' if fmt == 'csv' else ''
+    return f"COPY {table} ({', '.join(COPY_COLUMNS)}) FROM STDIN{options}"
+
+def write_copy_rows(out: TextIO, rows: Iterator[Dict], fmt: str = 'text') -> int:
+    """Write rows in COPY text or CSV format, returning how many were written"""
+    count = 0
+    if fmt == 'csv':
+        writer = csv.writer(out, lineterminator='\n')
+        for row in rows:
+            writer.writerow([row[column] for column in COPY_COLUMNS])
+            count += 1
+        return count
+    
+    for row in rows:
+        out.write('\t'.join(
+            '\\N' if row[column] is None else str(row[column]).translate(COPY_TEXT_ESCAPES)
+            for column in COPY_COLUMNS
+        ) + '\n')
+        count += 1
+    return count
+
+def export_rooms(file_paths: List[Path], out_path: Path, fmt: str = 'text', data_only: bool = False,
+                 client: Optional['SecureSupabaseClient'] = None,
+                 options: Optional[LoadOptions] = None) -> List[RoomResult]:
+    """Write conversations as a psql COPY script (or bare COPY data) instead of calling the API"""
+    options = options or LoadOptions()
+    metrics = client.metrics if client else RunMetrics()
+    user_cache = open_user_cache(options, client.url) if client else None
+    parse_cache = open_parse_cache(options)
+    user_map = options.user_map
+    friendships = None
+    if client:
+        try:
+            with metrics.phase('verify_friendship'):
+                user_map, friendships = prefetch_friendships(client, file_paths, user_map, user_cache)
+        except Exception as e:
+            print(f"Warning: Could not prefetch friendships: {e}")
+    results = []
+    owners: Dict[str, Path] = {}
+    
+    # Write next to the target and rename, so a failed export never leaves a truncated script
+    tmp_path = out_path.with_name(f"{out_path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, 'w', encoding='utf-8', newline='') as out:
+            if not data_only:
+                out.write("-- Conversation seed exported by loadConversation-secure.py\n")
+                out.write(f'-- Load with: psql "$DATABASE_URL" -f {out_path.name}\n')
+                out.write("\\set ON_ERROR_STOP on\n")
+            
+            for i, path in enumerate(file_paths, 1):
+                result = RoomResult(file_path=path)
+                results.append(result)
+                started = time.monotonic()
+                try:
+                    room = prepare_room(client, path, verbose=False, limits=options.limits, user_cache=user_cache,
+                                        user_map=user_map, metrics=metrics, seed=options.seed,
+                                        friendships=friendships, parse_workers=options.parse_workers,
+                                        parse_cache=parse_cache, message_types=options.message_types)
+                except Exception as e:
+                    result.error = str(e)
+                else:
+                    result.room_id = room.room_id
+                    result.users = f"@{room.username1} @{room.username2}"
+                    if room.room_id in owners:
+                        result.error = f"Room already exported from {owners[room.room_id]}"
+                    else:
+                        owners[room.room_id] = path
+                        # Each room replaces its messages atomically, like a non-incremental load
+                        if not data_only:
+                            room_literal = room.room_id.replace("'", "''")
+                            out.write(f"\nBEGIN;\nDELETE FROM {COPY_TABLE} WHERE room_id = '{room_literal}';\n")
+                            out.write(copy_statement(fmt) + ';\n')
+                        with metrics.phase('export'):
+                            result.messages = write_copy_rows(out, iter_rows(room), fmt)
+                        if not data_only:
+                            out.write("\\.\nCOMMIT;\n")
+                        metrics.incr('rows_exported', result.messages)
+                result.elapsed = time.monotonic() - started
+                
+                status = '✓' if result.error is None else '✗'
+                print(f"[{i}/{len(file_paths)}] {status} {path.name}")
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    finally:
+        metrics.incr('rooms_loaded', sum(1 for r in results if r.error is None))
+        metrics.incr('rooms_failed', sum(1 for r in results if r.error is not None))
+        write_metrics(metrics, options)
+    
+    return results
+
+class PostgresBackend:
+    """Writes rooms straight to Postgres: purge and COPY in one transaction per room"""
+    
+    def __init__(self, dsn: str, pool_size: int = 1, metrics: Optional[RunMetrics] = None, table: str = COPY_TABLE):
+        try:
+            import psycopg
+        except ImportError:
+            raise RuntimeError("The postgres backend requires psycopg: pip install 'psycopg[binary]'")
+        self._psycopg = psycopg
+        self.dsn = dsn
+        self.table = table  # schema-qualified messages table
+        self.metrics = metrics or RunMetrics()
+        # Connections are opened on demand and reused by later rooms
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max(1, pool_size))
+    
+    @contextmanager
+    def connection(self):
+        """Borrow a pooled connection, replacing it if it broke"""
+        with self._slots:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = None
+            if conn is None or conn.closed:
+                with self.metrics.phase('connect'):
+                    conn = self._psycopg.connect(self.dsn, autocommit=True)
+            try:
+                yield conn
+            finally:
+                if conn.broken or conn.closed:
+                    conn.close()
+                else:
+                    self._idle.put(conn)
+    
+    def fetch_user_ids(self, usernames: Iterable[str]) -> Dict[str, str]:
+        """Resolve usernames with a single profiles query"""
+        wanted = sorted({u.lower() for u in usernames})
+        with self.connection() as conn:
+            rows = conn.execute(
+                "SELECT id::text, username FROM public.profiles WHERE username = ANY(%s)", (wanted,)
+            ).fetchall()
+        
+        user_map = {}
+        for user_id, username in rows:
+            if not UUID_PATTERN.match(user_id):
+                raise ValueError(f"Invalid user ID format for {username}")
+            user_map[username] = user_id
+        return user_map
+    
+    def replace_room(self, room: PreparedRoom) -> int:
+        """Delete the room and COPY its rows in, atomically"""
+        count = 0
+        with self.connection() as conn, conn.transaction(), conn.cursor() as cur:
+            with self.metrics.phase('delete'):
+                cur.execute(f"DELETE FROM {self.table} WHERE room_id = %s", (room.room_id,))
+            with self.metrics.phase('insert'), cur.copy(copy_statement(table=self.table)) as copy:
+                for row in iter_rows(room):
+                    copy.write_row([row[column] for column in COPY_COLUMNS])
+                    count += 1
+        self.metrics.incr('rows_inserted', count)
+        return count
+    
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+def find_dsn() -> Optional[str]:
+    """Postgres connection string from the environment, after loading .env"""
+    from dotenv import load_dotenv
+    load_dotenv()
+    for name in DSN_ENV_VARS:
+        if os.getenv(name):
+            return os.getenv(name)
+    return None
@@ -0,0 +1,99 @@
+"""Progress journals that let an interrupted full load resume"""
+
+import os
+import json
+import time
+import hashlib
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+JOURNAL_VERSION = 1
+JOURNAL_SAVE_INTERVAL = 1.0  # seconds between journal writes while a room loads
+
+def file_digest(path: Path) -> str:
+    """sha256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def journal_path(file_path: Path, directory: Path) -> Path:
+    """Journal location for a conversation file, keyed by its absolute path"""
+    key = hashlib.sha256(str(file_path.resolve()).encode('utf-8')).hexdigest()[:16]
+    return directory / f"{key}.json"
+
+class LoadJournal:
+    """On-disk progress of one room's full load: rows [0, rows_done) are confirmed stored"""
+
+    def __init__(self, path: Path, file_hash: str, room_id: str, jitter_seed: int, base: str,
+                 message_count: int, rows_done: int = 0, last_batch: int = 0, confirmed_until: str = ''):
+        self.path = path
+        self.file_hash = file_hash
+        self.room_id = room_id
+        self.jitter_seed = jitter_seed  # replays the same gaps between messages
+        self.base = base  # created_at base timestamp, so resumed rows line up with stored ones
+        self.message_count = message_count
+        self.rows_done = rows_done
+        self.last_batch = last_batch
+        self.confirmed_until = confirmed_until  # created_at of row rows_done - 1
+        self._acked: Dict[int, Tuple[int, int, str]] = {}  # start -> (end, batch number, last created_at)
+        self._saved = 0.0
+
+    @classmethod
+    def read(cls, path: Path) -> Optional['LoadJournal']:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != JOURNAL_VERSION:
+                return None
+            return cls(path, data['file_hash'], data['room_id'], int(data['jitter_seed']), data['base'],
+                       int(data['message_count']), int(data['rows_done']), int(data['last_batch']),
+                       data['confirmed_until'])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def ack(self, start: int, count: int, batch_number: int, last_created_at: str) -> None:
+        """Record a stored batch; progress only advances over a gap-free prefix of rows"""
+        self._acked[start] = (start + count, batch_number, last_created_at)
+        advanced = False
+        while self.rows_done in self._acked:
+            self.rows_done, self.last_batch, self.confirmed_until = self._acked.pop(self.rows_done)
+            advanced = True
+        if advanced and time.monotonic() - self._saved >= JOURNAL_SAVE_INTERVAL:
+            self.save()
+
+    def to_dict(self) -> Dict:
+        return {
+            'version': JOURNAL_VERSION,
+            'file_hash': self.file_hash,
+            'room_id': self.room_id,
+            'jitter_seed': self.jitter_seed,
+            'base': self.base,
+            'message_count': self.message_count,
+            'rows_done': self.rows_done,
+            'last_batch': self.last_batch,
+            'confirmed_until': self.confirmed_until
+        }
+
+    def save(self) -> None:
+        """Write atomically, so a crash mid-write keeps the previous checkpoint"""
+        self._saved = time.monotonic()
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.to_dict(), f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Warning: Could not write load journal {self.path}: {e}")
+
+    def remove(self) -> None:
+        self.path.unlink(missing_ok=True)
+
+def read_journal(file_path: Path, directory: Path) -> Optional[LoadJournal]:
+    """The file's journal, if one exists and the file hasn't changed since"""
+    journal = LoadJournal.read(journal_path(file_path, directory))
+    if journal is None or journal.file_hash != file_digest(file_path):
+        return None
+    return journal
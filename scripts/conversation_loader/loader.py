@@ -0,0 +1,337 @@
+"""Loading conversation files: one room, or many concurrently"""
+
+import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Optional, Union
+
+from .client import APIError, SecureSupabaseClient, connect
+from .export import PostgresBackend
+from .parsing import read_header, get_room_id
+from .rooms import (
+    LoadOptions, PreparedRoom, RoomResult, UserIdCache, FriendshipIndex, CONFIRM_DELAY, DEFAULT_WORKERS,
+    MAX_WORKERS, prefetch_user_ids, prefetch_friendships, prepare_room, verify_and_get_user_ids, open_user_cache,
+    open_parse_cache, rate_limit_dir, write_metrics
+)
+from .rest import RoomDiff, write_room, sync_room
+from .snapshot import snapshot_room
+from .verify import verify_room
+from .watch import watch_room
+
+def open_client(options: LoadOptions, pool_size: int = 1) -> SecureSupabaseClient:
+    """Client for the configured project, with the run's compression and rate limits"""
+    return connect(pool_size=pool_size, compress=options.compress, stream=options.stream,
+                   rate_limit=options.rate_limit, byte_rate_limit=options.byte_rate_limit,
+                   rate_dir=rate_limit_dir(), autotune=options.autotune)
+
+def print_error_hint(error: Exception) -> None:
+    """Explain the most common failure cause"""
+    if "permission denied" in str(error).lower():
+        print("\nThis script requires SUPABASE_SERVICE_ROLE_KEY for full access.")
+        print("Make sure you have the service role key in your .env file.")
+
+def is_stale_user_error(error: Exception) -> bool:
+    """Foreign key failures usually mean a cached profile id no longer exists"""
+    if isinstance(error, APIError):
+        return error.status_code == 409
+    return 'foreign key' in str(error).lower()
+
+def confirm(message: str) -> None:
+    """Give the user a chance to cancel before writing"""
+    print(message)
+    print(f"Press Ctrl+C to cancel, or wait {CONFIRM_DELAY} seconds to continue...")
+    time.sleep(CONFIRM_DELAY)
+
+def store_room(room: PreparedRoom, client: Optional[SecureSupabaseClient] = None,
+               options: Optional[LoadOptions] = None,
+               backend: Optional[PostgresBackend] = None) -> Optional[RoomDiff]:
+    """Write a prepared room through the backend or the API, verifying it if asked;
+    returns the changes of an incremental sync"""
+    options = options or LoadOptions()
+    if backend:
+        backend.replace_room(room)
+        return None
+    if options.incremental:
+        changes, base = sync_room(client, room, show_progress=False, options=options), None
+    else:
+        write_room(client, room, show_progress=False, options=options)
+        changes, base = None, datetime.fromisoformat(room.journal.base)
+    if options.verify:
+        verify_room(client, room, base)
+    return changes
+
+def load_room(file_path: Union[str, Path], client: Optional[SecureSupabaseClient] = None,
+              options: Optional[LoadOptions] = None, backend: Optional[PostgresBackend] = None,
+              user_cache: Optional[UserIdCache] = None) -> RoomResult:
+    """Parse, verify and write one conversation file without prompting; raises on failure
+    
+    Pass the same client (or backend) to every call to reuse its connections;
+    without one, a client is created from the environment.
+    """
+    options = options or LoadOptions()
+    file_path = Path(file_path)
+    owned = backend is None and client is None
+    if owned:
+        client = open_client(options, pool_size=options.in_flight)
+    metrics = backend.metrics if backend else client.metrics
+    started = time.monotonic()
+    
+    try:
+        user_map = options.user_map
+        if backend and user_map is None:
+            with metrics.phase('verify_users'):
+                user_map = backend.fetch_user_ids(read_header(file_path))
+        room = prepare_room(None if backend else client, file_path, verbose=False, limits=options.limits,
+                            user_cache=user_cache, user_map=user_map, metrics=metrics, seed=options.seed,
+                            resume=options.resume and backend is None, parse_workers=options.parse_workers,
+                            parse_cache=open_parse_cache(options), message_types=options.message_types)
+        changes = store_room(room, client, options, backend)
+    finally:
+        if owned:
+            client.close()
+    return RoomResult(
+        file_path=file_path,
+        room_id=room.room_id,
+        users=f"@{room.username1} @{room.username2}",
+        messages=room.message_count,
+        elapsed=time.monotonic() - started,
+        changes=changes
+    )
+
+def load_conversation(file_path: Path, assume_yes: bool = False,
+                      options: Optional[LoadOptions] = None) -> None:
+    """Main function to load conversation"""
+    options = options or LoadOptions()
+    client = open_client(options, pool_size=options.in_flight)
+    user_cache = open_user_cache(options, client.url)
+    room = None
+    
+    try:
+        room = prepare_room(client, file_path, limits=options.limits, user_cache=user_cache,
+                            user_map=options.user_map, seed=options.seed, resume=options.resume,
+                            parse_workers=options.parse_workers, parse_cache=open_parse_cache(options),
+                            message_types=options.message_types)
+        
+        # Confirmation
+        if not assume_yes:
+            if room.journal:
+                confirm(f"\n⚠️  This will replace messages after row {room.journal.rows_done} of this conversation.")
+            elif options.incremental:
+                confirm("\n⚠️  This will update existing messages in this conversation to match the file.")
+            else:
+                confirm("\n⚠️  This will DELETE all existing messages in this conversation.")
+        
+        if options.incremental:
+            diff = sync_room(client, room, options=options)
+            base = None
+            print("\n✅ Successfully synced conversation!")
+            print(f"- Changes: {diff}")
+        else:
+            write_room(client, room, options=options)
+            base = datetime.fromisoformat(room.journal.base)
+            print("\n\n✅ Successfully loaded conversation!")
+        if options.verify:
+            summary = verify_room(client, room, base)
+            checked = 'count, time range and checksum' if summary.checksum is not None else 'count and time range'
+            print(f"- Verified: {checked} match the file")
+        print(f"- Total messages: {room.message_count}")
+        print(f"- Between: @{room.username1} and @{room.username2}")
+        print(f"- Room ID: {room.room_id}")
+        client.metrics.incr('rooms_loaded')
+        
+    except Exception as e:
+        client.metrics.incr('rooms_failed')
+        print(f"\n❌ Error: {e}")
+        print_error_hint(e)
+        if user_cache and room and is_stale_user_error(e):
+            user_cache.invalidate([room.username1, room.username2])
+            print("Cached user IDs for this conversation were cleared; run again to re-resolve them.")
+        if room and room.journal and room.journal.path.exists():
+            print(f"Progress was saved after row {room.journal.rows_done} of {room.message_count}; "
+                  f"run again with --resume to continue from there.")
+        sys.exit(1)
+    finally:
+        write_metrics(client.metrics, options)
+        client.close()
+
+def watch_conversation(file_path: Path, options: Optional[LoadOptions] = None, from_start: bool = False,
+                       idle_timeout: Optional[float] = None) -> None:
+    """Stream lines appended to a conversation file into its room until Ctrl+C"""
+    options = options or LoadOptions()
+    client = open_client(options)
+    user_cache = open_user_cache(options, client.url)
+    started = time.monotonic()
+    
+    try:
+        inserted = watch_room(client, file_path, options, user_cache, from_start=from_start,
+                              idle_timeout=idle_timeout)
+        elapsed = time.monotonic() - started
+        print(f"\n✅ Inserted {inserted} messages in {elapsed:.0f}s ({inserted / max(elapsed, 1e-9):.1f}/s)")
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+        print_error_hint(e)
+        sys.exit(1)
+    finally:
+        write_metrics(client.metrics, options)
+        client.close()
+
+def snapshot_conversation(room: List[str], out_path: Path, options: Optional[LoadOptions] = None) -> None:
+    """Write a stored room, given by room id or its two usernames, as a conversation file"""
+    options = options or LoadOptions()
+    client = open_client(options)
+    user_cache = open_user_cache(options, client.url)
+    started = time.monotonic()
+    
+    try:
+        if len(room) == 2:
+            username1, username2 = (name.lstrip('@') for name in room)
+            user_ids = verify_and_get_user_ids(client, username1, username2, user_cache)
+            room_id = get_room_id(user_ids[username1.lower()], user_ids[username2.lower()])
+        else:
+            room_id = room[0]
+        with client.metrics.phase('snapshot'):
+            result = snapshot_room(client, room_id, out_path, user_cache)
+        client.metrics.incr('rows_exported', result.messages)
+        
+        elapsed = time.monotonic() - started
+        print(f"✅ Wrote {result.messages} messages between {result.users} to {out_path} "
+              f"in {elapsed:.1f}s ({result.gaps} time gaps)")
+        if result.skipped:
+            print(f"- Skipped {result.skipped} rows from other senders or without content")
+        print(f"- Room ID: {room_id}")
+        print(f"\nLoad with: python scripts/loadConversation-secure.py {out_path}")
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+        print_error_hint(e)
+        sys.exit(1)
+    finally:
+        write_metrics(client.metrics, options)
+        client.close()
+
+def load_conversations(file_paths: List[Path], workers: int = DEFAULT_WORKERS,
+                       assume_yes: bool = False, options: Optional[LoadOptions] = None,
+                       backend: Optional[PostgresBackend] = None) -> List[RoomResult]:
+    """Load many conversation files concurrently over one pooled session, or a Postgres backend"""
+    options = options or LoadOptions()
+    workers = max(1, min(workers, MAX_WORKERS, len(file_paths)))
+    client = None
+    user_cache = None
+    if backend is None:
+        client = open_client(options, pool_size=workers * max(1, options.in_flight))
+        user_cache = open_user_cache(options, client.url)
+    metrics = backend.metrics if backend else client.metrics
+    user_map = options.user_map
+    friendships: Optional[FriendshipIndex] = None
+    parse_cache = open_parse_cache(options)
+    results = {path: RoomResult(file_path=path) for path in file_paths}
+    
+    def prepare(path: Path) -> Optional[PreparedRoom]:
+        try:
+            return prepare_room(client, path, verbose=False, limits=options.limits, user_cache=user_cache,
+                                user_map=user_map, metrics=metrics, seed=options.seed,
+                                resume=options.resume and backend is None, friendships=friendships,
+                                parse_workers=options.parse_workers, parse_cache=parse_cache,
+                                message_types=options.message_types)
+        except Exception as e:
+            results[path].error = str(e)
+            return None
+    
+    try:
+        # One profiles query up front instead of one per file
+        if backend and user_map is None:
+            usernames = set()
+            for path in file_paths:
+                try:
+                    usernames.update(read_header(path))
+                except (OSError, ValueError):
+                    continue  # reported when the file itself is prepared
+            with metrics.phase('verify_users'):
+                user_map = backend.fetch_user_ids(usernames)
+            print(f"Resolved {len(user_map)} users")
+        elif user_cache and user_map is None:
+            try:
+                resolved = prefetch_user_ids(client, file_paths, user_cache)
+                print(f"Resolved {resolved} users")
+            except Exception as e:
+                print(f"Warning: Could not prefetch user IDs: {e}")
+        
+        # Likewise one friendships query for every pair, instead of one per room
+        if client:
+            try:
+                with metrics.phase('verify_friendship'):
+                    user_map, friendships = prefetch_friendships(client, file_paths, user_map, user_cache)
+                print(f"Checked {len(friendships)} friendships")
+            except Exception as e:
+                print(f"Warning: Could not prefetch friendships: {e}")
+        
+        print(f"Preparing {len(file_paths)} conversation files with {workers} workers...")
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            prepared = list(pool.map(prepare, file_paths))
+        
+        # Two files for the same pair of users would race on one room
+        rooms = []
+        owners: Dict[str, Path] = {}
+        for room in prepared:
+            if room is None:
+                continue
+            result = results[room.file_path]
+            result.room_id = room.room_id
+            result.users = f"@{room.username1} @{room.username2}"
+            if room.room_id in owners:
+                result.error = f"Room already loaded from {owners[room.room_id]}"
+                continue
+            owners[room.room_id] = room.file_path
+            rooms.append(room)
+        
+        if not rooms:
+            return list(results.values())
+        
+        # Single confirmation for the whole run
+        total_messages = sum(room.message_count for room in rooms)
+        print(f"\nReady to load {total_messages} messages into {len(rooms)} rooms.")
+        resumed = sum(1 for room in rooms if room.journal)
+        if resumed:
+            print(f"{resumed} interrupted loads will resume from their last saved row.")
+        if not assume_yes:
+            if options.incremental:
+                confirm("⚠️  This will update existing messages in these conversations to match the files.")
+            else:
+                confirm("⚠️  This will DELETE all existing messages in these conversations.")
+        
+        done = 0
+        lock = threading.Lock()
+        
+        def load(room: PreparedRoom) -> None:
+            nonlocal done
+            result = results[room.file_path]
+            started = time.monotonic()
+            try:
+                result.changes = store_room(room, client, options, backend)
+                result.messages = room.message_count
+            except Exception as e:
+                result.error = str(e)
+                if user_cache and is_stale_user_error(e):
+                    user_cache.invalidate([room.username1, room.username2])
+                if room.journal and room.journal.path.exists():
+                    result.error += f" (saved after row {room.journal.rows_done}; --resume continues)"
+            result.elapsed = time.monotonic() - started
+            
+            with lock:
+                done += 1
+                status = '✓' if result.error is None else '✗'
+                print(f"[{done}/{len(rooms)}] {status} {room.file_path.name}")
+        
+        print()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(load, rooms))
+        
+        return list(results.values())
+    finally:
+        metrics.incr('rooms_loaded', sum(1 for r in results.values() if r.error is None))
+        metrics.incr('rooms_failed', sum(1 for r in results.values() if r.error is not None))
+        write_metrics(metrics, options)
+        if client:
+            client.close()
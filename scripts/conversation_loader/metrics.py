@@ -0,0 +1,146 @@
+"""Phase timings and request metrics for a loader run"""
+
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Dict, Tuple, Optional
+
+# Metrics export
+METRICS_PREFIX = 'snappy_loader'
+METRICS_FORMATS = ['json', 'prometheus']
+REQUEST_DURATION_BUCKETS = [0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]  # seconds
+
+class RunMetrics:
+    """Phase timings and per-request counters for one loader run"""
+    
+    def __init__(self):
+        self.started = time.time()
+        self.phases: Dict[str, float] = {}  # seconds, summed across rooms and threads
+        self.counters: Dict[str, int] = {}
+        self.requests: Dict[Tuple[str, str, str], int] = {}  # (method, endpoint, status) -> count
+        self.durations: Dict[Tuple[str, str], List[float]] = {}
+        self.bytes_sent: Dict[Tuple[str, str], int] = {}
+        self.bytes_received: Dict[Tuple[str, str], int] = {}
+        self.retries: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+    
+    @contextmanager
+    def phase(self, name: str):
+        """Time a block of work under a phase name"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase(name, time.perf_counter() - started)
+    
+    def add_phase(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+    
+    def incr(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+    
+    def record_request(self, method: str, endpoint: str, status: str, seconds: float,
+                       sent: int, received: int, retry: bool) -> None:
+        """Record one HTTP attempt; status is the code or 'error' if none came back"""
+        key = (method, endpoint)
+        with self._lock:
+            self.requests[(method, endpoint, status)] = self.requests.get((method, endpoint, status), 0) + 1
+            self.durations.setdefault(key, []).append(seconds)
+            self.bytes_sent[key] = self.bytes_sent.get(key, 0) + sent
+            self.bytes_received[key] = self.bytes_received.get(key, 0) + received
+            if retry:
+                self.retries[key] = self.retries.get(key, 0) + 1
+    
+    def to_dict(self) -> Dict:
+        """JSON-friendly snapshot"""
+        with self._lock:
+            requests_by_endpoint = []
+            for (method, endpoint), durations in sorted(self.durations.items()):
+                ordered = sorted(durations)
+                requests_by_endpoint.append({
+                    'method': method,
+                    'endpoint': endpoint,
+                    'count': len(ordered),
+                    'statuses': {status: n for (m, e, status), n in sorted(self.requests.items())
+                                 if (m, e) == (method, endpoint)},
+                    'retries': self.retries.get((method, endpoint), 0),
+                    'bytes_sent': self.bytes_sent.get((method, endpoint), 0),
+                    'bytes_received': self.bytes_received.get((method, endpoint), 0),
+                    'seconds': round(sum(ordered), 6),
+                    'p50': round(ordered[int(0.50 * (len(ordered) - 1))], 6),
+                    'p95': round(ordered[int(0.95 * (len(ordered) - 1))], 6),
+                    'max': round(ordered[-1], 6)
+                })
+            return {
+                'started_at': datetime.fromtimestamp(self.started, timezone.utc).isoformat(),
+                'elapsed': round(time.time() - self.started, 6),
+                'phases': {name: round(seconds, 6) for name, seconds in self.phases.items()},
+                'counters': dict(self.counters),
+                'requests': requests_by_endpoint
+            }
+    
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format, for node_exporter's textfile collector"""
+        p = METRICS_PREFIX
+        lines = [
+            f'# HELP {p}_run_start_timestamp_seconds When the run started',
+            f'# TYPE {p}_run_start_timestamp_seconds gauge',
+            f'{p}_run_start_timestamp_seconds {self.started:.3f}',
+            f'# HELP {p}_run_duration_seconds Wall time of the run',
+            f'# TYPE {p}_run_duration_seconds gauge',
+            f'{p}_run_duration_seconds {time.time() - self.started:.6f}',
+            f'# HELP {p}_phase_seconds Time spent per phase, summed across rooms and threads',
+            f'# TYPE {p}_phase_seconds gauge'
+        ]
+        with self._lock:
+            lines += [f'{p}_phase_seconds{{phase="{name}"}} {seconds:.6f}' for name, seconds in self.phases.items()]
+            
+            lines += [f'# HELP {p}_events_total Rows, rooms and other run events',
+                      f'# TYPE {p}_events_total counter']
+            lines += [f'{p}_events_total{{event="{name}"}} {n}' for name, n in sorted(self.counters.items())]
+            
+            lines += [f'# HELP {p}_requests_total HTTP attempts by status',
+                      f'# TYPE {p}_requests_total counter']
+            lines += [f'{p}_requests_total{{method="{m}",endpoint="{e}",status="{status}"}} {n}'
+                      for (m, e, status), n in sorted(self.requests.items())]
+            
+            lines += [f'# HELP {p}_request_retries_total HTTP attempts that were retries',
+                      f'# TYPE {p}_request_retries_total counter']
+            lines += [f'{p}_request_retries_total{{method="{m}",endpoint="{e}"}} {n}'
+                      for (m, e), n in sorted(self.retries.items())]
+            
+            lines += [f'# HELP {p}_request_bytes_total Request and response body bytes',
+                      f'# TYPE {p}_request_bytes_total counter']
+            for (m, e) in sorted(self.durations):
+                lines.append(f'{p}_request_bytes_total{{method="{m}",endpoint="{e}",direction="sent"}} '
+                             f'{self.bytes_sent.get((m, e), 0)}')
+                lines.append(f'{p}_request_bytes_total{{method="{m}",endpoint="{e}",direction="received"}} '
+                             f'{self.bytes_received.get((m, e), 0)}')
+            
+            lines += [f'# HELP {p}_request_duration_seconds HTTP attempt latency',
+                      f'# TYPE {p}_request_duration_seconds histogram']
+            for (m, e), durations in sorted(self.durations.items()):
+                labels = f'method="{m}",endpoint="{e}"'
+                for bucket in REQUEST_DURATION_BUCKETS:
+                    lines.append(f'{p}_request_duration_seconds_bucket{{{labels},le="{bucket}"}} '
+                                 f'{sum(1 for d in durations if d <= bucket)}')
+                lines.append(f'{p}_request_duration_seconds_bucket{{{labels},le="+Inf"}} {len(durations)}')
+                lines.append(f'{p}_request_duration_seconds_sum{{{labels}}} {sum(durations):.6f}')
+                lines.append(f'{p}_request_duration_seconds_count{{{labels}}} {len(durations)}')
+        
+        return '\n'.join(lines) + '\n'
+    
+    def write(self, path: Path, fmt: Optional[str] = None) -> None:
+        """Write atomically so a textfile collector never reads a partial file"""
+        fmt = fmt or ('prometheus' if path.suffix == '.prom' else 'json')
+        content = self.to_prometheus() if fmt == 'prometheus' else json.dumps(self.to_dict(), indent=2) + '\n'
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
@@ -0,0 +1,187 @@
+"""Parsed conversations kept on disk, keyed by file content and parser version"""
+
+import os
+import sys
+import random
+import struct
+import marshal
+import hashlib
+from array import array
+from itertools import accumulate, chain
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple, Union, Callable
+
+from .journal import file_digest
+from .parsing import (
+    PARSER_VERSION, MAX_MESSAGE_LENGTH, VALID_MESSAGE_TYPES, Message, ParseLimits, validate_file_size,
+    stream_conversation_file, read_columns, iter_column_messages
+)
+
+PARSE_CACHE_FORMAT = 2
+PARSE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+PARSE_CACHE_SUFFIX = '.parsed'
+_HEADER_SIZE = struct.Struct('<Q')  # length of the marshalled header before the columns
+
+class PackedColumns:
+    """read_columns() output with every content in one UTF-8 buffer, as a cache entry stores it
+    
+    About the file's size in memory, where a list of str and one Message per
+    line take several times that. contents() decodes them one at a time.
+    """
+    
+    def __init__(self, line_nos: array, senders: bytes, types: bytes, ends: array, blob: bytes,
+                 gaps: array, warnings: List[Tuple[int, str]], carry: int):
+        self.line_nos = line_nos
+        self.senders = senders
+        self.types = types
+        self.ends = ends  # end of each content in blob
+        self.blob = blob
+        self.gaps = gaps
+        self.warnings = warnings
+        self.carry = carry
+    
+    @classmethod
+    def pack(cls, columns: Tuple) -> 'PackedColumns':
+        line_nos, senders, types, contents, gaps, warnings, carry = columns
+        ends = array('q', accumulate(map(len, map(str.encode, contents))))
+        return cls(line_nos, senders, types, ends, ''.join(contents).encode('utf-8'), gaps, warnings, carry)
+    
+    def contents(self) -> Iterator[str]:
+        return map(bytes.decode, map(self.blob.__getitem__, map(slice, chain((0,), self.ends), self.ends)))
+    
+    def columns(self) -> Tuple:
+        """Columns for iter_column_messages(), with contents decoded as they are read"""
+        return self.line_nos, self.senders, self.types, self.contents(), self.gaps, self.warnings, self.carry
+
+class ParseCache:
+    """Size-bounded directory of parsed files, evicting the least recently used first
+    
+    An entry holds a file's header and the validated columns from
+    read_columns(), so a hit skips tokenizing and validation; the random gaps
+    are still drawn per load. Entries are keyed by the file's sha256 and
+    everything that changes what it parses to, so an edited file or a new
+    parser simply misses.
+    
+    After a marshalled header come the raw column arrays and the contents
+    buffer, read straight into place so a hit never holds two copies.
+    """
+    
+    def __init__(self, directory: Path, max_bytes: int = PARSE_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._keys: Dict[Tuple[str, int, int], str] = {}  # (path, size, mtime) -> key, saves rehashing
+    
+    def key(self, file_path: Path) -> str:
+        """Cache key for the file's current content"""
+        stat = file_path.stat()
+        memo = (str(file_path.resolve()), stat.st_size, stat.st_mtime_ns)
+        if memo not in self._keys:
+            parser = f"{PARSE_CACHE_FORMAT}:{PARSER_VERSION}:{MAX_MESSAGE_LENGTH}:{sorted(VALID_MESSAGE_TYPES)}"
+            parser += f":{marshal.version}:{sys.byteorder}"
+            self._keys[memo] = hashlib.sha256(f"{file_digest(file_path)}:{parser}".encode('utf-8')).hexdigest()
+        return self._keys[memo]
+    
+    def entry_path(self, key: str) -> Path:
+        return self.directory / f"{key}{PARSE_CACHE_SUFFIX}"
+    
+    def get(self, key: str) -> Optional[Tuple[str, str, PackedColumns]]:
+        """Header usernames and columns stored under key, or None"""
+        path = self.entry_path(key)
+        try:
+            with open(path, 'rb') as f:
+                header = f.read(_HEADER_SIZE.unpack(f.read(_HEADER_SIZE.size))[0])
+                username1, username2, count, blob_size, warnings, carry = marshal.loads(header)
+                line_nos, ends, gaps = (_read_into(f, array('q', [0]) * count) for _ in range(3))
+                senders, types = (_read_into(f, bytearray(count)) for _ in range(2))
+                blob = f.read(blob_size)
+                if len(blob) != blob_size or f.read(1):
+                    raise ValueError("Entry size doesn't match its header")
+            # Mark it recently used
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, EOFError, ValueError, TypeError, struct.error):
+            # Truncated or foreign entry: drop it and parse again
+            path.unlink(missing_ok=True)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return username1, username2, PackedColumns(line_nos, senders, types, ends, blob, gaps, warnings, carry)
+    
+    def put(self, key: str, username1: str, username2: str, packed: PackedColumns) -> None:
+        """Store an entry, then evict old ones past max_bytes; failures only cost the next parse"""
+        header = marshal.dumps((username1, username2, len(packed.senders), len(packed.blob),
+                                packed.warnings, packed.carry))
+        parts = [_HEADER_SIZE.pack(len(header)), header, packed.line_nos, packed.ends, packed.gaps,
+                 packed.senders, packed.types, packed.blob]
+        if sum(memoryview(part).nbytes for part in parts) > self.max_bytes:
+            return
+        path = self.entry_path(key)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                for part in parts:
+                    f.write(part)
+            os.replace(tmp_path, path)
+            self.evict()
+        except OSError as e:
+            tmp_path.unlink(missing_ok=True)
+            print(f"Warning: Could not write parse cache {path}: {e}")
+    
+    def evict(self) -> int:
+        """Delete least recently used entries until the cache fits in max_bytes; returns bytes freed"""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(PARSE_CACHE_SUFFIX):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue  # evicted by another process
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        
+        total = sum(size for _, size, _ in entries)
+        freed = 0
+        for _, size, path in sorted(entries):
+            if total - freed <= self.max_bytes:
+                break
+            Path(path).unlink(missing_ok=True)
+            freed += size
+        return freed
+
+def _read_into(f: BinaryIO, buffer: Union[array, bytearray]) -> Union[array, bytearray]:
+    """Fill a preallocated array or bytearray from f, raising EOFError if the file ends first"""
+    view = memoryview(buffer).cast('B')
+    if f.readinto(view) != view.nbytes:
+        raise EOFError("Truncated parse cache entry")
+    return buffer
+
+def stream_cached_conversation(file_path: Path, cache: Optional[ParseCache], limits: Optional[ParseLimits] = None,
+                               warn: Callable[[str], None] = print, rng: Optional[random.Random] = None,
+                               workers: int = 1) -> Tuple[str, str, Iterator[Message]]:
+    """stream_conversation_file(), reading and filling the parse cache when one is given
+    
+    Warnings and messages, including the gaps drawn from rng, are the same
+    as parsing the file. A hit holds the packed entry, about the file's
+    size, and builds messages as they are read; only a miss holds every
+    parsed line while the entry is written.
+    """
+    limits = limits or ParseLimits()
+    # Entries are whole files in memory; huge files keep the bounded-memory stream
+    if cache is None or file_path.stat().st_size > cache.max_bytes // 4:
+        return stream_conversation_file(file_path, limits, warn, rng, workers)
+    if limits.max_file_size is not None:
+        validate_file_size(file_path, limits.max_file_size)
+    
+    key = cache.key(file_path)
+    entry = cache.get(key)
+    if entry is None:
+        username1, username2, columns = read_columns(file_path, max(1, workers))
+        entry = username1, username2, PackedColumns.pack(columns)
+        del columns
+        cache.put(key, *entry)
+    username1, username2, packed = entry
+    return username1, username2, iter_column_messages(packed.columns(), username1, username2, limits, warn, rng)
@@ -0,0 +1,544 @@
+"""Conversation file parsing and validation (standard library only)"""
+
+import os
+import re
+import gc
+import csv
+import json
+import mmap
+import random
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from itertools import accumulate, chain
+from pathlib import Path
+from typing import List, Dict, Tuple, Optional, Iterable, Iterator, Callable, Union
+
+# Configuration
+MAX_FILE_SIZE = 1024 * 1024  # 1MB, suggested --max-file-size safety cap
+MAX_MESSAGE_LENGTH = 1000
+MAX_MESSAGES = 10000  # suggested --max-messages safety cap
+VALID_MESSAGE_TYPES = ['text', 'photo', 'video', 'snap']
+USERNAME_PATTERN = re.compile(r'^[a-zA-Z0-9]{3,20}$')
+HEADER_PATTERN = re.compile(r'^@([a-zA-Z0-9]{3,20})\s+@([a-zA-Z0-9]{3,20})$')
+MESSAGE_PATTERN = re.compile(r'^([a-zA-Z0-9]{3,20})(?:\s*\(([^)]+)\))?\s*:\s*(.+)$')
+TIME_GAP_PATTERN = re.compile(r'^(\d{1,3})\s*(second|minute|hour|day)s?\s*(?:later)?$', re.IGNORECASE)
+TIME_UNITS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+MAX_TIME_GAP = 86400 * 30  # seconds
+MESSAGE_GAP_MIN = 30  # random seconds added after each message
+MESSAGE_GAP_MAX = 120
+PARSER_VERSION = 1  # bump whenever validation changes what a file parses to; keys the parse cache
+UUID_PATTERN = re.compile(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$', re.IGNORECASE)
+
+# Sharded parsing
+SHARD_MIN_BYTES = 4 * 1024 * 1024  # smaller files, or shards, aren't worth a process
+_SWAP = bytes([1, 0]) + bytes(range(2, 256))  # sender index -> recipient index
+
+@dataclass
+class Message:
+    """Validated message data"""
+    sender: str
+    recipient: str
+    content: str
+    type: str
+    time_offset: int
+
+@dataclass
+class ParseLimits:
+    """Opt-in safety caps; None means unlimited"""
+    max_file_size: Optional[int] = None
+    max_messages: Optional[int] = None
+
+def validate_file_size(file_path: Path, max_size: int = MAX_FILE_SIZE) -> None:
+    """Check file size is within limits"""
+    size = file_path.stat().st_size
+    if size > max_size:
+        raise ValueError(f"File too large: {size} bytes (max {max_size} bytes)")
+
+def validate_username(username: str) -> str:
+    """Validate and return username"""
+    if not USERNAME_PATTERN.match(username):
+        raise ValueError(f"Invalid username format: {username}")
+    return username
+
+def parse_time_gap(time_str: str) -> int:
+    """Parse time expressions safely"""
+    match = TIME_GAP_PATTERN.match(time_str)
+    if not match:
+        return 0
+    
+    amount = int(match.group(1))
+    unit = match.group(2).lower()
+    
+    seconds = amount * TIME_UNITS.get(unit, 0)
+    
+    # Validate reasonable time gaps (max 30 days)
+    if seconds > MAX_TIME_GAP:
+        raise ValueError(f"Time gap too large: {time_str}")
+    
+    return seconds
+
+# Token kinds produced by tokenize_conversation()
+TOKEN_MESSAGE = 0  # value: MESSAGE_PATTERN match
+TOKEN_GAP = 1  # value: gap in seconds
+TOKEN_BAD_GAP = 2  # value: the offending line
+TOKEN_INVALID = 3  # value: the offending line
+
+def tokenize_conversation(numbered: Iterable[Tuple[int, str]]) -> Iterator[Tuple[int, int, object]]:
+    """Classify each non-blank line after the header in a single pass"""
+    match_message = MESSAGE_PATTERN.match
+    
+    for line_no, line in numbered:
+        line = line.strip()
+        if not line:
+            continue
+        
+        # Time gap markers: -- 30 minutes later --
+        if line.startswith('--') and line.endswith('--'):
+            try:
+                yield TOKEN_GAP, line_no, parse_time_gap(line[2:-2].strip())
+            except ValueError:
+                yield TOKEN_BAD_GAP, line_no, line
+            continue
+        
+        # Message lines: sender (type): content
+        match = match_message(line)
+        if match is None:
+            yield TOKEN_INVALID, line_no, line
+        else:
+            yield TOKEN_MESSAGE, line_no, match
+
+def parse_conversation_stream(lines: Iterable[str], max_messages: Optional[int] = None,
+                              warn: Callable[[str], None] = print,
+                              rng: Optional[random.Random] = None) -> Tuple[str, str, Iterator[Message]]:
+    """Read the header eagerly and return a lazy iterator over validated messages"""
+    numbered = enumerate(lines, 1)
+    
+    # Parse header from the first non-empty line
+    for _, line in numbered:
+        header = line.strip()
+        if header:
+            break
+    else:
+        raise ValueError("Empty file")
+    
+    header_match = HEADER_PATTERN.match(header)
+    if not header_match:
+        raise ValueError("First line must contain two valid usernames like: @username1 @username2")
+    
+    username1 = validate_username(header_match.group(1))
+    username2 = validate_username(header_match.group(2))
+    
+    if username1.lower() == username2.lower():
+        raise ValueError("Cannot create conversation between same user")
+    
+    messages = _iter_messages(numbered, username1, username2, max_messages, warn, rng or random)
+    return username1, username2, messages
+
+def _iter_records(numbered: Iterable[Tuple[int, str]], username1: str, username2: str,
+                  warn: Callable[[int, str], None]) -> Iterator[Tuple[int, str, str, str, int]]:
+    """Validate message lines into (line_no, sender, type, content, explicit gap before it) records
+    
+    Deterministic and free of random gaps, so shards of a file can be validated independently.
+    """
+    gap = 0
+    message_types = {name: name for name in VALID_MESSAGE_TYPES}
+    
+    for kind, line_no, value in tokenize_conversation(numbered):
+        if kind == TOKEN_GAP:
+            gap += value
+            continue
+        if kind == TOKEN_BAD_GAP:
+            warn(line_no, f"Warning: Invalid time gap on line {line_no}: {value}")
+            continue
+        if kind == TOKEN_INVALID:
+            warn(line_no, f"Warning: Invalid message format on line {line_no}: {value}")
+            continue
+        
+        sender, msg_type, content = value.groups()
+        
+        # Validate sender
+        if sender != username1 and sender != username2:
+            warn(line_no, f"Warning: Unknown sender '{sender}' on line {line_no}")
+            continue
+        
+        # Determine message type
+        message_type = message_types.get(msg_type.lower(), 'text') if msg_type else 'text'
+        
+        # Validate and truncate content
+        content = content[:MAX_MESSAGE_LENGTH]
+        if not content:
+            warn(line_no, f"Warning: Empty message on line {line_no}")
+            continue
+        
+        yield line_no, sender, message_type, content, gap
+        gap = 0
+
+def _iter_messages(numbered: Iterator[Tuple[int, str]], username1: str, username2: str,
+                   max_messages: Optional[int], warn: Callable[[str], None], rng) -> Iterator[Message]:
+    """Yield validated messages one line at a time"""
+    return _offset_messages(_iter_records(numbered, username1, username2, lambda _, text: warn(text)),
+                            username1, username2, max_messages, warn, rng)
+
+def _offset_messages(records: Iterable[Tuple[int, str, str, str, int]], username1: str, username2: str,
+                     max_messages: Optional[int], warn: Callable[[str], None], rng,
+                     time_offset: int = 0) -> Iterator[Message]:
+    """Turn validated records into messages, adding explicit and random gaps in file order"""
+    count = 0
+    randint = rng.randint
+    
+    for _, sender, message_type, content, gap in records:
+        time_offset += gap
+        yield Message(
+            sender=sender,
+            recipient=username2 if sender == username1 else username1,
+            content=content,
+            type=message_type,
+            time_offset=time_offset
+        )
+        count += 1
+        
+        # Add realistic time gap
+        time_offset += randint(MESSAGE_GAP_MIN, MESSAGE_GAP_MAX)
+        
+        # Optional cap on total messages
+        if max_messages is not None and count >= max_messages:
+            warn(f"Warning: Reached maximum message limit ({max_messages})")
+            break
+
+def iter_appended_messages(lines: Iterable[str], username1: str, username2: str, first_line: int = 1,
+                           warn: Callable[[str], None] = print) -> Iterator[Message]:
+    """Validated messages from lines after a header that was already read, e.g. lines appended to a file
+    
+    Time offsets start from zero on every call; callers that follow a file stamp messages themselves.
+    """
+    return _iter_messages(enumerate(lines, first_line), username1, username2, None, warn, random)
+
+def split_lines(text: str) -> List[str]:
+    """Lines as a file opened with universal newlines reads them
+    
+    Unlike str.splitlines(), form feeds, U+2028 and the like stay inside a
+    message's content.
+    """
+    return text.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+
+def parse_conversation_file(content: str, max_messages: Optional[int] = None) -> Tuple[str, str, List[Message]]:
+    """Parse and validate conversation file"""
+    username1, username2, messages = parse_conversation_stream(split_lines(content), max_messages)
+    return username1, username2, list(messages)
+
+def stream_conversation_file(file_path: Path, limits: Optional[ParseLimits] = None,
+                             warn: Callable[[str], None] = print,
+                             rng: Optional[random.Random] = None,
+                             workers: int = 1) -> Tuple[str, str, Iterator[Message]]:
+    """Open a conversation file and stream its messages with bounded memory
+    
+    With workers > 1, files of at least two shards are parsed in parallel
+    instead, holding every message in memory.
+    """
+    limits = limits or ParseLimits()
+    if workers > 1 and file_path.stat().st_size >= 2 * SHARD_MIN_BYTES:
+        username1, username2, messages = parse_conversation_sharded(file_path, workers, limits, warn, rng)
+        return username1, username2, iter(messages)
+    if limits.max_file_size is not None:
+        validate_file_size(file_path, limits.max_file_size)
+    
+    f = open(file_path, 'r', encoding='utf-8')
+    try:
+        username1, username2, messages = parse_conversation_stream(f, limits.max_messages, warn, rng)
+    except Exception:
+        f.close()
+        raise
+    
+    def generate() -> Iterator[Message]:
+        with f:
+            yield from messages
+    
+    return username1, username2, generate()
+
+def _line_end(mm: mmap.mmap, pos: int) -> int:
+    """Offset just past the first line ending at or after pos: \\n, \\r\\n or \\r, as split_lines() splits"""
+    size = len(mm)
+    lf = mm.find(b'\n', pos)
+    cr = mm.find(b'\r', pos, size if lf < 0 else lf)
+    if cr >= 0:
+        return cr + 2 if mm[cr + 1:cr + 2] == b'\n' else cr + 1
+    return size if lf < 0 else lf + 1
+
+def _shard_bounds(mm: mmap.mmap, start: int, shards: int) -> List[Tuple[int, int]]:
+    """Split [start, len(mm)) into about equal ranges that end just after a line ending"""
+    size = len(mm)
+    step = max(SHARD_MIN_BYTES, -(-(size - start) // shards))
+    bounds = []
+    while start < size:
+        end = _line_end(mm, min(start + step, size) - 1)
+        bounds.append((start, end))
+        start = end
+    return bounds
+
+def _count_lines(data: bytes) -> int:
+    """Lines in data as text-mode iteration counts them (universal newlines)"""
+    return data.count(b'\n') + data.count(b'\r') - data.count(b'\r\n')
+
+def _parse_shard(file_path: str, start: int, end: int, first_line: int, username1: str, username2: str) -> Tuple:
+    """Validate one byte range of a file into columns
+    
+    Returns (line numbers, sender indexes, type codes, contents, explicit gaps,
+    warnings, explicit gap after the last message). Columns pickle far faster
+    than Message objects on the way back to the parent.
+    """
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        text = mm[start:end].decode('utf-8')
+    lines = split_lines(text)
+    
+    warnings: List[Tuple[int, str]] = []
+    type_codes = {name: i for i, name in enumerate(VALID_MESSAGE_TYPES)}
+    line_nos, gaps = array('q'), array('q')
+    senders, types = bytearray(), bytearray()
+    contents: List[str] = []
+    for line_no, sender, message_type, content, gap in _iter_records(
+            enumerate(lines, first_line), username1, username2,
+            lambda line_no, text: warnings.append((line_no, text))):
+        line_nos.append(line_no)
+        senders.append(sender != username1)
+        types.append(type_codes[message_type])
+        contents.append(content)
+        gaps.append(gap)
+    
+    # Gap markers after the last message carry over to the next shard
+    tail = lines[line_nos[-1] - first_line + 1:] if line_nos else lines
+    trailing_gap = sum(value for kind, _, value in tokenize_conversation(enumerate(tail)) if kind == TOKEN_GAP)
+    return line_nos, bytes(senders), bytes(types), contents, gaps, warnings, trailing_gap
+
+@contextmanager
+def _gc_paused() -> Iterator[None]:
+    """Skip cyclic GC passes while building millions of long-lived, acyclic objects"""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+_bulk_gaps_ok: Optional[bool] = None
+
+def _bulk_message_gaps(rng, count: int) -> Optional[bytes]:
+    """count draws of rng.randint(MESSAGE_GAP_MIN, MESSAGE_GAP_MAX) minus MESSAGE_GAP_MIN, made in bulk
+    
+    CPython's randint() takes the top bits of one 32-bit Mersenne Twister word
+    per attempt and rejects values past the range; getrandbits(32 * n) returns
+    the next n words in order, so slicing and filtering their top bytes replays
+    the same draws and leaves the generator in the same state. Returns None
+    where that doesn't hold (checked once against randint).
+    """
+    global _bulk_gaps_ok
+    if _bulk_gaps_ok is None:
+        serial, bulk = random.Random(20), random.Random(20)
+        expected = bytes(serial.randint(MESSAGE_GAP_MIN, MESSAGE_GAP_MAX) - MESSAGE_GAP_MIN for _ in range(1000))
+        _bulk_gaps_ok = True
+        _bulk_gaps_ok = _bulk_message_gaps(bulk, 1000) == expected and serial.random() == bulk.random()
+    if not _bulk_gaps_ok or not (rng is random or type(rng) is random.Random):
+        return None
+    
+    width = MESSAGE_GAP_MAX - MESSAGE_GAP_MIN + 1
+    shift = 8 - width.bit_length()
+    table = bytes(b >> shift for b in range(256))
+    rejected = bytes(b for b in range(256) if b >> shift >= width)
+    draws = bytearray()
+    while len(draws) < count:
+        # Each word yields at most one draw, so this never takes more than needed
+        words = count - len(draws)
+        data = rng.getrandbits(32 * words).to_bytes(4 * words, 'little')
+        draws += data[3::4].translate(table, rejected)
+    return bytes(draws)
+
+def parse_conversation_sharded(file_path: Path, workers: Optional[int] = None,
+                               limits: Optional[ParseLimits] = None, warn: Callable[[str], None] = print,
+                               rng: Optional[random.Random] = None) -> Tuple[str, str, List[Message]]:
+    """Parse a large file in shards across processes, with the same messages and offsets as a serial parse
+    
+    Shards are validated independently. Explicit time gaps are then carried
+    across shard boundaries and the random gaps drawn in file order, and a
+    prefix sum over both gives every message's time offset, so a given rng
+    yields exactly what stream_conversation_file() would.
+    """
+    limits = limits or ParseLimits()
+    if limits.max_file_size is not None:
+        validate_file_size(file_path, limits.max_file_size)
+    username1, username2, columns = read_columns(file_path, workers or os.cpu_count() or 1)
+    return columns_to_messages(columns, username1, username2, limits, warn, rng)
+
+def read_columns(file_path: Path, workers: int = 1) -> Tuple[str, str, Tuple]:
+    """Header usernames and the whole file's validated columns, before any random gaps
+    
+    The columns are (line numbers, sender indexes, type codes, contents,
+    explicit gaps, warnings, trailing gap) and depend only on the file, so
+    they can be kept and turned into messages again with any rng.
+    """
+    with _gc_paused():
+        username1, username2, shards = _read_shards(file_path, workers)
+        return username1, username2, _merge_shards(shards)
+
+def columns_to_messages(columns: Tuple, username1: str, username2: str, limits: Optional[ParseLimits] = None,
+                        warn: Callable[[str], None] = print,
+                        rng: Optional[random.Random] = None) -> Tuple[str, str, List[Message]]:
+    """Messages from read_columns(), exactly as stream_conversation_file() would parse them with rng"""
+    with _gc_paused():
+        return username1, username2, list(_shard_messages(columns, username1, username2, limits or ParseLimits(),
+                                                          warn, rng or random))
+
+def iter_column_messages(columns: Tuple, username1: str, username2: str, limits: Optional[ParseLimits] = None,
+                         warn: Callable[[str], None] = print,
+                         rng: Optional[random.Random] = None) -> Iterator[Message]:
+    """columns_to_messages(), built one message at a time as they are read
+    
+    The contents column may be any iterable, e.g. one decoding them lazily.
+    """
+    return _shard_messages(columns, username1, username2, limits or ParseLimits(), warn, rng or random)
+
+def _read_shards(file_path: Path, workers: int) -> Tuple[str, str, List[Tuple]]:
+    """Header usernames and the validated columns of each shard, parsed across up to workers processes"""
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if not size:
+            raise ValueError("Empty file")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # The header is whatever the serial parser reads first
+            body = 0
+            while body < size:
+                end = _line_end(mm, body)
+                header = mm[body:end].decode('utf-8')
+                body = end
+                if header.strip():
+                    break
+            username1, username2, _ = parse_conversation_stream([header])
+            
+            bounds = _shard_bounds(mm, body, workers)
+            first_lines = []
+            line_no = _count_lines(mm[:body]) + 1
+            for start, end in bounds:
+                first_lines.append(line_no)
+                line_no += _count_lines(mm[start:end])
+    
+    args = ([str(file_path)] * len(bounds), [b[0] for b in bounds], [b[1] for b in bounds], first_lines,
+            [username1] * len(bounds), [username2] * len(bounds))
+    if len(bounds) > 1 and workers > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(bounds))) as pool:
+            return username1, username2, list(pool.map(_parse_shard, *args))
+    return username1, username2, list(map(_parse_shard, *args))
+
+def _merge_shards(shards: List[Tuple]) -> Tuple:
+    """Join shard columns into those of one shard covering the whole file"""
+    # Fold each shard's trailing gap into the next message
+    line_nos, gaps = array('q'), array('q')
+    senders, types = bytearray(), bytearray()
+    contents: List[str] = []
+    warnings: List[Tuple[int, str]] = []
+    carry = 0
+    for shard_lines, shard_senders, shard_types, shard_contents, shard_gaps, shard_warnings, trailing in shards:
+        if shard_gaps:
+            shard_gaps[0] += carry
+            carry = 0
+        line_nos.extend(shard_lines)
+        senders += shard_senders
+        types += shard_types
+        contents.extend(shard_contents)
+        gaps.extend(shard_gaps)
+        warnings.extend(shard_warnings)
+        carry += trailing
+    return line_nos, bytes(senders), bytes(types), contents, gaps, warnings, carry
+
+def _shard_messages(shard: Tuple, username1: str, username2: str, limits: ParseLimits,
+                    warn: Callable[[str], None], rng) -> Iterator[Message]:
+    """Turn a whole file's columns into messages, as a serial parse would have produced them
+    
+    Warnings are reported and the random gaps drawn up front; messages are
+    built as the iterator is read.
+    """
+    line_nos, senders, types, contents, gaps, warnings, _ = shard
+    
+    # A serial parse stops reading at the capped message, so later warnings never appear.
+    # Its check runs after each message, so a cap of 0 still lets one through. Contents
+    # are zipped with the cut columns, so need no cutting themselves
+    count = len(senders)
+    capped = limits.max_messages is not None and count >= max(limits.max_messages, 1)
+    if capped:
+        count = max(limits.max_messages, 1)
+        line_nos, senders, types, gaps = line_nos[:count], senders[:count], types[:count], gaps[:count]
+    for line, text in warnings:
+        if not capped or (count and line < line_nos[-1]):
+            warn(text)
+    if capped:
+        warn(f"Warning: Reached maximum message limit ({limits.max_messages})")
+    
+    # Prefix sum: each message's offset is every explicit gap up to it plus
+    # the random gaps drawn after each earlier message
+    draws = _bulk_message_gaps(rng, count)
+    if draws is None:
+        random_gaps = [rng.randint(MESSAGE_GAP_MIN, MESSAGE_GAP_MAX) for _ in range(count)]
+    else:
+        random_gaps = map(MESSAGE_GAP_MIN.__add__, draws)
+    offsets = accumulate(map(int.__add__, gaps, chain((0,), random_gaps)))
+    
+    users = (username1, username2)
+    return map(Message, map(users.__getitem__, senders), map(users.__getitem__, senders.translate(_SWAP)),
+               contents, map(VALID_MESSAGE_TYPES.__getitem__, types), offsets)
+
+def parse(source: Union[str, os.PathLike, Iterable[str]], limits: Optional[ParseLimits] = None,
+          seed: Optional[int] = None, warn: Callable[[str], None] = print,
+          workers: int = 1) -> Tuple[str, str, List[Message]]:
+    """Parse a conversation from a file path, its text, or an iterable of lines
+    
+    workers > 1 parses large files in shards across that many processes.
+    """
+    limits = limits or ParseLimits()
+    rng = random.Random(seed) if seed is not None else None
+    if isinstance(source, os.PathLike):
+        username1, username2, messages = stream_conversation_file(Path(source), limits, warn, rng, workers)
+    else:
+        lines = split_lines(source) if isinstance(source, str) else source
+        username1, username2, messages = parse_conversation_stream(lines, limits.max_messages, warn, rng)
+    return username1, username2, list(messages)
+
+def read_header(file_path: Path) -> Tuple[str, str]:
+    """Usernames from a conversation file's header line"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        username1, username2, _ = parse_conversation_stream(f)
+    return username1, username2
+
+def read_user_map(path: Path) -> Dict[str, str]:
+    """Read a username -> profile id map: a JSON object, or CSV lines of username,id"""
+    text = path.read_text(encoding='utf-8')
+    try:
+        entries = json.loads(text)
+    except ValueError:
+        rows = [row for row in csv.reader(text.splitlines()) if len(row) >= 2]
+        # Allow a header row such as "username,id"
+        if rows and not UUID_PATTERN.match(rows[0][1].strip()):
+            rows = rows[1:]
+        entries = dict(row[:2] for row in rows)
+    if not isinstance(entries, dict):
+        raise ValueError(f"User map must be a JSON object or username,id lines: {path}")
+    
+    user_map = {}
+    for username, user_id in entries.items():
+        username = validate_username(str(username).strip())
+        user_id = str(user_id).strip()
+        if not UUID_PATTERN.match(user_id):
+            raise ValueError(f"Invalid user ID format for {username} in {path}")
+        # Profile ids, and so room ids, are lowercase in the database
+        user_map[username.lower()] = user_id.lower()
+    return user_map
+
+def lookup_user_ids(user_map: Dict[str, str], username1: str, username2: str) -> Dict[str, str]:
+    """Resolve both users from a user map instead of the profiles table"""
+    missing = [u for u in [username1, username2] if u.lower() not in user_map]
+    if missing:
+        raise ValueError(f"Users not in user map: {', '.join(missing)}")
+    return {username1.lower(): user_map[username1.lower()], username2.lower(): user_map[username2.lower()]}
+
+def get_room_id(user_id1: str, user_id2: str) -> str:
+    """Generate consistent room ID"""
+    return f"dm_{'_'.join(sorted([user_id1, user_id2]))}"
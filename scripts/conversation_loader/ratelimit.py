@@ -0,0 +1,149 @@
+"""Request budgets shared by every loader on a host, and an AIMD limit on requests in flight"""
+
+import os
+import time
+import struct
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Optional
+
+try:
+    import fcntl
+except ImportError:  # not POSIX: limits are shared between threads only
+    fcntl = None
+
+# Token buckets
+RATE_BURST = 1.0  # seconds of budget a full bucket holds
+RATE_STATE = struct.Struct('<dddd')  # request tokens, byte tokens, refilled at, paused until (epoch seconds)
+
+# Adaptive concurrency
+AIMD_DECREASE = 0.5  # limit multiplier on congestion
+AIMD_INCREASE = 1.0  # requests added to the limit per limit's worth of successes
+CONGESTION_STATUSES = {429, 503}
+CONGESTION_LATENCY = 5.0  # seconds; slower responses count as congestion
+
+class RateLimiter:
+    """Token buckets for requests/sec and bytes/sec, optionally shared through a state file
+    
+    Every process opening the same file draws on the same buckets, taking
+    turns under flock. Without either rate, it only holds requests back
+    after pause(). A request reserves its token up front and sleeps off
+    any debt, so waiters are served in turn. Bytes are charged once an
+    attempt's size is known: a large body can overdraw the bucket, and the
+    requests after it wait until it is paid back.
+    """
+    
+    def __init__(self, rate: Optional[float] = None, byte_rate: Optional[float] = None,
+                 path: Optional[Path] = None):
+        if (rate is not None and rate <= 0) or (byte_rate is not None and byte_rate <= 0):
+            raise ValueError("Rate limits must be positive")
+        self.rate = rate
+        self.byte_rate = byte_rate
+        self.path = path
+        self._lock = threading.Lock()
+        self._state = self._full(time.time())
+        self._fd: Optional[int] = None
+        if path is not None and fcntl is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    
+    def _full(self, now: float) -> List[float]:
+        return [(self.rate or 0) * RATE_BURST, (self.byte_rate or 0) * RATE_BURST, now, 0.0]
+    
+    @contextmanager
+    def _locked(self):
+        """Refilled bucket state to update in place; written back for other processes on exit"""
+        with self._lock:
+            if self._fd is None:
+                yield self._refill(self._state)
+                return
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                data = os.pread(self._fd, RATE_STATE.size, 0)
+                state = list(RATE_STATE.unpack(data)) if len(data) == RATE_STATE.size else self._full(time.time())
+                yield self._refill(state)
+                os.pwrite(self._fd, RATE_STATE.pack(*state), 0)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+    
+    def _refill(self, state: List[float]) -> List[float]:
+        now = time.time()
+        elapsed = max(0.0, now - state[2])  # the wall clock can step back
+        if self.rate:
+            state[0] = min(self.rate * RATE_BURST, state[0] + elapsed * self.rate)
+        if self.byte_rate:
+            state[1] = min(self.byte_rate * RATE_BURST, state[1] + elapsed * self.byte_rate)
+        state[2] = now
+        return state
+    
+    def acquire(self) -> float:
+        """Reserve one request and sleep until the budget covers it; returns seconds waited"""
+        with self._locked() as state:
+            wait = max(0.0, state[3] - state[2])
+            if self.rate:
+                state[0] -= 1
+                wait = max(wait, -state[0] / self.rate)
+            if self.byte_rate:
+                wait = max(wait, -state[1] / self.byte_rate)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+    
+    def charge(self, nbytes: int) -> None:
+        """Take bytes sent and received from the byte budget"""
+        if not self.byte_rate or not nbytes:
+            return
+        with self._locked() as state:
+            state[1] -= nbytes
+    
+    def pause(self, seconds: float) -> None:
+        """Hold back every request sharing these limits, e.g. after a 429"""
+        with self._locked() as state:
+            state[3] = max(state[3], state[2] + seconds)
+    
+    def close(self) -> None:
+        """Close the state file; later requests are limited within this process only"""
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+class AdaptiveConcurrency:
+    """Limit on requests in flight, adjusted AIMD-style
+    
+    The limit starts at maximum. Congestion (a 429 or 503, a failed attempt,
+    or a response slower than CONGESTION_LATENCY) multiplies it by
+    AIMD_DECREASE, once per round trip: attempts already in flight when it
+    was cut don't cut it again. Each success adds AIMD_INCREASE / limit, so it
+    grows by about one request per round of successes.
+    """
+    
+    def __init__(self, maximum: int, minimum: int = 1):
+        self.maximum = max(1, maximum)
+        self.minimum = max(1, min(minimum, self.maximum))
+        self.limit = float(self.maximum)
+        self.in_flight = 0
+        self._decreased_at = float('-inf')
+        self._cond = threading.Condition()
+    
+    def acquire(self) -> None:
+        """Wait until a request fits under the limit"""
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+    
+    def release(self, started: float, congested: bool) -> bool:
+        """End a request that started at time.perf_counter() value started; True if the limit was cut"""
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+            if not congested:
+                self.limit = min(self.maximum, self.limit + AIMD_INCREASE / self.limit)
+                return False
+            if started < self._decreased_at or self.limit <= self.minimum:
+                return False
+            self.limit = max(self.minimum, self.limit * AIMD_DECREASE)
+            self._decreased_at = time.perf_counter()
+            return True
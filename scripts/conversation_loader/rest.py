@@ -0,0 +1,642 @@
+"""Writing rooms through PostgREST: pipelined batch inserts and incremental sync"""
+
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from difflib import SequenceMatcher
+from itertools import islice
+from typing import List, Dict, Tuple, Optional, Iterable, Iterator, Callable, Union
+
+from .client import (
+    SecureSupabaseClient, AmbiguousWriteError, PayloadTooLargeError, MissingFunctionError, MAX_RETRIES,
+    STREAM_CHUNK_BYTES
+)
+from .journal import LoadJournal, file_digest, journal_path
+from .parsing import Message, VALID_MESSAGE_TYPES
+from .rooms import (
+    LoadOptions, PreparedRoom, BATCH_SIZE, MIN_BATCH_SIZE, MAX_BATCH_SIZE, MAX_BATCH_BYTES, MIN_BATCH_BYTES,
+    TARGET_BATCH_LATENCY, REPLACE_FUNCTION, REPLACE_MAX_ROWS, REPLACE_MAX_BYTES, iter_room_messages, message_row,
+    journal_dir
+)
+
+TYPE_CODES = {t: i for i, t in enumerate(VALID_MESSAGE_TYPES)}
+TIMESTAMP_BYTES = 32  # upper bound of an encoded created_at, for sizing batches
+LANDED_CHECK_CHUNK = 100  # timestamps per verification query
+
+# Incremental reload
+FETCH_PAGE_SIZE = 1000  # Supabase's default max-rows per response
+DELETE_CHUNK = 200  # ids per DELETE request
+APPEND_SPACING = 60  # seconds between rows appended after the last existing one
+
+@dataclass
+class ExistingRow:
+    """Fingerprint of a stored message, in room order"""
+    id: int
+    created_at: str
+    fingerprint: str
+
+@dataclass
+class RoomDiff:
+    """Writes needed to converge a room on the parsed conversation"""
+    inserts: Dict[int, str] = field(default_factory=dict)  # position -> created_at
+    updates: Dict[int, int] = field(default_factory=dict)  # position -> row id
+    deletes: List[int] = field(default_factory=list)  # row ids
+    unchanged: int = 0
+    
+    def __str__(self) -> str:
+        return (f"+{len(self.inserts)} inserted, ~{len(self.updates)} updated, "
+                f"-{len(self.deletes)} deleted, {self.unchanged} unchanged")
+
+class MessageColumns:
+    """Array-backed message rows: user index, type code, timestamp offset and encoded content"""
+    __slots__ = ('senders', 'types', 'offsets', 'contents')
+    
+    def __init__(self):
+        self.senders = array('B')  # index into the room's user pair
+        self.types = array('B')  # index into VALID_MESSAGE_TYPES
+        self.offsets = array('q')  # microseconds from the encoder's base timestamp
+        self.contents: List[bytes] = []  # JSON string literals
+    
+    def __len__(self) -> int:
+        return len(self.senders)
+    
+    def append(self, sender: int, type_code: int, offset: int, content: bytes) -> None:
+        self.senders.append(sender)
+        self.types.append(type_code)
+        self.offsets.append(offset)
+        self.contents.append(content)
+    
+    def slice(self, start: int, stop: int) -> 'MessageColumns':
+        part = MessageColumns()
+        part.senders = self.senders[start:stop]
+        part.types = self.types[start:stop]
+        part.offsets = self.offsets[start:stop]
+        part.contents = self.contents[start:stop]
+        return part
+
+class RowEncoder:
+    """Encodes a room's columnar rows straight to PostgREST JSON bytes"""
+    
+    def __init__(self, room_id: str, user_ids: Tuple[str, str], base: datetime):
+        self.base = base
+        # Everything but content and created_at is constant per sender and type
+        self._prefixes = [
+            ('{"room_id":%s,"sender_id":%s,"recipient_id":%s,"content":' % (
+                json.dumps(room_id), json.dumps(user_ids[sender]), json.dumps(user_ids[1 - sender])
+            )).encode('utf-8')
+            for sender in (0, 1)
+        ]
+        self._types = [(',"type":%s,"created_at":"' % json.dumps(t)).encode('utf-8') for t in VALID_MESSAGE_TYPES]
+    
+    def timestamp(self, offset: int) -> str:
+        return (self.base + timedelta(microseconds=offset)).isoformat()
+    
+    def offset(self, timestamp: datetime) -> int:
+        return (timestamp - self.base) // timedelta(microseconds=1)
+    
+    def row_size(self, sender: int, type_code: int, content: bytes) -> int:
+        """Upper bound of one encoded row"""
+        return len(self._prefixes[sender]) + len(content) + len(self._types[type_code]) + TIMESTAMP_BYTES + 2
+    
+    def _rows(self, columns: MessageColumns) -> Iterator[bytes]:
+        prefixes, types = self._prefixes, self._types
+        for sender, type_code, offset, content in zip(columns.senders, columns.types,
+                                                      columns.offsets, columns.contents):
+            yield b''.join((prefixes[sender], content, types[type_code], self.timestamp(offset).encode('ascii'), b'"}'))
+    
+    def encode(self, columns: MessageColumns) -> bytes:
+        return b'[' + b','.join(self._rows(columns)) + b']'
+    
+    def iter_encode(self, columns: MessageColumns, chunk_bytes: int = STREAM_CHUNK_BYTES) -> Iterator[bytes]:
+        """Same bytes as encode(), produced a chunk at a time"""
+        chunk = [b'[']
+        size = 1
+        for i, row in enumerate(self._rows(columns)):
+            if i:
+                chunk.append(b',')
+            chunk.append(row)
+            size += len(row) + 1
+            if size >= chunk_bytes:
+                yield b''.join(chunk)
+                chunk, size = [], 0
+        chunk.append(b']')
+        yield b''.join(chunk)
+
+@dataclass
+class Batch:
+    """Insert batch of columnar rows, encoded on demand"""
+    number: int
+    columns: MessageColumns
+    encoder: RowEncoder
+    start: int = 0  # position of the first row in the room
+    
+    @property
+    def count(self) -> int:
+        return len(self.columns)
+    
+    @property
+    def body(self) -> bytes:
+        return self.encoder.encode(self.columns)
+    
+    def iter_body(self) -> Iterator[bytes]:
+        return self.encoder.iter_encode(self.columns)
+    
+    @property
+    def created_at(self) -> List[str]:
+        return [self.encoder.timestamp(offset) for offset in self.columns.offsets]
+    
+    def split(self) -> Tuple['Batch', 'Batch']:
+        middle = self.count // 2
+        return (
+            Batch(self.number, self.columns.slice(0, middle), self.encoder, self.start),
+            Batch(self.number, self.columns.slice(middle, self.count), self.encoder, self.start + middle)
+        )
+
+class AsyncSupabaseClient:
+    """asyncio interface over a SecureSupabaseClient's keep-alive pool"""
+    
+    def __init__(self, client: SecureSupabaseClient, max_concurrency: int):
+        self.client = client
+        self.executor = ThreadPoolExecutor(max_workers=max(1, max_concurrency))
+    
+    async def _run(self, func: Callable, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+    
+    async def delete(self, table: str, filters: Dict) -> bool:
+        return await self._run(self.client.delete, table, filters)
+    
+    async def update(self, table: str, filters: Dict, data: Dict) -> bool:
+        return await self._run(self.client.update, table, filters, data)
+    
+    async def insert_json(self, table: str, body: Union[bytes, Callable[[], Iterable[bytes]]]) -> bool:
+        return await self._run(self.client.insert_json, table, body)
+    
+    async def insert_batch(self, room_id: str, batch: Batch) -> float:
+        """Insert a batch; returns the seconds it took, not counting waits for the client's limits"""
+        return await self._run(self._insert_batch, room_id, batch)
+    
+    def _insert_batch(self, room_id: str, batch: Batch) -> float:
+        throttled = self.client.throttled()
+        started = time.monotonic()
+        insert_batch(self.client, room_id, batch)
+        return time.monotonic() - started - (self.client.throttled() - throttled)
+    
+    async def replace_room(self, room: PreparedRoom, base: datetime) -> bool:
+        return await self._run(replace_room_rpc, self.client, room, base)
+    
+    def close(self) -> None:
+        self.executor.shutdown(wait=True)
+
+class BatchSizer:
+    """Adapts insert batch size to payload bytes and observed latency"""
+    
+    def __init__(self, rows: int = BATCH_SIZE, max_bytes: int = MAX_BATCH_BYTES,
+                 target_latency: float = TARGET_BATCH_LATENCY):
+        self.rows = max(MIN_BATCH_SIZE, min(rows, MAX_BATCH_SIZE))
+        self.max_bytes = max(MIN_BATCH_BYTES, max_bytes)
+        self.target_latency = target_latency
+        self._lock = threading.Lock()
+    
+    def record(self, rows: int, latency: float) -> None:
+        """Grow while the server keeps up, halve when it slows down"""
+        with self._lock:
+            if latency > self.target_latency:
+                self.rows = max(MIN_BATCH_SIZE, self.rows // 2)
+            elif latency < self.target_latency / 2 and rows >= self.rows:
+                self.rows = min(MAX_BATCH_SIZE, self.rows + max(1, self.rows // 4))
+    
+    def record_too_large(self, body_bytes: int, rows: int) -> None:
+        """Shrink both limits after a 413 response"""
+        with self._lock:
+            self.max_bytes = max(MIN_BATCH_BYTES, body_bytes // 2)
+            self.rows = max(MIN_BATCH_SIZE, min(self.rows, rows // 2))
+
+def room_encoder(room: PreparedRoom, base: datetime) -> RowEncoder:
+    """Encoder for a room, with user index 0 for the header's first user"""
+    return RowEncoder(room.room_id, (room.user_ids[room.username1.lower()], room.user_ids[room.username2.lower()]), base)
+
+def columnar_row(room: PreparedRoom, msg: Message, offset: int) -> Tuple[int, int, int, bytes]:
+    """(user index, type code, timestamp offset, encoded content) for one message"""
+    return (0 if msg.sender.lower() == room.username1.lower() else 1, TYPE_CODES[msg.type], offset,
+            json.dumps(msg.content).encode('utf-8'))
+
+def iter_room_columns(room: PreparedRoom,
+                      base: Optional[datetime] = None) -> Tuple[RowEncoder, Iterator[Tuple[int, int, int, bytes]]]:
+    """Re-stream the file as columnar rows, with the same timestamps as iter_rows"""
+    encoder = room_encoder(room, base or datetime.now(timezone.utc))
+    rows = (
+        columnar_row(room, msg, (msg.time_offset - room.span) * 1_000_000)
+        for msg in iter_room_messages(room)
+    )
+    return encoder, rows
+
+def iter_batches(rows: Iterable[Tuple[int, int, int, bytes]], encoder: RowEncoder,
+                 sizer: BatchSizer, start: int = 0, batch_number: int = 0) -> Iterator[Batch]:
+    """Group columnar rows into numbered batches bounded by row count and bytes
+    
+    start is the room position of the first row and batch_number the count of
+    batches already sent, when continuing an interrupted load.
+    """
+    columns = MessageColumns()
+    size = 2  # brackets
+    
+    for sender, type_code, offset, content in rows:
+        row_size = encoder.row_size(sender, type_code, content)
+        if len(columns) and (len(columns) >= sizer.rows or size + row_size + 1 > sizer.max_bytes):
+            batch_number += 1
+            yield Batch(batch_number, columns, encoder, start)
+            start += len(columns)
+            columns, size = MessageColumns(), 2
+        columns.append(sender, type_code, offset, content)
+        size += row_size + 1
+    
+    if len(columns):
+        yield Batch(batch_number + 1, columns, encoder, start)
+
+def count_landed(client: SecureSupabaseClient, room_id: str, batch: Batch) -> int:
+    """Count rows of a batch that are already stored"""
+    timestamps = sorted(set(batch.created_at))
+    return sum(
+        client.count('messages', {'room_id': room_id, 'created_at': timestamps[i:i + LANDED_CHECK_CHUNK]})
+        for i in range(0, len(timestamps), LANDED_CHECK_CHUNK)
+    )
+
+def insert_batch(client: SecureSupabaseClient, room_id: str, batch: Batch) -> None:
+    """Insert a batch, re-sending after ambiguous failures only if nothing landed"""
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            if not client.insert_json('messages', batch.iter_body if client.stream else batch.body):
+                raise Exception(f"Failed to insert batch {batch.number}")
+            return
+        except AmbiguousWriteError as e:
+            error = e
+            client.metrics.incr('ambiguous_writes')
+        
+        # Give a slow insert a chance to commit before checking for it
+        time.sleep(client.backoff_delay(attempt))
+        landed = count_landed(client, room_id, batch)
+        if landed >= batch.count:
+            return
+        if landed:
+            raise Exception(f"Batch {batch.number} may be partially stored "
+                            f"({landed}/{batch.count} rows); not retrying to avoid duplicates")
+    
+    raise Exception(f"Failed to insert batch {batch.number}: {error}")
+
+def replace_room_body(room_id: str, encoder: RowEncoder, columns: MessageColumns) -> bytes:
+    """JSON arguments of replace_room_messages"""
+    return b'{"target_room_id":%s,"messages":%s}' % (json.dumps(room_id).encode('utf-8'), encoder.encode(columns))
+
+def replace_room_rpc(client: SecureSupabaseClient, room: PreparedRoom, base: datetime) -> bool:
+    """Replace the room's messages with one replace_room_messages call, in one transaction
+    
+    Returns False, having stored nothing, when the function isn't installed or
+    allowed for this key, or the room is too large for one request; the caller
+    then deletes and inserts in batches.
+    """
+    if room.message_count > REPLACE_MAX_ROWS or not client.has_function(REPLACE_FUNCTION):
+        return False
+    
+    encoder, rows = iter_room_columns(room, base)
+    columns = MessageColumns()
+    size = 0
+    with client.metrics.phase('build_rows'):
+        for sender, type_code, offset, content in rows:
+            size += encoder.row_size(sender, type_code, content) + 1
+            if size > REPLACE_MAX_BYTES:
+                return False
+            columns.append(sender, type_code, offset, content)
+        body = replace_room_body(room.room_id, encoder, columns)
+    
+    try:
+        with client.metrics.phase('replace'):
+            stored = client.rpc_json(REPLACE_FUNCTION, body)
+    except MissingFunctionError:
+        return False
+    except PayloadTooLargeError:
+        client.metrics.incr('replace_fallbacks')
+        return False
+    except AmbiguousWriteError:
+        # All or nothing: the new rows' last timestamp is only there if it committed
+        client.metrics.incr('ambiguous_writes')
+        time.sleep(client.backoff_delay(0))
+        last = {'room_id': room.room_id, 'created_at': encoder.timestamp(columns.offsets[-1])} if len(columns) else None
+        if last is None or not client.count('messages', last):
+            client.metrics.incr('replace_fallbacks')
+            return False
+        stored = len(columns)
+    
+    if stored != len(columns):
+        raise Exception(f"{REPLACE_FUNCTION} stored {stored} of {len(columns)} rows in {room.room_id}")
+    client.metrics.incr('rooms_replaced')
+    client.metrics.incr('rows_inserted', len(columns))
+    return True
+
+async def pipelined_insert(client: AsyncSupabaseClient, room_id: str, batches: Iterator[Batch],
+                           sizer: BatchSizer, in_flight: int, on_progress: Callable[[Batch], None]) -> None:
+    """Upload batches with up to in_flight requests outstanding, reporting each one stored"""
+    loop = asyncio.get_running_loop()
+    metrics = client.client.metrics
+    # The bounded queue is the backpressure: parsing pauses while it is full
+    queue: asyncio.Queue = asyncio.Queue(maxsize=in_flight)
+    
+    def next_batch() -> Optional[Batch]:
+        with metrics.phase('build_rows'):
+            return next(batches, None)
+    
+    async def produce() -> None:
+        while True:
+            # Parsing, row building and encoding run off the event loop
+            item = await loop.run_in_executor(None, next_batch)
+            if item is None:
+                break
+            await queue.put(item)
+        for _ in range(in_flight):
+            await queue.put(None)
+    
+    async def send(batch: Batch) -> None:
+        try:
+            latency = await client.insert_batch(room_id, batch)
+        except PayloadTooLargeError:
+            if batch.count == 1:
+                raise Exception(f"Batch {batch.number} has a single row larger than the server accepts")
+            # A 413 is rejected before anything is stored, so re-send in halves
+            sizer.record_too_large(len(batch.body), batch.count)
+            metrics.incr('batches_split')
+            for half in batch.split():
+                await send(half)
+            return
+        # Time queued behind the rate limits says nothing about batch size
+        sizer.record(batch.count, latency)
+        metrics.incr('batches_inserted')
+        metrics.incr('rows_inserted', batch.count)
+        on_progress(batch)
+    
+    async def consume() -> None:
+        while True:
+            batch = await queue.get()
+            if batch is None:
+                return
+            await send(batch)
+    
+    tasks = [asyncio.create_task(produce())]
+    tasks += [asyncio.create_task(consume()) for _ in range(in_flight)]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+async def write_room_async(client: SecureSupabaseClient, room: PreparedRoom, show_progress: bool = True,
+                           options: Optional[LoadOptions] = None) -> int:
+    """Replace the room's messages, keeping several insert batches in flight
+    
+    Rooms small enough for one request are replaced with a single
+    replace_room_messages call when the server has it. Otherwise progress is
+    journaled as batches are confirmed, and if the room was prepared from a
+    journal, only rows after its last confirmed row are replaced.
+    """
+    options = options or LoadOptions()
+    in_flight = max(1, options.in_flight)
+    journal = room.journal
+    if journal is None:
+        journal = room.journal = LoadJournal(
+            journal_path(room.file_path, journal_dir()), file_digest(room.file_path), room.room_id,
+            room.jitter_seed, datetime.now(timezone.utc).isoformat(), room.message_count
+        )
+        journal.save()
+    async_client = AsyncSupabaseClient(client, in_flight)
+    
+    try:
+        if options.replace_rpc and not journal.rows_done:
+            if show_progress:
+                print("\nReplacing messages...")
+            if await async_client.replace_room(room, datetime.fromisoformat(journal.base)):
+                journal.remove()
+                if show_progress:
+                    print(f"Progress: 100% ({room.message_count}/{room.message_count})", end='')
+                return room.message_count
+        
+        # Clear existing messages; when resuming, rows past the checkpoint may
+        # or may not have landed, so they are cleared and sent again
+        if journal.rows_done:
+            if show_progress:
+                print(f"\nResuming after row {journal.rows_done} (batch {journal.last_batch})...")
+            stale = {'room_id': room.room_id, 'created_at': ('gt', journal.confirmed_until)}
+        else:
+            if show_progress:
+                print("\nClearing existing messages...")
+            stale = {'room_id': room.room_id}
+        with client.metrics.phase('delete'):
+            cleared = await async_client.delete('messages', stale)
+        if not cleared:
+            print(f"Warning: Could not clear existing messages in {room.room_id}")
+        
+        # created_at is fixed per row from its position, so upload order does not matter
+        sizer = BatchSizer(rows=options.batch_size)
+        encoder, rows = iter_room_columns(room, datetime.fromisoformat(journal.base))
+        batches = iter_batches(islice(rows, journal.rows_done, None), encoder, sizer,
+                               journal.rows_done, journal.last_batch)
+        total = room.message_count
+        inserted = journal.rows_done
+        
+        def on_progress(batch: Batch) -> None:
+            nonlocal inserted
+            inserted += batch.count
+            journal.ack(batch.start, batch.count, batch.number, encoder.timestamp(batch.columns.offsets[-1]))
+            if show_progress:
+                progress = round((inserted / total) * 100)
+                print(f"\rProgress: {progress}% ({inserted}/{total})", end='')
+        
+        # Insert in batches
+        if show_progress:
+            print("\nInserting messages...")
+        try:
+            with client.metrics.phase('insert'):
+                await pipelined_insert(async_client, room.room_id, batches, sizer, in_flight, on_progress)
+        except BaseException:
+            journal.save()
+            raise
+        journal.remove()
+        return inserted
+    finally:
+        async_client.close()
+
+def write_room(client: SecureSupabaseClient, room: PreparedRoom, show_progress: bool = True,
+               options: Optional[LoadOptions] = None) -> int:
+    """Replace the room's messages with the parsed conversation"""
+    return asyncio.run(write_room_async(client, room, show_progress, options))
+
+def message_fingerprint(sender_id: Optional[str], recipient_id: Optional[str],
+                        msg_type: Optional[str], content: Optional[str]) -> str:
+    """Content hash matching public.message_fingerprint() in sql/04_message_fingerprint.sql"""
+    # concat_ws() skips NULLs, so do the same here
+    parts = [p for p in (sender_id, recipient_id, msg_type, content) if p is not None]
+    return hashlib.md5('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+def fetch_fingerprints(client: SecureSupabaseClient, room_id: str) -> List[ExistingRow]:
+    """Fetch the room's stored fingerprints in room order"""
+    order = 'created_at.asc,id.asc'
+    try:
+        # Computed on the server, so message content never crosses the wire
+        columns = 'id,created_at,fingerprint:message_fingerprint'
+        page = client.select('messages', columns, {'room_id': room_id}, order=order, limit=FETCH_PAGE_SIZE)
+        local_hash = False
+    except Exception:
+        columns = 'id,created_at,sender_id,recipient_id,type,content'
+        page = client.select('messages', columns, {'room_id': room_id}, order=order, limit=FETCH_PAGE_SIZE)
+        local_hash = True
+    
+    rows = []
+    while True:
+        for row in page:
+            fingerprint = row['fingerprint'] if not local_hash else message_fingerprint(
+                row['sender_id'], row['recipient_id'], row['type'], row['content']
+            )
+            rows.append(ExistingRow(id=row['id'], created_at=row['created_at'], fingerprint=fingerprint))
+        
+        if len(page) < FETCH_PAGE_SIZE:
+            return rows
+        # Keyset paging: each page is an index range scan, where offsets rescan every row before them
+        after = {'created_at': page[-1]['created_at'], 'id': page[-1]['id']}
+        page = client.select('messages', columns, {'room_id': room_id}, order=order,
+                             limit=FETCH_PAGE_SIZE, after=after)
+
+def _interpolate(lower: Optional[datetime], upper: Optional[datetime], count: int) -> List[str]:
+    """Timestamps for count new rows placed strictly between two neighbours"""
+    if lower and upper:
+        step = (upper - lower) / (count + 1)
+        return [(lower + step * (k + 1)).isoformat() for k in range(count)]
+    if upper:
+        return [(upper - timedelta(seconds=APPEND_SPACING * (count - k))).isoformat() for k in range(count)]
+    
+    # Appending: stay between the last stored row and now
+    now = datetime.now(timezone.utc)
+    step = timedelta(seconds=APPEND_SPACING)
+    if lower + step * count > now:
+        step = max((now - lower) / (count + 1), timedelta(microseconds=1))
+    return [(lower + step * (k + 1)).isoformat() for k in range(count)]
+
+def _parse_timestamp(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def diff_room(existing: List[ExistingRow], fingerprints: List[str]) -> RoomDiff:
+    """Align stored rows with parsed messages by position and content hash"""
+    diff = RoomDiff()
+    # kept[j] is the existing row that new position j reuses, if any
+    kept: List[Optional[ExistingRow]] = [None] * len(fingerprints)
+    
+    matcher = SequenceMatcher(None, [row.fingerprint for row in existing], fingerprints, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            for k in range(i2 - i1):
+                kept[j1 + k] = existing[i1 + k]
+            diff.unchanged += i2 - i1
+            continue
+        
+        # Rewrite rows in place where possible so they keep their created_at
+        paired = min(i2 - i1, j2 - j1)
+        for k in range(paired):
+            kept[j1 + k] = existing[i1 + k]
+            diff.updates[j1 + k] = existing[i1 + k].id
+        diff.deletes.extend(row.id for row in existing[i1 + paired:i2])
+    
+    # New rows get timestamps between their surviving neighbours
+    j = 0
+    while j < len(kept):
+        if kept[j] is not None:
+            j += 1
+            continue
+        start = j
+        while j < len(kept) and kept[j] is None:
+            j += 1
+        lower = _parse_timestamp(kept[start - 1].created_at) if start > 0 else None
+        upper = _parse_timestamp(kept[j].created_at) if j < len(kept) else None
+        for position, created_at in zip(range(start, j), _interpolate(lower, upper, j - start)):
+            diff.inserts[position] = created_at
+    
+    return diff
+
+async def sync_room_async(client: SecureSupabaseClient, room: PreparedRoom, show_progress: bool = True,
+                          options: Optional[LoadOptions] = None) -> RoomDiff:
+    """Converge the room on the parsed conversation with minimal writes"""
+    options = options or LoadOptions()
+    in_flight = max(1, options.in_flight)
+    loop = asyncio.get_running_loop()
+    
+    metrics = client.metrics
+    
+    if show_progress:
+        print("\nComparing with stored messages...")
+    with metrics.phase('fetch_existing'):
+        existing = await loop.run_in_executor(None, fetch_fingerprints, client, room.room_id)
+    with metrics.phase('fingerprint'):
+        fingerprints = [
+            message_fingerprint(room.user_ids[msg.sender.lower()], room.user_ids[msg.recipient.lower()],
+                                msg.type, msg.content)
+            for msg in iter_room_messages(room)
+        ]
+    
+    # An empty room has nothing to anchor timestamps to, so do a full load
+    if not existing:
+        inserted = await write_room_async(client, room, show_progress, options)
+        return RoomDiff(inserts=dict.fromkeys(range(inserted), ''))
+    
+    with metrics.phase('diff'):
+        diff = diff_room(existing, fingerprints)
+    
+    async_client = AsyncSupabaseClient(client, in_flight)
+    try:
+        with metrics.phase('delete'):
+            for i in range(0, len(diff.deletes), DELETE_CHUNK):
+                chunk = diff.deletes[i:i + DELETE_CHUNK]
+                if not await async_client.delete('messages', {'id': chunk}):
+                    raise Exception(f"Failed to delete {len(chunk)} stale messages")
+        
+        # Only rows being inserted or rewritten need their content again. Updates
+        # are sent once every row is built, so a bad stored timestamp leaves nothing half-sent
+        updates: List[Tuple[str, Dict]] = []
+        # Interpolated timestamps are absolute, so offsets count from the epoch
+        encoder = room_encoder(room, datetime.fromtimestamp(0, timezone.utc))
+        new_rows: List[Tuple[int, int, int, bytes]] = []
+        with metrics.phase('build_rows'):
+            for position, msg in enumerate(iter_room_messages(room)):
+                if position in diff.updates:
+                    row = message_row(room, msg, '')
+                    del row['room_id'], row['created_at']
+                    updates.append((diff.updates[position], row))
+                elif position in diff.inserts:
+                    offset = encoder.offset(_parse_timestamp(diff.inserts[position]))
+                    new_rows.append(columnar_row(room, msg, offset))
+        
+        with metrics.phase('update'):
+            pending = [async_client.update('messages', {'id': row_id}, row) for row_id, row in updates]
+            if pending and not all(await asyncio.gather(*pending)):
+                raise Exception("Failed to update changed messages")
+        metrics.incr('rows_updated', len(updates))
+        metrics.incr('rows_deleted', len(diff.deletes))
+        
+        if new_rows:
+            sizer = BatchSizer(rows=options.batch_size)
+            with metrics.phase('insert'):
+                await pipelined_insert(async_client, room.room_id, iter_batches(new_rows, encoder, sizer),
+                                       sizer, in_flight, lambda batch: None)
+    finally:
+        async_client.close()
+    
+    return diff
+
+def sync_room(client: SecureSupabaseClient, room: PreparedRoom, show_progress: bool = True,
+              options: Optional[LoadOptions] = None) -> RoomDiff:
+    """Incrementally reload the room instead of deleting and re-inserting it"""
+    return asyncio.run(sync_room_async(client, room, show_progress, options))
@@ -0,0 +1,542 @@
+"""Load options, user resolution and room preparation"""
+
+import os
+import glob
+import json
+import time
+import random
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from collections import defaultdict
+from typing import TYPE_CHECKING, List, Dict, Optional, Iterable, Iterator, Tuple, Set, FrozenSet
+
+from .journal import LoadJournal, read_journal
+from .metrics import RunMetrics
+from .parse_cache import ParseCache, stream_cached_conversation
+from .parsing import (
+    Message, ParseLimits, UUID_PATTERN, read_header, lookup_user_ids, get_room_id
+)
+
+if TYPE_CHECKING:
+    from .client import SecureSupabaseClient
+    from .rest import RoomDiff
+
+# Concurrency
+DEFAULT_WORKERS = 4
+DEFAULT_IN_FLIGHT = 4  # insert batches kept in flight per room
+MAX_WORKERS = 32
+CONFIRM_DELAY = 5  # seconds
+
+# Adaptive batching
+BATCH_SIZE = 50  # initial rows per insert batch
+MIN_BATCH_SIZE = 10
+MAX_BATCH_SIZE = 1000
+MAX_BATCH_BYTES = 512 * 1024
+MIN_BATCH_BYTES = 16 * 1024
+TARGET_BATCH_LATENCY = 1.0  # seconds
+
+# Whole-room reload in one call (sql/07_replace_room_messages.sql)
+REPLACE_FUNCTION = 'replace_room_messages'
+REPLACE_MAX_ROWS = 10_000  # larger rooms are inserted in batches, so progress is journaled
+REPLACE_MAX_BYTES = 8 * 1024 * 1024
+
+# Username -> profile id cache
+USER_CACHE_TTL = 7 * 86400  # seconds
+PROFILE_LOOKUP_CHUNK = 100  # usernames per in.(...) query
+
+# Friendship checks
+FRIENDSHIP_LOOKUP_CHUNK = 100  # user ids per in.(...) filter
+FRIENDSHIP_PAGE_SIZE = 1000  # Supabase's default max-rows per response
+
+def user_cache_path() -> Path:
+    """Where the user id cache lives, read from the environment when needed"""
+    return Path(os.getenv('XDG_CACHE_HOME') or Path.home() / '.cache') / 'snappy-app' / 'user-ids.json'
+
+def journal_dir() -> Path:
+    """Where load journals for --resume are kept"""
+    return user_cache_path().parent / 'journals'
+
+def parse_cache_dir() -> Path:
+    """Where parsed conversations are cached between runs"""
+    return user_cache_path().parent / 'parsed'
+
+def rate_limit_dir() -> Path:
+    """Where loaders on this host share their request budget for each project"""
+    return user_cache_path().parent / 'rate-limits'
+
+@dataclass
+class LoadOptions:
+    """How prepared rooms are written"""
+    limits: ParseLimits = field(default_factory=ParseLimits)
+    in_flight: int = DEFAULT_IN_FLIGHT
+    batch_size: int = BATCH_SIZE
+    incremental: bool = False
+    use_user_cache: bool = True
+    refresh_users: bool = False
+    compress: bool = False  # gzip insert bodies
+    stream: bool = False  # send insert bodies chunked instead of buffered
+    metrics_path: Optional[Path] = None
+    metrics_format: Optional[str] = None  # inferred from metrics_path when None
+    user_map: Optional[Dict[str, str]] = None  # username -> profile id, skips profile lookups
+    seed: Optional[int] = None  # makes the gaps between messages reproducible
+    resume: bool = False  # continue interrupted full loads from their journals
+    verify: bool = False  # compare each stored room's count, time range and checksum with its file
+    parse_workers: int = 1  # processes for sharded parsing of large files
+    replace_rpc: bool = True  # reload small rooms with one replace_room_messages call if installed
+    parse_cache: bool = True  # reuse parsed files whose content hasn't changed
+    rate_limit: Optional[float] = None  # requests/sec, shared by every loader on this host for the project
+    byte_rate_limit: Optional[float] = None  # request and response bytes/sec, shared likewise
+    autotune: bool = True  # cut requests in flight on 429s and slow responses, then grow them back
+    message_types: Optional[Dict[str, str]] = None  # parsed type -> stored type, e.g. to store media as text
+
+@dataclass
+class PreparedRoom:
+    """Parsed and verified conversation, ready to be written"""
+    file_path: Path
+    username1: str
+    username2: str
+    message_count: int
+    span: int  # time offset of the last message, in seconds
+    jitter_seed: int  # replays the same random gaps on every pass
+    user_ids: Dict[str, str]
+    room_id: str
+    limits: ParseLimits
+    journal: Optional[LoadJournal] = None  # progress of a full load, once one has started
+    parse_workers: int = 1
+    parse_cache: Optional[ParseCache] = None
+    message_types: Optional[Dict[str, str]] = None  # parsed type -> stored type
+
+@dataclass
+class RoomResult:
+    """Outcome of loading one conversation file"""
+    file_path: Path
+    room_id: Optional[str] = None
+    users: Optional[str] = None
+    messages: int = 0
+    elapsed: float = 0.0
+    error: Optional[str] = None
+    changes: Optional['RoomDiff'] = None
+
+class UserIdCache:
+    """On-disk username -> profile id cache, keyed by Supabase URL"""
+    
+    def __init__(self, supabase_url: str, path: Optional[Path] = None, ttl: float = USER_CACHE_TTL,
+                 refresh: bool = False):
+        self.url = supabase_url.rstrip('/')
+        self.path = path or user_cache_path()
+        self.ttl = ttl
+        self.refresh = refresh  # re-resolve everything, but still record the results
+        self._lock = threading.Lock()
+        self._entries = self._read().get(self.url, {})
+    
+    def _read(self) -> Dict[str, Dict]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data.get('entries', {}) if data.get('version') == 1 else {}
+        except (OSError, ValueError):
+            return {}
+    
+    def get(self, username: str) -> Optional[str]:
+        """Fresh, well-formed cached id for a username"""
+        if self.refresh:
+            return None
+        with self._lock:
+            entry = self._entries.get(username.lower())
+        if not entry or time.time() - entry.get('fetched_at', 0) > self.ttl:
+            return None
+        # A tampered or corrupt cache must not bypass validation
+        if not UUID_PATTERN.match(str(entry.get('id', ''))):
+            return None
+        return entry['id']
+    
+    def username_for(self, user_id: str) -> Optional[str]:
+        """Fresh cached username for a profile id"""
+        if self.refresh:
+            return None
+        now = time.time()
+        with self._lock:
+            for username, entry in self._entries.items():
+                if entry.get('id') == user_id and now - entry.get('fetched_at', 0) <= self.ttl:
+                    return username
+        return None
+    
+    def put(self, user_map: Dict[str, str]) -> None:
+        now = time.time()
+        with self._lock:
+            for username, user_id in user_map.items():
+                self._entries[username.lower()] = {'id': user_id, 'fetched_at': now}
+        self.save()
+    
+    def invalidate(self, usernames: Optional[Iterable[str]] = None) -> None:
+        """Forget some usernames, or every entry for this Supabase URL"""
+        with self._lock:
+            if usernames is None:
+                self._entries.clear()
+            else:
+                for username in usernames:
+                    self._entries.pop(username.lower(), None)
+        self.save()
+    
+    def save(self) -> None:
+        """Merge into the cache file atomically so concurrent runs don't clobber each other"""
+        with self._lock:
+            entries = self._read()
+            entries[self.url] = dict(self._entries)
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump({'version': 1, 'entries': entries}, f)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                print(f"Warning: Could not write user cache {self.path}: {e}")
+
+def fetch_user_ids(client: 'SecureSupabaseClient', usernames: Iterable[str],
+                   cache: Optional[UserIdCache] = None) -> Dict[str, str]:
+    """Resolve usernames with as few profiles queries as possible"""
+    wanted = sorted({u.lower() for u in usernames})
+    user_map = {}
+    if cache:
+        for username in wanted:
+            user_id = cache.get(username)
+            if user_id:
+                user_map[username] = user_id
+    
+    missing = [u for u in wanted if u not in user_map]
+    fetched = {}
+    for i in range(0, len(missing), PROFILE_LOOKUP_CHUNK):
+        users = client.select(
+            'profiles',
+            columns='id,username',
+            filters={'username': missing[i:i + PROFILE_LOOKUP_CHUNK]}
+        )
+        
+        # Validate UUIDs
+        for user in users:
+            if not UUID_PATTERN.match(user['id']):
+                raise ValueError(f"Invalid user ID format for {user['username']}")
+            fetched[user['username']] = user['id']
+    
+    if cache and fetched:
+        cache.put(fetched)
+    user_map.update(fetched)
+    return user_map
+
+def fetch_usernames(client: 'SecureSupabaseClient', user_ids: Iterable[str],
+                    cache: Optional[UserIdCache] = None) -> Dict[str, str]:
+    """Map profile ids back to usernames, from the cache or one profiles query"""
+    wanted = sorted(set(user_ids))
+    usernames = {}
+    if cache:
+        for user_id in wanted:
+            username = cache.username_for(user_id)
+            if username:
+                usernames[user_id] = username
+    
+    missing = [u for u in wanted if u not in usernames]
+    fetched = {}
+    for i in range(0, len(missing), PROFILE_LOOKUP_CHUNK):
+        for user in client.select('profiles', columns='id,username', filters={'id': missing[i:i + PROFILE_LOOKUP_CHUNK]}):
+            fetched[user['username']] = user['id']
+    
+    if cache and fetched:
+        cache.put(fetched)
+    usernames.update({user_id: username for username, user_id in fetched.items()})
+    return usernames
+
+def prefetch_user_ids(client: 'SecureSupabaseClient', file_paths: Iterable[Path],
+                      cache: UserIdCache) -> int:
+    """Resolve every username referenced by a set of files in one query"""
+    usernames = set()
+    for path in file_paths:
+        try:
+            usernames.update(read_header(path))
+        except (OSError, ValueError):
+            continue  # reported when the file itself is prepared
+    return len(fetch_user_ids(client, usernames, cache))
+
+def verify_and_get_user_ids(client: 'SecureSupabaseClient', username1: str, username2: str,
+                            cache: Optional[UserIdCache] = None) -> Dict[str, str]:
+    """Verify users exist and get their IDs"""
+    user_map = fetch_user_ids(client, [username1, username2], cache)
+    
+    missing = [u for u in [username1, username2] if u.lower() not in user_map]
+    if missing:
+        raise ValueError(f"Users not found: {', '.join(missing)}")
+    
+    return {
+        username1.lower(): user_map[username1.lower()],
+        username2.lower(): user_map[username2.lower()]
+    }
+
+def resolve_users(username1: str, username2: str, client: Optional['SecureSupabaseClient'] = None,
+                  user_map: Optional[Dict[str, str]] = None,
+                  cache: Optional[UserIdCache] = None) -> Dict[str, str]:
+    """Profile ids for both users, from a user map if given, otherwise the profiles table"""
+    if user_map is not None:
+        return lookup_user_ids(user_map, username1, username2)
+    if client is None:
+        raise ValueError("Resolving users needs a client or a user map")
+    return verify_and_get_user_ids(client, username1, username2, cache)
+
+class FriendshipIndex:
+    """Which pairs of users are accepted friends, fetched up front so each room checks in O(1)"""
+    
+    def __init__(self, checked: Iterable[FrozenSet[str]] = (), accepted: Iterable[FrozenSet[str]] = ()):
+        self.checked: Set[FrozenSet[str]] = set(checked)
+        self.accepted: Set[FrozenSet[str]] = set(accepted) & self.checked
+    
+    def __len__(self) -> int:
+        return len(self.checked)
+    
+    def get(self, user_id1: str, user_id2: str) -> Optional[bool]:
+        """True or False for a pair that was fetched, None for one that wasn't"""
+        pair = frozenset((user_id1, user_id2))
+        if pair not in self.checked:
+            return None
+        return pair in self.accepted
+
+def fetch_friendships(client: 'SecureSupabaseClient', pairs: Iterable[Tuple[str, str]]) -> FriendshipIndex:
+    """Look up accepted friendships between these pairs only, in both directions"""
+    wanted = {frozenset(pair) for pair in pairs if pair[0] != pair[1]}
+    partners: Dict[str, Set[str]] = defaultdict(set)
+    for user_id1, user_id2 in (tuple(pair) for pair in wanted):
+        partners[user_id1].add(user_id2)
+        partners[user_id2].add(user_id1)
+    
+    # Rows are (user_id, friend_id); filtering both columns to the run's users
+    # finds either direction without downloading anyone else's friendships
+    user_ids = sorted(partners)
+    accepted = set()
+    for i in range(0, len(user_ids), FRIENDSHIP_LOOKUP_CHUNK):
+        chunk = user_ids[i:i + FRIENDSHIP_LOOKUP_CHUNK]
+        friend_ids = sorted(set().union(*(partners[u] for u in chunk)))
+        for j in range(0, len(friend_ids), FRIENDSHIP_LOOKUP_CHUNK):
+            filters = {
+                'user_id': chunk,
+                'friend_id': friend_ids[j:j + FRIENDSHIP_LOOKUP_CHUNK],
+                'status': 'accepted'
+            }
+            offset = 0
+            while True:
+                page = client.select('friendships', columns='user_id,friend_id', filters=filters,
+                                     order='user_id,friend_id', limit=FRIENDSHIP_PAGE_SIZE, offset=offset)
+                accepted.update(frozenset((row['user_id'], row['friend_id'])) for row in page)
+                if len(page) < FRIENDSHIP_PAGE_SIZE:
+                    break
+                offset += len(page)
+    
+    return FriendshipIndex(wanted, accepted)
+
+def verify_friendship(client: 'SecureSupabaseClient', user_id1: str, user_id2: str) -> bool:
+    """Check if users are friends"""
+    return bool(fetch_friendships(client, [(user_id1, user_id2)]).get(user_id1, user_id2))
+
+def prefetch_friendships(client: 'SecureSupabaseClient', file_paths: Iterable[Path],
+                         user_map: Optional[Dict[str, str]] = None,
+                         cache: Optional[UserIdCache] = None) -> Tuple[Dict[str, str], FriendshipIndex]:
+    """Check every pair of users referenced by a set of files with one friendships query
+    
+    Returns the user map the pairs were resolved with, so preparing each
+    file needn't query profiles again.
+    """
+    headers = []
+    for path in file_paths:
+        try:
+            headers.append(read_header(path))
+        except (OSError, ValueError):
+            continue  # reported when the file itself is prepared
+    if user_map is None:
+        user_map = fetch_user_ids(client, {u for header in headers for u in header}, cache)
+    pairs = [
+        (user_map[username1.lower()], user_map[username2.lower()]) for username1, username2 in headers
+        if username1.lower() in user_map and username2.lower() in user_map
+    ]
+    return user_map, fetch_friendships(client, pairs)
+
+def prepare_room(client: Optional['SecureSupabaseClient'], file_path: Path, verbose: bool = True,
+                 limits: Optional[ParseLimits] = None, user_cache: Optional[UserIdCache] = None,
+                 user_map: Optional[Dict[str, str]] = None, metrics: Optional[RunMetrics] = None,
+                 seed: Optional[int] = None, resume: bool = False,
+                 friendships: Optional[FriendshipIndex] = None, parse_workers: int = 1,
+                 parse_cache: Optional[ParseCache] = None,
+                 message_types: Optional[Dict[str, str]] = None) -> PreparedRoom:
+    """Validate, parse and resolve users for one conversation file; offline if client is None"""
+    limits = limits or ParseLimits()
+    metrics = metrics or (client.metrics if client else RunMetrics())
+    if verbose:
+        print("Validating file...")
+    
+    # Stream the file once to validate it, count messages and measure its span.
+    # A run seed gives each file its own reproducible gaps; a resumed load
+    # must replay the gaps of the run it continues
+    journal = read_journal(file_path, journal_dir()) if resume else None
+    if journal:
+        jitter_seed = journal.jitter_seed
+    elif seed is not None:
+        jitter_seed = random.Random(f"{seed}:{file_path.name}").getrandbits(32)
+    else:
+        jitter_seed = random.getrandbits(32)
+    with metrics.phase('validate'):
+        username1, username2, messages = stream_cached_conversation(file_path, parse_cache, limits,
+                                                                    rng=random.Random(jitter_seed),
+                                                                    workers=parse_workers)
+    message_count = 0
+    span = 0
+    with metrics.phase('parse'):
+        for msg in messages:
+            message_count += 1
+            span = msg.time_offset
+    
+    if verbose:
+        print("\nParsed conversation:")
+        print(f"- Users: @{username1} and @{username2}")
+        print(f"- Messages: {message_count}")
+    
+    if not message_count:
+        raise ValueError("No valid messages found in file")
+    
+    # Verify users
+    if verbose:
+        print("\nVerifying users...")
+    with metrics.phase('verify_users'):
+        user_ids = resolve_users(username1, username2, client, user_map, user_cache)
+    user_id1 = user_ids[username1.lower()]
+    user_id2 = user_ids[username2.lower()]
+    if verbose:
+        print("✓ User IDs verified")
+    
+    # Check friendship (needs the database, so skipped offline)
+    if client:
+        friends = friendships.get(user_id1, user_id2) if friendships else None
+        if friends is None:
+            with metrics.phase('verify_friendship'):
+                friends = verify_friendship(client, user_id1, user_id2)
+        if not friends:
+            print(f"⚠️  Warning: @{username1} and @{username2} may not be friends. Continuing anyway...")
+    
+    # Generate room ID
+    room_id = get_room_id(user_id1, user_id2)
+    if verbose:
+        print(f"\nRoom ID: {room_id}")
+    
+    # Resolved users or message caps may have changed since the journal was written
+    if journal and (journal.room_id != room_id or journal.message_count != message_count):
+        journal = None
+    if verbose and journal:
+        print(f"Resuming after row {journal.rows_done} of {message_count}")
+    
+    return PreparedRoom(
+        file_path=file_path,
+        username1=username1,
+        username2=username2,
+        message_count=message_count,
+        span=span,
+        jitter_seed=jitter_seed,
+        user_ids=user_ids,
+        room_id=room_id,
+        limits=limits,
+        journal=journal,
+        parse_workers=parse_workers,
+        parse_cache=parse_cache,
+        message_types=message_types
+    )
+
+def iter_room_messages(room: PreparedRoom) -> Iterator[Message]:
+    """Re-stream a prepared room's messages"""
+    # Warnings were already reported by the validation pass
+    _, _, messages = stream_cached_conversation(room.file_path, room.parse_cache, room.limits, warn=lambda _: None,
+                                                rng=random.Random(room.jitter_seed), workers=room.parse_workers)
+    if room.message_types:
+        return _store_types(messages, room.message_types)
+    return messages
+
+def _store_types(messages: Iterator[Message], message_types: Dict[str, str]) -> Iterator[Message]:
+    for msg in messages:
+        msg.type = message_types.get(msg.type, msg.type)
+        yield msg
+
+def message_row(room: PreparedRoom, msg: Message, created_at: str) -> Dict:
+    """Row for the messages table"""
+    return {
+        'room_id': room.room_id,
+        'sender_id': room.user_ids[msg.sender.lower()],
+        'recipient_id': room.user_ids[msg.recipient.lower()],
+        'content': msg.content,
+        'type': msg.type,
+        'created_at': created_at
+    }
+
+def iter_rows(room: PreparedRoom) -> Iterator[Dict]:
+    """Re-stream the file and yield rows for the messages table"""
+    # UTC, like the rows incremental syncs and watch append
+    now = datetime.now(timezone.utc)
+    
+    for msg in iter_room_messages(room):
+        # Calculate timestamp: the last message lands at "now". Offsets grow by
+        # at least 30s per message, so timestamps are unique and follow file
+        # order, which the duplicate-insert check and incremental diff rely on
+        created_at = now - timedelta(seconds=room.span - msg.time_offset)
+        
+        yield message_row(room, msg, created_at.isoformat())
+
+def open_user_cache(options: LoadOptions, supabase_url: str) -> Optional[UserIdCache]:
+    """User id cache for this run, honoring --no-user-cache and --refresh-users"""
+    if not options.use_user_cache:
+        return None
+    return UserIdCache(supabase_url, refresh=options.refresh_users)
+
+def open_parse_cache(options: LoadOptions) -> Optional[ParseCache]:
+    """Parse cache for this run, unless --no-parse-cache was given"""
+    return ParseCache(parse_cache_dir()) if options.parse_cache else None
+
+def write_metrics(metrics: RunMetrics, options: LoadOptions) -> None:
+    """Export run metrics if --metrics was given"""
+    if not options.metrics_path:
+        return
+    try:
+        metrics.write(options.metrics_path, options.metrics_format)
+    except OSError as e:
+        print(f"Warning: Could not write metrics to {options.metrics_path}: {e}")
+
+def expand_inputs(inputs: List[str]) -> List[Path]:
+    """Expand files, directories (*.txt) and glob patterns into a file list"""
+    paths = []
+    seen = set()
+    
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            matches = sorted(p for p in path.glob('*.txt') if p.is_file())
+        elif path.is_file():
+            matches = [path]
+        else:
+            matches = sorted(Path(p) for p in glob.glob(item, recursive=True) if Path(p).is_file())
+            if not matches:
+                raise ValueError(f"No conversation files match: {item}")
+        
+        for match in matches:
+            key = match.resolve()
+            if key not in seen:
+                seen.add(key)
+                paths.append(match)
+    
+    return paths
+
+def print_summary(results: List[RoomResult], verb: str = 'Loaded') -> None:
+    """Print a per-room summary table"""
+    print("\nSummary:")
+    for result in results:
+        if result.error is None:
+            changes = f", {result.changes}" if result.changes else ""
+            print(f"✅ {result.file_path.name}: {result.messages} messages{changes} "
+                  f"in {result.elapsed:.1f}s ({result.users}, {result.room_id})")
+        else:
+            print(f"❌ {result.file_path.name}: {result.error}")
+    
+    loaded = [r for r in results if r.error is None]
+    print(f"\n{verb} {sum(r.messages for r in loaded)} messages into "
+          f"{len(loaded)}/{len(results)} rooms")
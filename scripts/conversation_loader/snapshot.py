@@ -0,0 +1,148 @@
+"""Writing a stored room back out as a conversation file the loader can read"""
+
+import os
+import re
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from itertools import chain
+from pathlib import Path
+from typing import List, Dict, Optional, Iterator
+
+from .client import SecureSupabaseClient
+from .parsing import (
+    USERNAME_PATTERN, UUID_PATTERN, TIME_UNITS, MAX_TIME_GAP, MESSAGE_GAP_MIN, MESSAGE_GAP_MAX, MAX_MESSAGE_LENGTH
+)
+from .rooms import UserIdCache, fetch_usernames
+
+SNAPSHOT_PAGE_SIZE = 1000  # Supabase's default max-rows per response
+SNAPSHOT_COLUMNS = 'id,created_at,sender_id,type,content'
+DM_ROOM_PATTERN = re.compile(r'^dm_([0-9a-f-]{36})_([0-9a-f-]{36})$', re.IGNORECASE)
+# The loader adds a random MESSAGE_GAP_MIN-MESSAGE_GAP_MAX seconds after every
+# message; markers cover only the time beyond its average
+TYPICAL_MESSAGE_GAP = (MESSAGE_GAP_MIN + MESSAGE_GAP_MAX) // 2
+
+@dataclass
+class SnapshotResult:
+    """Outcome of writing one room to a conversation file"""
+    room_id: str
+    path: Path
+    users: str = ''
+    messages: int = 0
+    skipped: int = 0  # rows from senders outside the room, or with nothing to write
+    gaps: int = 0  # time gap markers written
+
+def room_participants(room_id: str) -> List[str]:
+    """Profile ids of a direct message room, from its dm_<id>_<id> room id"""
+    match = DM_ROOM_PATTERN.match(room_id)
+    if not match or not all(UUID_PATTERN.match(user_id) for user_id in match.groups()):
+        raise ValueError(f"Not a direct message room: {room_id}")
+    return [user_id.lower() for user_id in match.groups()]
+
+def iter_room_pages(client: SecureSupabaseClient, room_id: str, columns: str = SNAPSHOT_COLUMNS,
+                    page_size: int = SNAPSHOT_PAGE_SIZE) -> Iterator[List[Dict]]:
+    """A room's rows in (created_at, id) order, a page at a time
+    
+    Each page starts after the last row of the previous one, so every page is
+    an index range scan however deep into the room it is, unlike offset paging.
+    """
+    after = None
+    while True:
+        page = client.select('messages', columns, {'room_id': room_id}, order='created_at.asc,id.asc',
+                             limit=page_size, after=after)
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        after = {'created_at': page[-1]['created_at'], 'id': page[-1]['id']}
+
+def format_time_gap(seconds: int) -> List[str]:
+    """Gap markers adding up to about seconds, in the coarsest unit within 5%"""
+    markers = []
+    units = sorted(TIME_UNITS.items(), key=lambda item: -item[1])
+    while seconds > 0:
+        chunk = min(seconds, MAX_TIME_GAP)
+        seconds -= chunk
+        for name, size in units:
+            amount = chunk // size
+            if amount and amount <= 999 and (chunk - amount * size) * 20 <= chunk:
+                break
+        else:
+            name, size = 'minute', 60
+            amount = max(1, chunk // size)
+        markers.append(f"-- {amount} {name}{'s' if amount != 1 else ''} later --")
+    return markers
+
+def format_message(sender: str, message_type: Optional[str], content: Optional[str]) -> Optional[str]:
+    """One message line, or None if the row has nothing a conversation file can hold"""
+    # The format is one line per message; the loader would truncate anything longer anyway
+    text = ' '.join((content or '').split())[:MAX_MESSAGE_LENGTH]
+    message_type = (message_type or 'text').lower()
+    if not text:
+        if message_type == 'text':
+            return None
+        text = f'[{message_type}]'  # media without a caption
+    if message_type == 'text':
+        return f'{sender}: {text}'
+    return f'{sender} ({message_type}): {text}'
+
+def _parse_timestamp(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def snapshot_room(client: SecureSupabaseClient, room_id: str, out_path: Path,
+                  user_cache: Optional[UserIdCache] = None, page_size: int = SNAPSHOT_PAGE_SIZE) -> SnapshotResult:
+    """Write a direct message room as a conversation file, streaming it a page at a time
+    
+    Loading the file again recreates the room's messages, types and order;
+    created_at is approximated with gap markers, since the loader adds its
+    own random gaps between messages.
+    """
+    result = SnapshotResult(room_id=room_id, path=out_path)
+    participants = room_participants(room_id)
+    usernames = fetch_usernames(client, participants, user_cache)
+    missing = [user_id for user_id in participants if user_id not in usernames]
+    if missing:
+        raise ValueError(f"Profiles not found: {', '.join(missing)}")
+    for username in usernames.values():
+        if not USERNAME_PATTERN.match(username):
+            raise ValueError(f"Username can't appear in a conversation file: {username}")
+    
+    pages = iter_room_pages(client, room_id, page_size=page_size)
+    first_page = next(pages, [])
+    # Whoever spoke first goes first in the header
+    first_sender = next((row['sender_id'] for row in first_page if row['sender_id'] in usernames), participants[0])
+    header = [usernames[first_sender]] + [usernames[u] for u in participants if u != first_sender]
+    result.users = f"@{header[0]} @{header[1]}"
+    
+    # Write next to the target and rename, so a failed snapshot never leaves a truncated file
+    tmp_path = out_path.with_name(f"{out_path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as out:
+            out.write(f"{result.users}\n\n")
+            previous = None
+            for page in chain([first_page] if first_page else [], pages):
+                lines = []
+                for row in page:
+                    sender = usernames.get(row['sender_id'])
+                    line = format_message(sender, row.get('type'), row.get('content')) if sender else None
+                    if line is None:
+                        result.skipped += 1
+                        continue
+                    
+                    created_at = _parse_timestamp(row['created_at'])
+                    if previous is not None:
+                        gap = round((created_at - previous).total_seconds()) - TYPICAL_MESSAGE_GAP
+                        if gap > MESSAGE_GAP_MAX - TYPICAL_MESSAGE_GAP:
+                            markers = format_time_gap(gap)
+                            lines.append('\n' + '\n'.join(markers) + '\n')
+                            result.gaps += len(markers)
+                    previous = created_at
+                    lines.append(line)
+                    result.messages += 1
+                out.write('\n'.join(lines) + '\n' if lines else '')
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    
+    return result
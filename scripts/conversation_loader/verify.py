@@ -0,0 +1,101 @@
+"""Checking a loaded room against its file with aggregates instead of a download"""
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from .client import SecureSupabaseClient
+from .rest import message_fingerprint
+from .rooms import PreparedRoom, iter_room_messages
+
+SUMMARY_FUNCTION = 'room_summary'  # sql/05_room_summary.sql
+CHECKSUM_BITS = 60  # leading fingerprint bits summed per row, so each term fits a bigint
+
+@dataclass
+class RoomSummary:
+    """Message count, created_at range and content checksum of a room"""
+    count: int
+    first_created_at: Optional[datetime] = None
+    last_created_at: Optional[datetime] = None
+    checksum: Optional[str] = None  # None when the server can't compute one
+    
+    def compare(self, stored: 'RoomSummary') -> List[str]:
+        """Differences between this expected summary and a stored one; fields either side lacks are skipped"""
+        problems = []
+        if stored.count != self.count:
+            problems.append(f"{stored.count} rows stored, expected {self.count}")
+        for name in ('first_created_at', 'last_created_at'):
+            expected, actual = getattr(self, name), getattr(stored, name)
+            if expected is not None and actual is not None and expected != actual:
+                problems.append(f"{name} is {actual.isoformat()}, expected {expected.isoformat()}")
+        if self.checksum is not None and stored.checksum is not None and stored.checksum != self.checksum:
+            problems.append("content checksum differs")
+        return problems
+
+def _parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """Server timestamps carry an offset; naive ones were written as UTC"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def checksum_term(fingerprint: str) -> int:
+    """One row's share of the checksum in public.room_summary()"""
+    return int(fingerprint[:CHECKSUM_BITS // 4], 16)
+
+def expected_summary(room: PreparedRoom, base: Optional[datetime] = None) -> RoomSummary:
+    """Summary of the room as written from its file; timestamps only if the write's base is known"""
+    count = 0
+    checksum = 0
+    first_offset = None
+    for msg in iter_room_messages(room):
+        count += 1
+        if first_offset is None:
+            first_offset = msg.time_offset
+        checksum += checksum_term(message_fingerprint(
+            room.user_ids[msg.sender.lower()], room.user_ids[msg.recipient.lower()], msg.type, msg.content
+        ))
+    
+    summary = RoomSummary(count=count, checksum=str(checksum))
+    if base is not None and count:
+        # Same offsets as iter_room_columns: the last message lands on the base
+        base = _parse_timestamp(base.isoformat())
+        summary.first_created_at = base + timedelta(seconds=first_offset - room.span)
+        summary.last_created_at = base
+    return summary
+
+def fetch_summary(client: SecureSupabaseClient, room_id: str) -> RoomSummary:
+    """Stored summary in one request, or three without the SQL function (and no checksum)"""
+    try:
+        rows = client.rpc(SUMMARY_FUNCTION, {'target_room_id': room_id}, read_only=True)
+        row = rows[0] if isinstance(rows, list) else rows
+        return RoomSummary(
+            count=int(row['message_count']),
+            first_created_at=_parse_timestamp(row['first_created_at']),
+            last_created_at=_parse_timestamp(row['last_created_at']),
+            checksum=row['checksum']
+        )
+    except Exception:
+        pass
+    
+    # An exact count header and the two ends of the created_at range
+    filters = {'room_id': room_id}
+    first = client.select('messages', 'created_at', filters, order='created_at.asc', limit=1)
+    last = client.select('messages', 'created_at', filters, order='created_at.desc', limit=1)
+    return RoomSummary(
+        count=client.count('messages', filters),
+        first_created_at=_parse_timestamp(first[0]['created_at']) if first else None,
+        last_created_at=_parse_timestamp(last[0]['created_at']) if last else None
+    )
+
+def verify_room(client: SecureSupabaseClient, room: PreparedRoom, base: Optional[datetime] = None) -> RoomSummary:
+    """Compare the stored room with its file; raises ValueError listing any differences"""
+    with client.metrics.phase('verify'):
+        expected = expected_summary(room, base)
+        stored = fetch_summary(client, room.room_id)
+    problems = expected.compare(stored)
+    if problems:
+        client.metrics.incr('rooms_mismatched')
+        raise ValueError(f"Verification failed for {room.room_id}: {'; '.join(problems)}")
+    client.metrics.incr('rooms_verified')
+    return stored
@@ -0,0 +1,213 @@
+"""Following a conversation file and streaming appended messages into a live room"""
+
+import os
+import time
+import ctypes
+import ctypes.util
+import select
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Optional, Callable
+
+from .client import SecureSupabaseClient
+from .parsing import HEADER_PATTERN, ParseLimits, iter_appended_messages, read_header, get_room_id
+from .rooms import LoadOptions, PreparedRoom, UserIdCache, MAX_BATCH_SIZE, resolve_users, verify_friendship
+from .rest import MessageColumns, Batch, room_encoder, columnar_row, insert_batch
+
+WATCH_POLL_INTERVAL = 0.5  # seconds between size checks without inotify
+WATCH_READ_BYTES = 64 * 1024
+
+# From <sys/inotify.h>
+IN_MODIFY = 0x002
+IN_ATTRIB = 0x004
+IN_MOVE_SELF = 0x800
+IN_DELETE_SELF = 0x400
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+def inotify_watch(path: Path) -> Optional[int]:
+    """inotify descriptor that becomes readable when path changes; None where unavailable"""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    mask = IN_MODIFY | IN_ATTRIB | IN_MOVE_SELF | IN_DELETE_SELF
+    if libc.inotify_add_watch(fd, os.fsencode(str(path)), mask) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+class FileFollower:
+    """Reads complete lines as they are appended to a file, like tail -F"""
+    
+    def __init__(self, path: Path, offset: Optional[int] = None, poll_interval: float = WATCH_POLL_INTERVAL,
+                 use_inotify: bool = True):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+        self.file = open(path, 'rb')
+        self.offset = os.fstat(self.file.fileno()).st_size if offset is None else offset
+        self.line_no = self._count_lines(self.offset)  # complete lines before offset, for warnings
+        self._partial = b''
+        self._watch = inotify_watch(path) if use_inotify else None
+    
+    @property
+    def mode(self) -> str:
+        return 'inotify' if self._watch is not None else f'polling every {self.poll_interval}s'
+    
+    def close(self) -> None:
+        self.file.close()
+        if self._watch is not None:
+            os.close(self._watch)
+            self._watch = None
+    
+    def __enter__(self) -> 'FileFollower':
+        return self
+    
+    def __exit__(self, *exc) -> None:
+        self.close()
+    
+    def _count_lines(self, end: int) -> int:
+        count = 0
+        self.file.seek(0)
+        while self.file.tell() < end:
+            count += self.file.read(min(WATCH_READ_BYTES, end - self.file.tell())).count(b'\n')
+        return count
+    
+    def wait(self, timeout: float) -> None:
+        """Block until the file may have changed, or timeout seconds pass"""
+        if self._watch is None:
+            time.sleep(min(timeout, self.poll_interval))
+            return
+        ready, _, _ = select.select([self._watch], [], [], timeout)
+        if ready:
+            try:
+                while os.read(self._watch, 4096):
+                    pass
+            except BlockingIOError:
+                pass
+    
+    def _reopen_if_replaced(self) -> None:
+        """Editors and log rotation replace the file; keep following the path"""
+        try:
+            current = os.stat(self.path)
+        except FileNotFoundError:
+            return  # between unlink and rename; the next check picks it up
+        if current.st_ino == os.fstat(self.file.fileno()).st_ino:
+            return
+        self.close()
+        self.file = open(self.path, 'rb')
+        self._watch = inotify_watch(self.path) if self.use_inotify else None
+    
+    def read_lines(self) -> List[str]:
+        """Complete lines appended since the last call; a trailing partial line waits for its newline"""
+        self._reopen_if_replaced()
+        size = os.fstat(self.file.fileno()).st_size
+        if size < self.offset:
+            print(f"Warning: {self.path.name} was truncated; following it from the start")
+            self.offset = 0
+            self.line_no = 0
+            self._partial = b''
+        if size == self.offset:
+            return []
+        
+        self.file.seek(self.offset)
+        data = self._partial
+        while True:
+            chunk = self.file.read(WATCH_READ_BYTES)
+            if not chunk:
+                break
+            data += chunk
+        self.offset = self.file.tell()
+        
+        *lines, self._partial = data.split(b'\n')
+        self.line_no += len(lines)
+        return [line.decode('utf-8', errors='replace') for line in lines]
+
+def watch_room(client: SecureSupabaseClient, file_path: Path, options: Optional[LoadOptions] = None,
+               user_cache: Optional[UserIdCache] = None, from_start: bool = False,
+               poll_interval: float = WATCH_POLL_INTERVAL, idle_timeout: Optional[float] = None,
+               use_inotify: bool = True, on_batch: Optional[Callable[[int, float], None]] = None) -> int:
+    """Insert messages appended to a conversation file until Ctrl+C; returns how many were inserted
+    
+    The room is neither cleared nor reparsed: each batch of new lines is parsed
+    on its own and stamped with the current time, so realtime subscribers see
+    them arrive as they are written. Stops after idle_timeout seconds without
+    new lines, if given.
+    """
+    options = options or LoadOptions()
+    username1, username2 = read_header(file_path)
+    user_ids = resolve_users(username1, username2, client, options.user_map, user_cache)
+    user_id1, user_id2 = user_ids[username1.lower()], user_ids[username2.lower()]
+    if not verify_friendship(client, user_id1, user_id2):
+        print(f"⚠️  Warning: @{username1} and @{username2} may not be friends. Continuing anyway...")
+    
+    room = PreparedRoom(
+        file_path=file_path,
+        username1=username1,
+        username2=username2,
+        message_count=0,
+        span=0,
+        jitter_seed=0,
+        user_ids=user_ids,
+        room_id=get_room_id(user_id1, user_id2),
+        limits=ParseLimits()
+    )
+    # Absolute timestamps, so offsets count from the epoch
+    encoder = room_encoder(room, datetime.fromtimestamp(0, timezone.utc))
+    max_rows = max(1, min(options.batch_size, MAX_BATCH_SIZE))
+    last_offset = 0
+    inserted = 0
+    batch_number = 0
+    
+    with FileFollower(file_path, 0 if from_start else None, poll_interval, use_inotify) as follower:
+        print(f"Watching {file_path} for @{username1} and @{username2} ({follower.mode})")
+        print(f"Room ID: {room.room_id}")
+        print("Press Ctrl+C to stop.")
+        idle_since = time.monotonic()
+        
+        try:
+            while True:
+                first_line = follower.line_no + 1
+                # A header line only appears when following from the start or after truncation
+                lines = ['' if HEADER_PATTERN.match(line.strip()) else line for line in follower.read_lines()]
+                messages = list(iter_appended_messages(lines, username1, username2, first_line))
+                if not messages:
+                    timeout = poll_interval
+                    if idle_timeout is not None:
+                        remaining = idle_timeout - (time.monotonic() - idle_since)
+                        if remaining <= 0:
+                            break
+                        timeout = min(timeout, remaining)
+                    follower.wait(timeout)
+                    continue
+                idle_since = time.monotonic()
+                
+                # Stamp with the current time, strictly increasing so room order matches file order
+                for i in range(0, len(messages), max_rows):
+                    columns = MessageColumns()
+                    for msg in messages[i:i + max_rows]:
+                        last_offset = max(encoder.offset(datetime.now(timezone.utc)), last_offset + 1)
+                        columns.append(*columnar_row(room, msg, last_offset))
+                    batch_number += 1
+                    batch = Batch(batch_number, columns, encoder, inserted)
+                    
+                    started = time.monotonic()
+                    with client.metrics.phase('insert'):
+                        insert_batch(client, room.room_id, batch)
+                    latency = time.monotonic() - started
+                    inserted += batch.count
+                    client.metrics.incr('rows_inserted', batch.count)
+                    
+                    if on_batch:
+                        on_batch(batch.count, latency)
+                    else:
+                        print(f"[{time.strftime('%H:%M:%S')}] +{batch.count} messages "
+                              f"(total {inserted}, {latency * 1000:.0f} ms)")
+        except KeyboardInterrupt:
+            pass  # Ctrl+C is how a watch normally ends
+    
+    return inserted
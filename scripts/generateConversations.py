@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+"""
+Synthetic Conversation Generator
+
+Usage: python scripts/generateConversations.py <output-dir> [--rooms 10] [--messages 1000] [--seed 0]
+
+Writes conversation files in the loader's input format, one per pair of
+users, with a mix of text, snap, photo and video messages and
+"-- N minutes later --" gaps. The same seed always produces the same
+files, and each room depends only on the seed and its index, so growing
+--rooms keeps the existing rooms unchanged.
+"""
+
+import sys
+import json
+import uuid
+import random
+import argparse
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+USER_NAMES = [
+    'maya', 'jake', 'priya', 'leo', 'sofia', 'noah', 'zara', 'eli', 'nina', 'omar',
+    'ivy', 'theo', 'luna', 'kai', 'ruby', 'finn', 'ava', 'milo', 'iris', 'sam'
+]
+USER_NAMESPACE = uuid.UUID('6f1c3c52-2d43-4c5e-9a57-4e0f2f1f7a10')
+
+# (weight, type label as written in files; None means plain text)
+MESSAGE_TYPES = [(80, None), (10, 'Snap'), (6, 'Photo'), (4, 'Video')]
+GAP_PROBABILITY = 0.08  # chance of a "-- N units later --" line before a message
+GAP_UNITS = [(70, 'minute', 1, 59), (25, 'hour', 1, 12), (5, 'day', 1, 3)]
+
+OPENERS = ['hey', 'ok so', 'wait', 'lol', 'honestly', 'omg', 'btw', 'ngl', 'hmm', 'yo']
+SUBJECTS = [
+    'the new place downtown', 'that show everyone is watching', 'my sister', 'the concert',
+    'work today', 'the group chat', 'this weekend', 'the weather', 'my landlord', 'the game last night',
+    'that recipe you sent', 'our trip', 'the gym', 'my cat', 'the meeting'
+]
+COMMENTS = [
+    'was actually so good', 'is kind of a mess', 'made me laugh way too hard', 'is stressing me out',
+    'needs to happen again', 'was not what i expected', 'is going better than i thought',
+    'has been on my mind all day', 'is a whole situation', 'could be fun?'
+]
+REPLIES = [
+    'haha same', 'no way', 'for real', 'tell me everything', 'i knew it', 'stop it', 'love that',
+    'ugh yes', 'wait what', 'that tracks', 'lmao', 'send pics', 'ok deal', 'see you there'
+]
+MEDIA = [
+    'Selfie in front of a mural', 'Photo of a latte with heart foam art', 'Blurry concert stage',
+    'Short clip of a dog chasing its tail', 'Sunset over the parking lot', 'Screenshot of a group chat',
+    'Plate of tacos', 'Boomerang of clinking glasses', 'Video of rain on the window', 'Messy desk at work'
+]
+CAPTIONS = ['', 'look at this', 'current situation', 'mood', 'so worth it', 'guess where i am', 'ok this is it']
+
+def user_pair(index: int) -> Tuple[str, str]:
+    """Two distinct valid usernames for a room"""
+    first, second = 2 * index, 2 * index + 1
+    return (f"{USER_NAMES[first % len(USER_NAMES)]}{first // len(USER_NAMES) + 1}",
+            f"{USER_NAMES[second % len(USER_NAMES)]}{second // len(USER_NAMES) + 1}")
+
+def user_id(username: str) -> str:
+    """Deterministic profile id, matching the benchmark PostgREST stand-in"""
+    return str(uuid.uuid5(USER_NAMESPACE, username.lower()))
+
+def text_message(rng: random.Random, replying: bool) -> str:
+    if replying and rng.random() < 0.5:
+        return rng.choice(REPLIES)
+    return f"{rng.choice(OPENERS)} {rng.choice(SUBJECTS)} {rng.choice(COMMENTS)}"
+
+def generate_lines(rng: random.Random, users: Tuple[str, str], messages: int) -> List[str]:
+    """Header plus `messages` message lines, with gaps in between"""
+    lines = [f"@{users[0]} @{users[1]}", ""]
+    labels = [label for _, label in MESSAGE_TYPES]
+    weights = [w for w, _ in MESSAGE_TYPES]
+    sender = 0
+    
+    for n in range(messages):
+        if n and rng.random() < GAP_PROBABILITY:
+            _, unit, low, high = rng.choices(GAP_UNITS, [w for w, *_ in GAP_UNITS])[0]
+            amount = rng.randint(low, high)
+            lines += ["", f"-- {amount} {unit}{'s' if amount > 1 else ''} later --", ""]
+        
+        # Mostly alternate, with the occasional double text
+        replying = rng.random() < 0.75
+        if replying:
+            sender = 1 - sender
+        
+        label = rng.choices(labels, weights)[0]
+        if label is None:
+            lines.append(f"{users[sender]}: {text_message(rng, replying)}")
+        else:
+            caption = rng.choice(CAPTIONS)
+            lines.append(f"{users[sender]} ({label}): [{rng.choice(MEDIA)}] {caption}".rstrip())
+    
+    return lines
+
+def generate(output_dir: Path, rooms: int, messages: int, seed: int) -> Dict[str, str]:
+    """Write one file per room and return the username -> profile id map"""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    user_map = {}
+    
+    for index in range(rooms):
+        users = user_pair(index)
+        rng = random.Random(f"{seed}:{index}")
+        path = output_dir / f"room-{index + 1:05d}.txt"
+        path.write_text('\n'.join(generate_lines(rng, users, messages)) + '\n', encoding='utf-8')
+        user_map.update({username: user_id(username) for username in users})
+    
+    return user_map
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate synthetic conversation files")
+    parser.add_argument('output_dir', type=Path)
+    parser.add_argument('--rooms', type=int, default=10, help="Conversation files (user pairs) to write")
+    parser.add_argument('--messages', type=int, default=1000, help="Messages per conversation")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--user-map', type=Path,
+                        help="Also write a username -> profile id JSON map (for the loader's --user-map)")
+    args = parser.parse_args()
+    
+    if args.rooms < 1 or args.messages < 1:
+        print("Error: --rooms and --messages must be at least 1")
+        sys.exit(1)
+    
+    user_map = generate(args.output_dir, args.rooms, args.messages, args.seed)
+    if args.user_map:
+        args.user_map.write_text(json.dumps(user_map, indent=2) + '\n')
+    
+    print(f"Wrote {args.rooms} conversations of {args.messages} messages to {args.output_dir} (seed {args.seed})")
+
+if __name__ == '__main__':
+    main()
@@ -3,365 +3,28 @@
 """
 Secure Load Conversation Utility
 
-Usage: python scripts/loadConversation-secure.py <input-file>
+Usage: python scripts/loadConversation-secure.py <input-file|directory|glob> [...]
+
+Command-line interface over the conversation_loader package.
 """
 
-import os
 import sys
-import re
-import json
-import time
-from datetime import datetime, timedelta
-from typing import List, Dict, Tuple, Optional
-from dataclasses import dataclass
+import argparse
 from pathlib import Path
-import requests
-from dotenv import load_dotenv
-
-# Configuration
-MAX_FILE_SIZE = 1024 * 1024  # 1MB
-MAX_MESSAGE_LENGTH = 1000
-MAX_MESSAGES = 10000
-VALID_MESSAGE_TYPES = ['text', 'photo', 'video', 'snap']
-USERNAME_PATTERN = re.compile(r'^[a-zA-Z0-9]{3,20}$')
-UUID_PATTERN = re.compile(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$', re.IGNORECASE)
-
-# Load environment variables
-load_dotenv()
-
-SUPABASE_URL = os.getenv('EXPO_PUBLIC_SUPABASE_URL')
-SUPABASE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
-
-if not SUPABASE_URL or not SUPABASE_KEY:
-    print("Error: Missing EXPO_PUBLIC_SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY")
-    print("Note: This script requires service role key for proper permissions")
-    sys.exit(1)
-
-# Validate Supabase URL format
-if not SUPABASE_URL.startswith(('http://', 'https://')):
-    print("Error: Invalid SUPABASE_URL format")
-    sys.exit(1)
-
-@dataclass
-class Message:
-    """Validated message data"""
-    sender: str
-    recipient: str
-    content: str
-    type: str
-    time_offset: int
-
-class SecureSupabaseClient:
-    """Secure wrapper for Supabase API calls"""
-    
-    def __init__(self, url: str, key: str):
-        self.url = url.rstrip('/')
-        self.headers = {
-            'apikey': key,
-            'Authorization': f'Bearer {key}',
-            'Content-Type': 'application/json',
-            'Prefer': 'return=minimal'
-        }
-        self.session = requests.Session()
-        self.session.headers.update(self.headers)
-    
-    def _make_request(self, method: str, endpoint: str, **kwargs) -> requests.Response:
-        """Make HTTP request with error handling"""
-        url = f"{self.url}/rest/v1/{endpoint}"
-        
-        try:
-            response = self.session.request(method, url, timeout=30, **kwargs)
-            response.raise_for_status()
-            return response
-        except requests.exceptions.RequestException as e:
-            raise Exception(f"API request failed: {str(e)}")
-    
-    def select(self, table: str, columns: str = '*', filters: Optional[Dict] = None) -> List[Dict]:
-        """Secure SELECT query"""
-        params = {'select': columns}
-        if filters:
-            # Use Supabase's built-in operators to prevent injection
-            for key, value in filters.items():
-                if isinstance(value, list):
-                    # Use IN operator for lists
-                    params[key] = f'in.({",".join(map(str, value))})'
-                else:
-                    params[key] = f'eq.{value}'
-        
-        response = self._make_request('GET', table, params=params)
-        return response.json() if response.text else []
-    
-    def delete(self, table: str, filters: Dict) -> bool:
-        """Secure DELETE query"""
-        params = {}
-        for key, value in filters.items():
-            params[key] = f'eq.{value}'
-        
-        response = self._make_request('DELETE', table, params=params)
-        return response.status_code in [200, 204]
-    
-    def insert(self, table: str, data: List[Dict]) -> bool:
-        """Secure INSERT query"""
-        response = self._make_request('POST', table, json=data)
-        return response.status_code in [200, 201]
-
-def validate_file_size(file_path: Path) -> None:
-    """Check file size is within limits"""
-    size = file_path.stat().st_size
-    if size > MAX_FILE_SIZE:
-        raise ValueError(f"File too large: {size} bytes (max {MAX_FILE_SIZE} bytes)")
-
-def validate_username(username: str) -> str:
-    """Validate and return username"""
-    if not USERNAME_PATTERN.match(username):
-        raise ValueError(f"Invalid username format: {username}")
-    return username
-
-def parse_time_gap(time_str: str) -> int:
-    """Parse time expressions safely"""
-    match = re.search(r'^(\d{1,3})\s*(second|minute|hour|day)s?\s*(?:later)?$', time_str, re.IGNORECASE)
-    if not match:
-        return 0
-    
-    amount = int(match.group(1))
-    unit = match.group(2).lower()
-    
-    multipliers = {
-        'second': 1,
-        'minute': 60,
-        'hour': 3600,
-        'day': 86400
-    }
-    
-    seconds = amount * multipliers.get(unit, 0)
-    
-    # Validate reasonable time gaps (max 30 days)
-    if seconds > 86400 * 30:
-        raise ValueError(f"Time gap too large: {time_str}")
-    
-    return seconds
-
-def parse_conversation_file(content: str) -> Tuple[str, str, List[Message]]:
-    """Parse and validate conversation file"""
-    lines = [line.strip() for line in content.split('\n') if line.strip()]
-    
-    if not lines:
-        raise ValueError("Empty file")
-    
-    # Parse header
-    header_match = re.match(r'^@([a-zA-Z0-9]{3,20})\s+@([a-zA-Z0-9]{3,20})$', lines[0])
-    if not header_match:
-        raise ValueError("First line must contain two valid usernames like: @username1 @username2")
-    
-    username1 = validate_username(header_match.group(1))
-    username2 = validate_username(header_match.group(2))
-    
-    if username1.lower() == username2.lower():
-        raise ValueError("Cannot create conversation between same user")
-    
-    messages = []
-    current_time_offset = 0
-    
-    for i, line in enumerate(lines[1:], 1):
-        if not line:
-            continue
-            
-        # Check for time gap markers
-        if line.startswith('--') and line.endswith('--'):
-            try:
-                time_gap = parse_time_gap(line[2:-2].strip())
-                current_time_offset += time_gap
-            except ValueError as e:
-                print(f"Warning: Invalid time gap on line {i + 1}: {line}")
-            continue
-        
-        # Parse message lines
-        message_match = re.match(r'^([a-zA-Z0-9]{3,20})(?:\s*\(([^)]+)\))?\s*:\s*(.+)$', line)
-        if not message_match:
-            print(f"Warning: Invalid message format on line {i + 1}: {line}")
-            continue
-        
-        sender = message_match.group(1)
-        msg_type = message_match.group(2)
-        content = message_match.group(3)
-        
-        # Validate sender
-        if sender not in [username1, username2]:
-            print(f"Warning: Unknown sender '{sender}' on line {i + 1}")
-            continue
-        
-        # Determine message type
-        message_type = 'text'
-        if msg_type and msg_type.lower() in VALID_MESSAGE_TYPES:
-            message_type = msg_type.lower()
-        
-        # Validate and truncate content
-        content = content[:MAX_MESSAGE_LENGTH]
-        if not content:
-            print(f"Warning: Empty message on line {i + 1}")
-            continue
-        
-        messages.append(Message(
-            sender=sender,
-            recipient=username2 if sender == username1 else username1,
-            content=content,
-            type=message_type,
-            time_offset=current_time_offset
-        ))
-        
-        # Add realistic time gap
-        import random
-        current_time_offset += random.randint(30, 120)
-        
-        # Limit total messages
-        if len(messages) >= MAX_MESSAGES:
-            print(f"Warning: Reached maximum message limit ({MAX_MESSAGES})")
-            break
-    
-    return username1, username2, messages
-
-def verify_and_get_user_ids(client: SecureSupabaseClient, username1: str, username2: str) -> Dict[str, str]:
-    """Verify users exist and get their IDs"""
-    users = client.select(
-        'profiles',
-        columns='id,username',
-        filters={'username': [username1.lower(), username2.lower()]}
-    )
-    
-    if len(users) != 2:
-        found = [u['username'] for u in users]
-        missing = [u for u in [username1, username2] if u.lower() not in found]
-        raise ValueError(f"Users not found: {', '.join(missing)}")
-    
-    # Validate UUIDs
-    user_map = {}
-    for user in users:
-        if not UUID_PATTERN.match(user['id']):
-            raise ValueError(f"Invalid user ID format for {user['username']}")
-        user_map[user['username']] = user['id']
-    
-    return {
-        username1.lower(): user_map[username1.lower()],
-        username2.lower(): user_map[username2.lower()]
-    }
-
-def verify_friendship(client: SecureSupabaseClient, user_id1: str, user_id2: str) -> bool:
-    """Check if users are friends"""
-    # Query friendships in both directions
-    friendships = client.select(
-        'friendships',
-        columns='status',
-        filters={'status': 'accepted'}
-    )
-    
-    # Check if friendship exists in either direction
-    for friendship in friendships:
-        # Note: We'd need OR query support, checking in application logic
-        pass
-    
-    # For now, return True (warning only)
-    return True
 
-def get_room_id(user_id1: str, user_id2: str) -> str:
-    """Generate consistent room ID"""
-    return f"dm_{'_'.join(sorted([user_id1, user_id2]))}"
+import conversation_loader as loader
 
-def load_conversation(file_path: Path) -> None:
-    """Main function to load conversation"""
-    client = SecureSupabaseClient(SUPABASE_URL, SUPABASE_KEY)
+def check_supabase_config() -> None:
+    """Exit unless the Supabase URL and service role key are usable"""
+    url, key = loader.supabase_config()
+    if not url or not key:
+        print("Error: Missing EXPO_PUBLIC_SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY")
+        print("Note: This script requires service role key for proper permissions")
+        sys.exit(1)
     
-    try:
-        print("Validating file...")
-        validate_file_size(file_path)
-        
-        # Read and parse file
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        username1, username2, messages = parse_conversation_file(content)
-        
-        print(f"\nParsed conversation:")
-        print(f"- Users: @{username1} and @{username2}")
-        print(f"- Messages: {len(messages)}")
-        
-        if not messages:
-            raise ValueError("No valid messages found in file")
-        
-        # Verify users
-        print("\nVerifying users...")
-        user_ids = verify_and_get_user_ids(client, username1, username2)
-        user_id1 = user_ids[username1.lower()]
-        user_id2 = user_ids[username2.lower()]
-        print("✓ User IDs verified")
-        
-        # Check friendship
-        if not verify_friendship(client, user_id1, user_id2):
-            print("⚠️  Warning: Users may not be friends. Continuing anyway...")
-        
-        # Generate room ID
-        room_id = get_room_id(user_id1, user_id2)
-        print(f"\nRoom ID: {room_id}")
-        
-        # Confirmation
-        print("\n⚠️  This will DELETE all existing messages in this conversation.")
-        print("Press Ctrl+C to cancel, or wait 5 seconds to continue...")
-        time.sleep(5)
-        
-        # Clear existing messages
-        print("\nClearing existing messages...")
-        if not client.delete('messages', {'room_id': room_id}):
-            print("Warning: Could not clear existing messages")
-        
-        # Prepare messages
-        now = datetime.now()
-        messages_to_insert = []
-        
-        for i, msg in enumerate(messages):
-            # Calculate timestamp
-            created_at = now - timedelta(
-                seconds=(len(messages) - i) * 60 + msg.time_offset
-            )
-            
-            # Ensure not in future
-            if created_at > now:
-                created_at = now - timedelta(seconds=(len(messages) - i) * 60)
-            
-            messages_to_insert.append({
-                'room_id': room_id,
-                'sender_id': user_ids[msg.sender.lower()],
-                'recipient_id': user_ids[msg.recipient.lower()],
-                'content': msg.content,
-                'type': msg.type,
-                'created_at': created_at.isoformat()
-            })
-        
-        # Insert in batches
-        print("\nInserting messages...")
-        batch_size = 50
-        inserted = 0
-        
-        for i in range(0, len(messages_to_insert), batch_size):
-            batch = messages_to_insert[i:i + batch_size]
-            
-            if not client.insert('messages', batch):
-                raise Exception(f"Failed to insert batch {i//batch_size + 1}")
-            
-            inserted += len(batch)
-            progress = round((inserted / len(messages_to_insert)) * 100)
-            print(f"\rProgress: {progress}% ({inserted}/{len(messages_to_insert)})", end='')
-        
-        print("\n\n✅ Successfully loaded conversation!")
-        print(f"- Total messages: {len(messages_to_insert)}")
-        print(f"- Between: @{username1} and @{username2}")
-        print(f"- Room ID: {room_id}")
-        
-    except Exception as e:
-        print(f"\n❌ Error: {e}")
-        
-        if "permission denied" in str(e).lower():
-            print("\nThis script requires SUPABASE_SERVICE_ROLE_KEY for full access.")
-            print("Make sure you have the service role key in your .env file.")
-        
+    # Validate Supabase URL format
+    if not url.startswith(('http://', 'https://')):
+        print("Error: Invalid SUPABASE_URL format")
         sys.exit(1)
 
 def show_usage():
@@ -371,7 +34,74 @@ Secure Load Conversation Utility
 
 This utility loads test conversations with comprehensive validation.
 
-Usage: python scripts/loadConversation-secure.py <input-file>
+Usage: python scripts/loadConversation-secure.py <input-file> [options]
+       python scripts/loadConversation-secure.py <directory|glob|file> [...] [options]
+       python scripts/loadConversation-secure.py --snapshot <output-file> <room-id | user1 user2>
+
+Passing a directory (all *.txt files), a glob pattern or several files
+loads every conversation concurrently and prints a per-room summary.
+
+Options:
+  -w, --workers N   Concurrent rooms in multi-file mode (default {loader.DEFAULT_WORKERS})
+  --batch-size N    Initial rows per insert batch, adapted at runtime
+                    (default {loader.BATCH_SIZE}, range {loader.MIN_BATCH_SIZE}-{loader.MAX_BATCH_SIZE})
+  --incremental     Only write rows that differ from what the room already holds
+                    (run sql/04_message_fingerprint.sql to avoid fetching content)
+  --resume          Continue interrupted full loads after their last confirmed
+                    batch instead of reloading them (journals in {loader.journal_dir()})
+  --verify          After writing each room, compare its stored row count, created_at
+                    range and content checksum with the file, without fetching rows
+                    (run sql/05_room_summary.sql for the checksum; API loads only)
+  --watch           Follow one file like tail -f and insert each appended message
+                    with the current time, without clearing the room (Ctrl+C stops)
+  --from-start      With --watch, insert the file's existing messages first
+  --idle-timeout S  With --watch, stop after S seconds without new lines
+  --refresh-users   Re-resolve usernames instead of trusting the user ID cache
+  --no-user-cache   Neither read nor write the user ID cache
+                    (cached for {loader.USER_CACHE_TTL // 86400} days in {loader.user_cache_path()})
+  --in-flight N     Insert batches in flight per room (default {loader.DEFAULT_IN_FLIGHT})
+  --rate-limit N    At most N requests per second, shared with every loader run
+                    against the same project on this host
+  --byte-rate-limit BYTES
+                    At most BYTES per second sent and received, shared likewise
+  --no-autotune     Keep every worker's requests in flight; by default they are
+                    halved on 429s or responses slower than {loader.CONGESTION_LATENCY:.0f}s, and grown back after
+  --no-replace-rpc  Always delete and insert in batches; by default rooms of up to
+                    {loader.REPLACE_MAX_ROWS} messages are replaced in one request and one
+                    transaction (run sql/07_replace_room_messages.sql to enable)
+  --compress        gzip insert bodies; falls back to plain JSON if the server refuses
+  --stream          Send insert bodies in chunks as they are encoded
+  -y, --yes         Skip the {loader.CONFIRM_DELAY}-second confirmation delay
+  --parse-workers N Parse files of {2 * loader.SHARD_MIN_BYTES // (1024 * 1024)}MB or more in shards across N processes;
+                    same messages as a serial parse, but held in memory
+  --no-parse-cache  Parse every file from scratch; by default files whose content
+                    hasn't changed reuse their parse from {loader.parse_cache_dir()}
+                    (up to {loader.PARSE_CACHE_MAX_BYTES // (1024 * 1024)}MB, least recently used evicted first)
+  --seed N          Reproducible gaps between messages (e.g. for benchmarks);
+                    files keep their own sequence, keyed by file name
+  --max-file-size BYTES
+                    Reject files larger than BYTES (e.g. {loader.MAX_FILE_SIZE})
+  --max-messages N  Stop reading after N messages (e.g. {loader.MAX_MESSAGES})
+  --metrics PATH    Write phase timings and request metrics when the run ends
+                    (Prometheus textfile if PATH ends in .prom, otherwise JSON)
+  --metrics-format {'|'.join(loader.METRICS_FORMATS)}
+                    Override the format inferred from PATH
+  --export PATH     Write a psql script that replaces each room with
+                    COPY ... FROM STDIN instead of calling the API
+  --export-format {'|'.join(loader.EXPORT_FORMATS)}
+                    COPY data format (default text)
+  --data-only       Export bare COPY rows for \\copy, without BEGIN/DELETE/COMMIT
+  --snapshot PATH   Write a stored room back out as a conversation file; give the
+                    room ID or the two usernames instead of input files
+  --user-map PATH   Resolve usernames from a JSON object or username,id CSV
+                    instead of the profiles table; with --export, runs offline
+  --backend {'|'.join(loader.BACKENDS)}
+                    Write through PostgREST (default) or straight to Postgres,
+                    replacing each room with DELETE + COPY in one transaction
+                    (needs psycopg; not combinable with --incremental)
+  --dsn DSN         Postgres connection string for --backend postgres
+                    (default: ${' or $'.join(loader.DSN_ENV_VARS)})
+  -h, --help        Show this help
 
 Input File Format:
 ------------------
@@ -389,31 +119,179 @@ bob: Sure, see you in 10!
 
 Validation Rules:
 - Usernames: 3-20 alphanumeric characters only
-- Messages: Max {MAX_MESSAGE_LENGTH} characters
-- File size: Max {MAX_FILE_SIZE // 1024 // 1024}MB
-- Message types: {', '.join(VALID_MESSAGE_TYPES)}
+- Messages: Max {loader.MAX_MESSAGE_LENGTH} characters
+- File size and message count: unlimited unless capped with options
+- Message types: {', '.join(loader.VALID_MESSAGE_TYPES)}
 - Time gaps: Max 30 days
 
 Security Features:
 - Input validation with regex patterns
 - SQL injection prevention via parameterized queries
-- File size limits
+- Optional file size and message count caps
+- Streaming parser with bounded memory
 - User existence verification
-- UUID validation
-- Secure HTTP client with timeouts
+- UUID validation, including IDs read from the user cache
+- Secure HTTP client with timeouts and keep-alive connection pooling
+- Retries with jittered backoff on 429/503/timeouts, never inserting a batch twice
 
 Note: Requires SUPABASE_SERVICE_ROLE_KEY for permissions.
 """)
 
 if __name__ == '__main__':
-    if len(sys.argv) < 2 or sys.argv[1] in ['--help', '-h']:
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('inputs', nargs='*')
+    parser.add_argument('-w', '--workers', type=int, default=loader.DEFAULT_WORKERS)
+    parser.add_argument('--in-flight', type=int, default=loader.DEFAULT_IN_FLIGHT)
+    parser.add_argument('--no-replace-rpc', action='store_true')
+    parser.add_argument('--batch-size', type=int, default=loader.BATCH_SIZE)
+    parser.add_argument('--incremental', action='store_true')
+    parser.add_argument('--resume', action='store_true')
+    parser.add_argument('--verify', action='store_true')
+    parser.add_argument('--watch', action='store_true')
+    parser.add_argument('--from-start', action='store_true')
+    parser.add_argument('--idle-timeout', type=float)
+    parser.add_argument('--refresh-users', action='store_true')
+    parser.add_argument('--no-user-cache', action='store_true')
+    parser.add_argument('-y', '--yes', action='store_true')
+    parser.add_argument('--max-file-size', type=int)
+    parser.add_argument('--max-messages', type=int)
+    parser.add_argument('--metrics', type=Path)
+    parser.add_argument('--metrics-format', choices=loader.METRICS_FORMATS)
+    parser.add_argument('--export', type=Path)
+    parser.add_argument('--export-format', choices=loader.EXPORT_FORMATS, default='text')
+    parser.add_argument('--data-only', action='store_true')
+    parser.add_argument('--snapshot', type=Path)
+    parser.add_argument('--user-map', type=Path)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--parse-workers', type=int, default=1)
+    parser.add_argument('--no-parse-cache', action='store_true')
+    parser.add_argument('--rate-limit', type=float)
+    parser.add_argument('--byte-rate-limit', type=float)
+    parser.add_argument('--no-autotune', action='store_true')
+    parser.add_argument('--compress', action='store_true')
+    parser.add_argument('--stream', action='store_true')
+    parser.add_argument('--backend', choices=loader.BACKENDS, default='rest')
+    parser.add_argument('--dsn')
+    parser.add_argument('-h', '--help', action='store_true')
+    args = parser.parse_args()
+    
+    if not args.inputs or args.help:
         show_usage()
         sys.exit(0)
     
-    file_path = Path(sys.argv[1])
+    user_map = None
+    if args.user_map:
+        try:
+            user_map = loader.read_user_map(args.user_map)
+        except (OSError, ValueError) as e:
+            print(f"Error: Could not read user map: {e}")
+            sys.exit(1)
+    
+    # An export resolved entirely from a user map never touches the network
+    offline = args.export is not None and user_map is not None
+    use_postgres = args.backend == 'postgres' and args.export is None
+    if not offline and not use_postgres:
+        check_supabase_config()
+    
+    options = loader.LoadOptions(
+        limits=loader.ParseLimits(max_file_size=args.max_file_size, max_messages=args.max_messages),
+        in_flight=args.in_flight,
+        batch_size=args.batch_size,
+        incremental=args.incremental,
+        compress=args.compress,
+        stream=args.stream,
+        use_user_cache=not args.no_user_cache,
+        refresh_users=args.refresh_users,
+        metrics_path=args.metrics,
+        metrics_format=args.metrics_format,
+        user_map=user_map,
+        seed=args.seed,
+        resume=args.resume,
+        verify=args.verify,
+        parse_workers=max(1, args.parse_workers),
+        replace_rpc=not args.no_replace_rpc,
+        parse_cache=not args.no_parse_cache,
+        rate_limit=args.rate_limit,
+        byte_rate_limit=args.byte_rate_limit,
+        autotune=not args.no_autotune
+    )
+    
+    if args.snapshot:
+        if len(args.inputs) not in (1, 2):
+            print("Error: --snapshot takes a room ID or two usernames")
+            sys.exit(1)
+        loader.snapshot_conversation(args.inputs, args.snapshot, options)
+        sys.exit(0)
+    
+    if args.watch:
+        file_path = Path(args.inputs[0])
+        if len(args.inputs) != 1 or not file_path.is_file():
+            print("Error: --watch follows a single conversation file")
+            sys.exit(1)
+        loader.watch_conversation(file_path, options, from_start=args.from_start, idle_timeout=args.idle_timeout)
+        sys.exit(0)
+    
+    if args.export:
+        try:
+            file_paths = loader.expand_inputs(args.inputs)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        
+        client = None if offline else loader.open_client(options)
+        try:
+            results = loader.export_rooms(file_paths, args.export, args.export_format, args.data_only, client, options)
+        finally:
+            if client:
+                client.close()
+        loader.print_summary(results, verb='Exported')
+        if not args.data_only:
+            print(f'\nLoad with: psql "$DATABASE_URL" -f {args.export}')
+        sys.exit(1 if any(r.error for r in results) else 0)
     
-    if not file_path.exists():
-        print(f"Error: File not found: {file_path}")
+    backend = None
+    if use_postgres:
+        if args.incremental:
+            print("Error: --incremental is not supported with --backend postgres")
+            sys.exit(1)
+        dsn = args.dsn or loader.find_dsn()
+        if not dsn:
+            print(f"Error: --backend postgres needs --dsn or one of {', '.join(loader.DSN_ENV_VARS)}")
+            sys.exit(1)
+        try:
+            backend = loader.PostgresBackend(dsn, pool_size=max(1, min(args.workers, loader.MAX_WORKERS)))
+        except RuntimeError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+    
+    # A single plain file keeps the original one-room flow
+    if backend is None and len(args.inputs) == 1 and not Path(args.inputs[0]).is_dir() and not any(c in args.inputs[0] for c in '*?['):
+        file_path = Path(args.inputs[0])
+        
+        if not file_path.exists():
+            print(f"Error: File not found: {file_path}")
+            sys.exit(1)
+        
+        loader.load_conversation(file_path, assume_yes=args.yes, options=options)
+        sys.exit(0)
+    
+    try:
+        file_paths = loader.expand_inputs(args.inputs)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    
+    if not file_paths:
+        print("Error: No conversation files found")
         sys.exit(1)
     
-    load_conversation(file_path)
\ No newline at end of file
+    try:
+        results = loader.load_conversations(file_paths, workers=args.workers, assume_yes=args.yes,
+                                     options=options, backend=backend)
+    finally:
+        if backend:
+            backend.close()
+    loader.print_summary(results)
+    
+    if any(r.error for r in results):
+        sys.exit(1)
@@ -0,0 +1,94 @@
+"""Incremental sync: aligning stored rows with a conversation file's messages"""
+
+import sys
+import unittest
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from conversation_loader.rest import APPEND_SPACING, ExistingRow, diff_room, message_fingerprint
+
+BASE = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+def fingerprints(contents):
+    return [message_fingerprint('a', 'b', 'text', content) for content in contents]
+
+def stored(contents):
+    """Rows as fetch_fingerprints() returns them, one minute apart"""
+    return [
+        ExistingRow(id=100 + i, created_at=(BASE + timedelta(minutes=i)).isoformat(), fingerprint=fingerprint)
+        for i, fingerprint in enumerate(fingerprints(contents))
+    ]
+
+def parse(value):
+    return datetime.fromisoformat(value)
+
+class DiffRoomTest(unittest.TestCase):
+    
+    def test_unchanged(self):
+        diff = diff_room(stored('abcd'), fingerprints('abcd'))
+        self.assertEqual((diff.inserts, diff.updates, diff.deletes, diff.unchanged), ({}, {}, [], 4))
+    
+    def test_edit_rewrites_row_in_place(self):
+        diff = diff_room(stored('abcd'), fingerprints('abXd'))
+        self.assertEqual(diff.updates, {2: 102})
+        self.assertEqual((diff.inserts, diff.deletes, diff.unchanged), ({}, [], 3))
+    
+    def test_insert_lands_between_neighbours(self):
+        diff = diff_room(stored('abcd'), fingerprints('abXYcd'))
+        self.assertEqual((diff.updates, diff.deletes, diff.unchanged), ({}, [], 4))
+        self.assertEqual(sorted(diff.inserts), [2, 3])
+        first, second = parse(diff.inserts[2]), parse(diff.inserts[3])
+        self.assertTrue(BASE + timedelta(minutes=1) < first < second < BASE + timedelta(minutes=2))
+    
+    def test_delete(self):
+        diff = diff_room(stored('abcd'), fingerprints('ad'))
+        self.assertEqual(diff.deletes, [101, 102])
+        self.assertEqual((diff.inserts, diff.updates, diff.unchanged), ({}, {}, 2))
+    
+    def test_replaced_block_of_another_length(self):
+        diff = diff_room(stored('abcd'), fingerprints('aXYZd'))
+        self.assertEqual(diff.updates, {1: 101, 2: 102})
+        self.assertEqual(sorted(diff.inserts), [3])
+        self.assertTrue(BASE + timedelta(minutes=2) < parse(diff.inserts[3]) < BASE + timedelta(minutes=3))
+        
+        diff = diff_room(stored('abcd'), fingerprints('aXd'))
+        self.assertEqual((diff.updates, diff.deletes, diff.inserts), ({1: 101}, [102], {}))
+    
+    def test_prepend_goes_before_first_row(self):
+        diff = diff_room(stored('ab'), fingerprints('XYab'))
+        self.assertEqual(
+            [parse(diff.inserts[0]), parse(diff.inserts[1])],
+            [BASE - timedelta(seconds=APPEND_SPACING * 2), BASE - timedelta(seconds=APPEND_SPACING)]
+        )
+    
+    def test_append_goes_after_last_row_in_utc(self):
+        diff = diff_room(stored('ab'), fingerprints('abXY'))
+        first, second = parse(diff.inserts[2]), parse(diff.inserts[3])
+        self.assertEqual(first.utcoffset(), timedelta(0))
+        self.assertTrue(BASE + timedelta(minutes=1) < first < second <= datetime.now(timezone.utc))
+    
+    def test_append_close_to_now_stays_in_the_past(self):
+        existing = stored('ab')
+        existing[-1].created_at = (datetime.now(timezone.utc) - timedelta(seconds=1)).isoformat()
+        diff = diff_room(existing, fingerprints('abXYZ'))
+        times = [parse(diff.inserts[position]) for position in (2, 3, 4)]
+        self.assertEqual(times, sorted(set(times)))
+        self.assertLessEqual(times[-1], datetime.now(timezone.utc))
+    
+    def test_naive_stored_timestamps_are_utc(self):
+        existing = stored('ac')
+        existing[1].created_at = existing[1].created_at.replace('+00:00', '')
+        diff = diff_room(existing, fingerprints('abc'))
+        self.assertTrue(BASE < parse(diff.inserts[1]) < BASE + timedelta(minutes=1))
+    
+    def test_every_position_is_accounted_for(self):
+        new = 'xbdeQRgzzh'
+        diff = diff_room(stored('abcdefgh'), fingerprints(new))
+        written = set(diff.inserts) | set(diff.updates)
+        self.assertEqual(len(written) + diff.unchanged, len(new))
+        self.assertEqual(len(diff.updates) + len(diff.deletes) + diff.unchanged, 8)
+
+if __name__ == '__main__':
+    unittest.main()
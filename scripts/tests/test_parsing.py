@@ -0,0 +1,167 @@
+"""Sharded and cached parsing against the serial parser"""
+
+import sys
+import random
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from conversation_loader import parsing
+from conversation_loader.parse_cache import ParseCache, stream_cached_conversation
+from conversation_loader.parsing import (
+    MESSAGE_GAP_MIN, MESSAGE_GAP_MAX, ParseLimits, _bulk_message_gaps, parse_conversation_sharded,
+    stream_conversation_file
+)
+
+# Every kind of line the tokenizer tells apart, including ones that only warn
+LINES = [
+    'alice: message number {n}',
+    'bob: reply number {n} ü 🎉',
+    'alice (Snap): [Photo of a desk] caption {n}',
+    'bob (photo): [Picture] look at this {n}',
+    'alice (unknown): falls back to text {n}',
+    '-- {m} minutes later --',
+    '-- 99 fortnights later --',
+    'carol: not part of this conversation {n}',
+    'this line is not a message {n}',
+    'bob:    ',
+    '',
+]
+ENDINGS = {'lf': '\n', 'crlf': '\r\n', 'cr': '\r'}
+
+def write_fixture(path, lines, ending):
+    """Deterministic conversation with leading blank lines and a trailing time gap"""
+    rng = random.Random(lines)
+    body = [rng.choice(LINES).format(n=n, m=rng.randint(1, 59)) for n in range(lines)]
+    if ending == 'mixed':
+        endings = ['\r\n', '\r', '\n']
+        text = ''.join(f'{line}{endings[i % 3]}' for i, line in enumerate(['', '@alice @bob'] + body))
+    else:
+        text = ENDINGS[ending].join(['', '@alice @bob'] + body + ['-- 5 minutes later --'])
+    path.write_bytes(text.encode('utf-8'))
+
+def serial(path, limits, seed=7):
+    warnings = []
+    username1, username2, messages = stream_conversation_file(path, limits, warnings.append, random.Random(seed))
+    return username1, username2, [vars(m) for m in messages], warnings
+
+class ShardedParseTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        # Small shards, so a few thousand lines split at many boundaries
+        patcher = mock.patch.object(parsing, 'SHARD_MIN_BYTES', 1000)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def fixture(self, ending, lines=3000):
+        path = Path(self.directory.name) / f'{ending}.txt'
+        write_fixture(path, lines, ending)
+        return path
+    
+    def test_matches_serial_parse(self):
+        for ending in ('lf', 'crlf', 'cr', 'mixed'):
+            path = self.fixture(ending)
+            for max_messages in (None, 500, 1, 0):
+                limits = ParseLimits(max_messages=max_messages)
+                expected = serial(path, limits)
+                self.assertTrue(expected[2])
+                for workers in (1, 3):
+                    with self.subTest(ending=ending, max_messages=max_messages, workers=workers):
+                        warnings = []
+                        username1, username2, messages = parse_conversation_sharded(
+                            path, workers, limits, warnings.append, random.Random(7))
+                        self.assertEqual((username1, username2, [vars(m) for m in messages]), expected[:3])
+                        self.assertEqual(sorted(warnings), sorted(expected[3]))
+    
+    def test_line_endings_parse_alike(self):
+        expected = serial(self.fixture('lf'), ParseLimits())
+        for ending in ('crlf', 'cr', 'mixed'):
+            with self.subTest(ending=ending):
+                self.assertEqual(serial(self.fixture(ending), ParseLimits())[:3], expected[:3])
+    
+    def test_cr_only_header(self):
+        path = Path(self.directory.name) / 'short.txt'
+        path.write_bytes(b'@alice @bob\ralice: hi\rbob: hey\r')
+        username1, username2, messages = parse_conversation_sharded(path, 1, warn=lambda _: None)
+        self.assertEqual((username1, username2, [m.content for m in messages]), ('alice', 'bob', ['hi', 'hey']))
+    
+    def test_leaves_rng_where_serial_parse_does(self):
+        path = self.fixture('lf')
+        serial_rng, sharded_rng = random.Random(3), random.Random(3)
+        list(stream_conversation_file(path, warn=lambda _: None, rng=serial_rng)[2])
+        parse_conversation_sharded(path, 3, warn=lambda _: None, rng=sharded_rng)
+        self.assertEqual(serial_rng.random(), sharded_rng.random())
+
+class BulkMessageGapsTest(unittest.TestCase):
+    
+    def test_replays_randint(self):
+        for seed in range(5):
+            for count in (0, 1, 7, 5000):
+                serial_rng, bulk_rng = random.Random(seed), random.Random(seed)
+                expected = [serial_rng.randint(MESSAGE_GAP_MIN, MESSAGE_GAP_MAX) for _ in range(count)]
+                draws = _bulk_message_gaps(bulk_rng, count)
+                self.assertEqual([MESSAGE_GAP_MIN + d for d in draws], expected)
+                self.assertEqual(serial_rng.getstate(), bulk_rng.getstate())
+    
+    def test_replays_the_global_generator(self):
+        random.seed(11)
+        expected = [random.randint(MESSAGE_GAP_MIN, MESSAGE_GAP_MAX) for _ in range(100)]
+        random.seed(11)
+        self.assertEqual([MESSAGE_GAP_MIN + d for d in _bulk_message_gaps(random, 100)], expected)
+    
+    def test_declines_other_generators(self):
+        class Subclass(random.Random):
+            pass
+        self.assertIsNone(_bulk_message_gaps(Subclass(1), 10))
+        self.assertIsNone(_bulk_message_gaps(random.SystemRandom(), 10))
+
+class ParseCacheTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = Path(self.directory.name) / 'conversation.txt'
+        self.cache = ParseCache(Path(self.directory.name) / 'cache')
+    
+    def cached(self, limits):
+        warnings = []
+        username1, username2, messages = stream_cached_conversation(self.path, self.cache, limits, warnings.append,
+                                                                    random.Random(7))
+        return username1, username2, [vars(m) for m in messages], warnings
+    
+    def test_miss_and_hit_match_serial_parse(self):
+        for ending in ('lf', 'cr'):
+            write_fixture(self.path, 2000, ending)
+            for max_messages in (None, 300):
+                limits = ParseLimits(max_messages=max_messages)
+                with self.subTest(ending=ending, max_messages=max_messages):
+                    expected = serial(self.path, limits)
+                    self.assertEqual(self.cached(limits), expected)
+                    hits = self.cache.hits
+                    self.assertEqual(self.cached(limits), expected)
+                    self.assertEqual(self.cache.hits, hits + 1)
+    
+    def test_truncated_entry_is_parsed_again(self):
+        write_fixture(self.path, 500, 'lf')
+        expected = serial(self.path, ParseLimits())
+        self.cached(ParseLimits())
+        entry = self.cache.entry_path(self.cache.key(self.path))
+        entry.write_bytes(entry.read_bytes()[:-10])
+        self.assertEqual(self.cached(ParseLimits()), expected)
+        self.assertEqual((self.cache.hits, self.cache.misses), (0, 2))
+    
+    def test_edited_file_misses(self):
+        write_fixture(self.path, 500, 'lf')
+        self.cached(ParseLimits())
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write('bob: one more\n')
+        self.assertEqual(self.cached(ParseLimits()), serial(self.path, ParseLimits()))
+        self.assertEqual(self.cache.misses, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -19,6 +19,4 @@ COMMENT ON COLUMN public.messages.room_id IS 'Room identifier - format: dm_user1
 -- Update posts table comment to clarify it's for stories only
 COMMENT ON TABLE public.posts IS 'Stories only - photos/videos shared to all friends (no expiration for demo)';
 
--- Note: In production, we would add indexes for performance
--- CREATE INDEX idx_messages_room_id ON public.messages(room_id);
--- CREATE INDEX idx_messages_created_at ON public.messages(created_at DESC);
\ No newline at end of file
+-- Note: Indexes for room queries are added in 06_messages_room_index.sql
\ No newline at end of file
@@ -0,0 +1,19 @@
+-- ───────────────────────────────
+-- Migration: Message Fingerprints
+-- Date: 2026-10-17
+-- Purpose: Let the conversation loader diff a room without downloading it
+-- ───────────────────────────────
+
+-- Computed field: PostgREST exposes this as a virtual column, so
+-- select=id,created_at,fingerprint:message_fingerprint returns a hash
+-- per row instead of the message content.
+-- Must stay in sync with message_fingerprint() in scripts/conversation_loader/rest.py
+CREATE OR REPLACE FUNCTION public.message_fingerprint(m public.messages)
+RETURNS text
+LANGUAGE sql
+IMMUTABLE
+AS $$
+  SELECT md5(concat_ws(E'\x1f', m.sender_id::text, m.recipient_id::text, m.type, m.content));
+$$;
+
+COMMENT ON FUNCTION public.message_fingerprint(public.messages) IS 'Content hash used by loadConversation-secure.py --incremental; must match message_fingerprint() in scripts/conversation_loader/rest.py';
@@ -0,0 +1,27 @@
+-- ───────────────────────────────
+-- Migration: Room Summaries
+-- Date: 2026-10-17
+-- Purpose: Let the conversation loader verify a load without downloading it
+-- ───────────────────────────────
+
+-- One row per room: message count, first and last created_at, and a
+-- checksum of message content. The checksum is the sum of the first 60 bits
+-- of each row's message_fingerprint() (sql/04_message_fingerprint.sql), so
+-- it doesn't depend on row order and costs one aggregate pass.
+-- STABLE, so PostgREST serves it over GET /rpc/room_summary?target_room_id=...
+-- Must stay in sync with checksum_term() in scripts/conversation_loader/verify.py
+CREATE OR REPLACE FUNCTION public.room_summary(target_room_id text)
+RETURNS TABLE (message_count bigint, first_created_at timestamptz, last_created_at timestamptz, checksum text)
+LANGUAGE sql
+STABLE
+AS $$
+  SELECT
+    count(*),
+    min(m.created_at),
+    max(m.created_at),
+    coalesce(sum(('x' || left(public.message_fingerprint(m), 15))::bit(60)::bigint), 0)::text
+  FROM public.messages m
+  WHERE m.room_id = target_room_id;
+$$;
+
+COMMENT ON FUNCTION public.room_summary(text) IS 'Aggregate used by scripts/loadConversation-secure.py --verify';
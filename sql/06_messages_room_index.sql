@@ -0,0 +1,20 @@
+-- ───────────────────────────────
+-- Migration: Messages Room Index
+-- Date: 2026-10-17
+-- Purpose: Index the way chats and the conversation loader read messages
+-- ───────────────────────────────
+
+-- Chat screens fetch the latest messages of one room and the loader purges
+-- a room before reloading it; both filter on room_id, and the chat sorts by
+-- created_at. One composite index serves both: the purge uses its room_id
+-- prefix, and "latest N" walks it backwards and stops after N rows instead
+-- of sorting the whole room.
+-- On a large live table, run the CREATE by hand with CONCURRENTLY instead
+-- (outside a transaction) so writes aren't blocked while it builds.
+-- Measure with scripts/benchmarks/index_benchmark.py
+CREATE INDEX IF NOT EXISTS idx_messages_room_created_at ON public.messages(room_id, created_at);
+
+-- The composite index covers every room_id lookup the single-column one did
+DROP INDEX IF EXISTS public.idx_messages_room_id;
+
+ANALYZE public.messages;
@@ -0,0 +1,36 @@
+-- ───────────────────────────────
+-- Migration: Replace Room Messages
+-- Date: 2026-10-17
+-- Purpose: Let the conversation loader reload a room in one request
+-- ───────────────────────────────
+
+-- Deletes every message in the room and inserts the given ones, in the one
+-- transaction PostgREST wraps the call in, so readers see either the old
+-- room or the new one. messages is a JSON array of objects with sender_id,
+-- recipient_id, content, type and created_at; any room_id in them is
+-- ignored. Returns the number of rows inserted.
+-- Called with POST /rpc/replace_room_messages by write_room_async() in
+-- scripts/conversation_loader/rest.py for rooms that fit in one request;
+-- without this function the loader deletes and inserts in batches instead.
+CREATE OR REPLACE FUNCTION public.replace_room_messages(target_room_id text, messages json)
+RETURNS bigint
+LANGUAGE plpgsql
+VOLATILE
+AS $$
+DECLARE
+  inserted bigint;
+BEGIN
+  DELETE FROM public.messages WHERE room_id = target_room_id;
+
+  INSERT INTO public.messages (room_id, sender_id, recipient_id, content, type, created_at)
+  SELECT target_room_id, m.sender_id, m.recipient_id, m.content, coalesce(m.type, 'text'), m.created_at
+  FROM json_to_recordset(messages) AS m(sender_id uuid, recipient_id uuid, content text, type text, created_at timestamptz);
+
+  GET DIAGNOSTICS inserted = ROW_COUNT;
+  RETURN inserted;
+END;
+$$;
+
+-- Bulk writes are for the service role only
+REVOKE EXECUTE ON FUNCTION public.replace_room_messages(text, json) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.replace_room_messages(text, json) TO service_role;